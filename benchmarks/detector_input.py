@@ -0,0 +1,148 @@
+"""
+Velocidad y precisión del detector ONNX (detectors/yolo.py) según el tamaño de entrada del modelo.
+
+Cada tamaño corre en un proceso propio con IALEPH_DETECTOR_INPUT (requiere un yolov8n.onnx exportado con
+tamaño dinámico, ver tools/export_yolo_onnx.py). Las imágenes se reducen a 240x180 como en main.py antes
+de detectar, y las cajas se comparan, en coordenadas de 640x480, contra la referencia: el detector a 640x480
+sobre el frame sin reducir. Se reporta también "estirado", el preprocesamiento anterior (240x180 agrandado a
+640x480 deformando el aspecto, sin letterbox).
+
+Por tamaño: latencia p50/p95 de preprocess y de detectar_personas completo (ms), y precisión/recall
+(IoU >= 0.5) respecto a la referencia.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.detector_input
+    python -m benchmarks.detector_input --tamanos 320x256,416x320 --repeticiones 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.stages import ANCHO, ALTO, PROCESS_WIDTH, PROCESS_HEIGHT, MARCA, cargar_muestras, frames_sinteticos
+from tracking.iou_tracker import asociar, iou_matriz
+
+REFERENCIA = "referencia"
+ESTIRADO = "estirado"
+IOU_COINCIDENCIA = 0.5
+
+def _percentiles(latencias):
+    p50, p95 = np.percentile(latencias, [50, 95]) * 1000
+    return round(float(p50), 3), round(float(p95), 3)
+
+def medir_tamano(modo, repeticiones):
+    """
+    Mide el detector en el proceso actual (el tamaño de entrada ya viene fijado por IALEPH_DETECTOR_INPUT).
+
+    Retorna:
+      - resultado: latencias (ms) y cajas detectadas por imagen, en coordenadas de 640x480.
+    """
+    import detectors.yolo as yolo
+
+    muestras = cargar_muestras()
+    imagenes = muestras + frames_sinteticos(muestras)
+    if modo == REFERENCIA:
+        entradas = imagenes
+    else:
+        entradas = [cv2.resize(imagen, (PROCESS_WIDTH, PROCESS_HEIGHT)) for imagen in imagenes]
+
+    if modo == ESTIRADO:
+        def preprocesar(frame):
+            # Preprocesamiento anterior: resize estirado y cadena astype/transpose/expand_dims por frame
+            rgb = cv2.cvtColor(cv2.resize(frame, (yolo.INPUT_WIDTH, yolo.INPUT_HEIGHT)), cv2.COLOR_BGR2RGB)
+            return np.expand_dims(np.transpose(rgb.astype(np.float32) / 255.0, (2, 0, 1)), axis=0), None
+
+        def detectar(frame):
+            tensor, _ = preprocesar(frame)
+            outputs = yolo.session.run(None, {yolo.INPUT_NAME: tensor})
+            return yolo.postprocess(outputs, frame_size=(frame.shape[1], frame.shape[0]),
+                                    input_size=(yolo.INPUT_WIDTH, yolo.INPUT_HEIGHT))
+    else:
+        preprocesar = yolo.preprocess
+
+        def detectar(frame):
+            return yolo.detectar_personas(frame)[0]
+
+    detectar(entradas[0])  # Calentamiento
+    lat_pre, lat_total = np.empty(repeticiones), np.empty(repeticiones)
+    for i in range(repeticiones):
+        frame = entradas[i % len(entradas)]
+        t0 = time.perf_counter()
+        preprocesar(frame)
+        lat_pre[i] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        detectar(frame)
+        lat_total[i] = time.perf_counter() - t0
+
+    escala = np.array([ANCHO / entradas[0].shape[1], ALTO / entradas[0].shape[0]] * 2)
+    cajas = [(np.array([d[0] for d in detectar(frame)]).reshape(-1, 4) * escala).tolist() for frame in entradas]
+    return {
+        "entrada_modelo": f"{yolo.INPUT_WIDTH}x{yolo.INPUT_HEIGHT}",
+        "preprocess_ms": _percentiles(lat_pre),
+        "detectar_ms": _percentiles(lat_total),
+        "cajas": cajas,
+    }
+
+def ejecutar_en_proceso(modo, tamano, repeticiones):
+    """Corre medir_tamano en un intérprete nuevo con el tamaño de entrada indicado."""
+    entorno = dict(os.environ, IALEPH_DETECTOR_INPUT=tamano)
+    cmd = [sys.executable, "-m", "benchmarks.detector_input", "--modo-interno", modo,
+           "--repeticiones", str(repeticiones)]
+    proceso = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, env=entorno)
+    for linea in reversed(proceso.stdout.splitlines()):
+        if linea.startswith(MARCA):
+            return json.loads(linea[len(MARCA):])
+    return {"error": f"La medición terminó con código {proceso.returncode} sin resultado"}
+
+def precision_recall(cajas, referencia):
+    """Precisión y recall de las cajas (por imagen) respecto a las de referencia, con IoU >= 0.5."""
+    aciertos = detectadas = esperadas = 0
+    for propias, ref in zip(cajas, referencia):
+        propias = np.array(propias, dtype=np.float64).reshape(-1, 4)
+        ref = np.array(ref, dtype=np.float64).reshape(-1, 4)
+        pares, _, _ = asociar(iou_matriz(ref, propias), IOU_COINCIDENCIA)
+        aciertos += len(pares)
+        detectadas += len(propias)
+        esperadas += len(ref)
+    return (round(aciertos / detectadas, 3) if detectadas else None,
+            round(aciertos / esperadas, 3) if esperadas else None)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Velocidad/precisión del detector ONNX por tamaño de entrada.")
+    parser.add_argument("--tamanos", default="640x480,416x320,320x256,256x192", help="ANCHOxALTO separados por comas")
+    parser.add_argument("--repeticiones", type=int, default=100, help="Llamadas medidas por tamaño")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de salida (por defecto, solo stdout)")
+    parser.add_argument("--modo-interno", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo_interno:
+        print(MARCA + json.dumps(medir_tamano(args.modo_interno, args.repeticiones)), flush=True)
+        sys.exit(0)
+
+    print("Midiendo referencia 640x480...", file=sys.stderr)
+    referencia = ejecutar_en_proceso(REFERENCIA, "640x480", args.repeticiones)
+    if "error" in referencia:
+        sys.exit(f"No se pudo medir la referencia: {referencia['error']}")
+    modos = [(ESTIRADO, "640x480")] + [(tamano.strip(), tamano.strip()) for tamano in args.tamanos.split(",")
+                                       if tamano.strip()]
+
+    informe = {"parametros": {"repeticiones": args.repeticiones, "frame": f"{PROCESS_WIDTH}x{PROCESS_HEIGHT}"},
+               "tamanos": {}}
+    for nombre, tamano in modos:
+        print(f"Midiendo {nombre}...", file=sys.stderr)
+        resultado = ejecutar_en_proceso(nombre if nombre == ESTIRADO else "letterbox", tamano, args.repeticiones)
+        if "error" not in resultado:
+            resultado["precision"], resultado["recall"] = precision_recall(resultado.pop("cajas"),
+                                                                           referencia["cajas"])
+        informe["tamanos"][nombre] = resultado
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark del postprocesamiento del detector ONNX (detectors/yolo_ops.py; no carga el modelo).
+Compara el bucle original (una llamada a sigmoid/softmax por fila, sin NMS)
+contra la versión vectorizada con NMS, usando tensores sintéticos.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.postprocess_yolo
+"""
+import time
+import numpy as np
+
+from detectors.yolo_ops import postprocess, sigmoid, softmax
+
+def postprocess_bucle(outputs, conf_threshold=0.5):
+    """Implementación original fila por fila (formato legado [1, N, 85]), como referencia."""
+    detecciones = []
+    for detection in outputs[0][0]:
+        obj_conf = sigmoid(detection[4])
+        if obj_conf < conf_threshold:
+            continue
+        class_scores = softmax(detection[5:])
+        class_id = np.argmax(class_scores)
+        confidence = class_scores[class_id]
+        if confidence < conf_threshold:
+            continue
+        detecciones.append((detection[:4].tolist(), float(confidence), int(class_id)))
+    return detecciones
+
+def salida_legado(n, rng):
+    """Genera una salida sintética [1, N, 85] con ~5% de filas con objeto."""
+    out = rng.normal(0, 1, size=(1, n, 85)).astype(np.float32)
+    xy = rng.uniform(0, 600, size=(n, 2))
+    wh = rng.uniform(10, 200, size=(n, 2))
+    out[0, :, :2] = xy
+    out[0, :, 2:4] = xy + wh
+    out[0, :, 4] = np.where(rng.random(n) < 0.05, 4.0, -4.0)
+    out[0, :, 5] += np.where(rng.random(n) < 0.5, 8.0, 0.0)  # favorecer la clase persona
+    return [out]
+
+def salida_v8(n, rng):
+    """Genera una salida sintética YOLOv8 [1, 84, N] (cx, cy, w, h, scores)."""
+    out = np.zeros((1, 84, n), dtype=np.float32)
+    out[0, 0:2] = rng.uniform(0, 600, size=(2, n))
+    out[0, 2:4] = rng.uniform(10, 200, size=(2, n))
+    out[0, 4:] = rng.uniform(0, 0.3, size=(80, n))
+    out[0, 4] = np.where(rng.random(n) < 0.05, 0.9, 0.1)
+    return [out]
+
+def medir(fn, outputs, repeticiones):
+    """Retorna la latencia media en milisegundos de fn(outputs)."""
+    fn(outputs)  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn(outputs)
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    # 6300 = candidatos de YOLOv8 para 640x480; 18900 para entradas mayores
+    for n in (6300, 18900):
+        legado = salida_legado(n, rng)
+        v8 = salida_v8(n, rng)
+        t_bucle = medir(postprocess_bucle, legado, 5)
+        t_vect = medir(postprocess, legado, 50)
+        t_v8 = medir(postprocess, v8, 50)
+        print(f"N={n}: bucle {t_bucle:.2f} ms | vectorizado (legado) {t_vect:.2f} ms "
+              f"| vectorizado (YOLOv8) {t_v8:.2f} ms | aceleración x{t_bucle / t_vect:.1f}")
@@ -0,0 +1,37 @@
+"""
+Benchmark del detector de productos con 1, 5 y 15 personas por frame:
+  - roi:   una llamada por ROI de persona (comportamiento original)
+  - lote:  una sola llamada batch con todas las ROIs
+  - frame: una sola pasada sobre el frame completo + asignación por contención
+
+Usa samples/imagen_prueba.jpg a 640x480 con personas sintéticas en cuadrícula.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.products
+    IALEPH_PRODUCTS_MODEL=segmentation/best.onnx python -m benchmarks.products
+"""
+import time
+
+import cv2
+
+from benchmarks.stages import personas_en_cuadricula
+from segmentation.segmentation2 import segmentar_productos, segmentar_productos_lote, segmentar_productos_frame
+
+def medir(fn, repeticiones=10):
+    fn()  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+if __name__ == "__main__":
+    frame = cv2.resize(cv2.imread("samples/imagen_prueba.jpg"), (640, 480))
+    print(f"{'personas':>8} {'roi ms':>9} {'lote ms':>9} {'frame ms':>9}")
+    for n in (1, 5, 15):
+        bboxes = personas_en_cuadricula(n)
+        rois = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in bboxes]
+        offsets = [(x1, y1) for x1, y1, _, _ in bboxes]
+        t_roi = medir(lambda: [segmentar_productos(roi) for roi in rois])
+        t_lote = medir(lambda: segmentar_productos_lote(rois, offsets))
+        t_frame = medir(lambda: segmentar_productos_frame(frame, bboxes))
+        print(f"{n:>8} {t_roi:9.1f} {t_lote:9.1f} {t_frame:9.1f}")
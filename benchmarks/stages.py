@@ -0,0 +1,289 @@
+"""
+Benchmark de cada etapa del pipeline y del pipeline completo, con salida JSON comparable entre commits.
+
+Etapas:
+  - yolo_onnx:         detectors.yolo.detectar_personas
+  - yolo_ultralytics:  detectors.yolo2.detectar_personas
+  - tracker:           tracking.tracker.actualizar_tracker (detecciones sintéticas que se desplazan)
+  - edad_genero:       classification.age_gender.clasificar_edad_genero
+  - emocion:           classification.emotion2.reconocer_emocion
+  - productos:         segmentation.segmentation2.segmentar_productos
+  - extremo_a_extremo: detección (yolo2) + tracking + clasificar_personas, frame a frame como en main.py
+
+Entradas: samples/*.jpg, frames sintéticos con 1, 5 y 15 personas (muestras pegadas en cuadrícula) y un clip
+(--clip con un video grabado; si no se indica, un clip sintético con las personas desplazándose).
+
+Cada etapa corre en un proceso propio, así el arranque en frío (importación + carga de modelos) y el pico de
+RSS se miden aislados. Por etapa se reporta: latencia p50/p95/p99/media (ms), throughput (llamadas/s),
+arranque en frío (s), primera llamada (ms) y pico de RSS (MB).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.stages --salida bench_nuevo.json
+    python -m benchmarks.stages --etapas yolo_onnx,tracker --repeticiones 200
+    python -m benchmarks.stages --clip grabacion.mp4 --comparar bench_base.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+ANCHO = 640
+ALTO = 480
+PROCESS_WIDTH = 240    # Resolución de detección/tracking de main.py
+PROCESS_HEIGHT = 180
+# Prefijo de la línea con el resultado de una etapa (los modelos pueden imprimir en stdout)
+MARCA = "RESULTADO_ETAPA "
+
+def personas_en_cuadricula(n, ancho=ANCHO, alto=ALTO):
+    """Genera n bounding boxes de persona repartidas en una cuadrícula (a lo sumo 5 columnas)."""
+    columnas = min(n, 5)
+    filas = (n + columnas - 1) // columnas
+    w, h = ancho // columnas, alto // filas
+    return [[c * w, f * h, c * w + w, f * h + h] for f in range(filas) for c in range(columnas)][:n]
+
+def cargar_muestras():
+    """Imágenes de samples/ (BGR, 640x480)."""
+    muestras = [cv2.imread(ruta) for ruta in sorted(glob.glob("samples/*.jpg"))]
+    muestras = [cv2.resize(m, (ANCHO, ALTO)) for m in muestras if m is not None]
+    if not muestras:
+        raise FileNotFoundError("No hay imágenes en samples/*.jpg (ejecutar desde la raíz del repositorio)")
+    return muestras
+
+def frame_sintetico(muestras, bboxes):
+    """Frame gris con una muestra reducida pegada en cada bounding box (una 'persona' por caja)."""
+    frame = np.full((ALTO, ANCHO, 3), 114, dtype=np.uint8)
+    for i, (x1, y1, x2, y2) in enumerate(bboxes):
+        frame[y1:y2, x1:x2] = cv2.resize(muestras[i % len(muestras)], (x2 - x1, y2 - y1))
+    return frame
+
+def frames_sinteticos(muestras, cantidades=(1, 5, 15)):
+    return [frame_sintetico(muestras, personas_en_cuadricula(n)) for n in cantidades]
+
+def clip_sintetico(muestras, n_frames=60, n_personas=5):
+    """
+    Clip con n_personas que se desplazan en diagonal (3 px por frame, con rebote).
+    Retorna una lista de (frame, detecciones) con detecciones en el formato del detector.
+    """
+    base = personas_en_cuadricula(n_personas)
+    clip = []
+    for t in range(n_frames):
+        desplazamiento = 3 * (t % 20 if (t // 20) % 2 == 0 else 20 - t % 20)
+        bboxes = []
+        for x1, y1, x2, y2 in base:
+            # Cajas algo más chicas que la celda para que haya margen para moverse
+            w, h = (x2 - x1) * 3 // 4, (y2 - y1) * 3 // 4
+            nx = min(x1 + desplazamiento, ANCHO - w)
+            ny = min(y1 + desplazamiento // 2, ALTO - h)
+            bboxes.append([nx, ny, nx + w, ny + h])
+        detecciones = [([float(v) for v in bbox], 0.95, 0) for bbox in bboxes]
+        clip.append((frame_sintetico(muestras, bboxes), detecciones))
+    return clip
+
+def cargar_clip(ruta, muestras, n_frames=60):
+    """Frames de un video grabado (sin detecciones de referencia) o, si no hay ruta, el clip sintético."""
+    if not ruta:
+        return clip_sintetico(muestras, n_frames)
+    cap = cv2.VideoCapture(ruta)
+    clip = []
+    while len(clip) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        clip.append((cv2.resize(frame, (ANCHO, ALTO)), None))
+    cap.release()
+    if not clip:
+        raise IOError(f"No se pudo leer el clip: {ruta}")
+    return clip
+
+def rss_pico_mb():
+    """Pico de memoria residente del proceso (MB)."""
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+# Cada etapa importa sus módulos (lo que carga los modelos) y retorna (fn, entradas):
+# fn(entrada) es la llamada que se mide.
+
+def _etapa_yolo_onnx(muestras, clip):
+    from detectors.yolo import detectar_personas
+    return detectar_personas, muestras + frames_sinteticos(muestras) + [f for f, _ in clip]
+
+def _etapa_yolo_ultralytics(muestras, clip):
+    from detectors.yolo2 import detectar_personas
+    return detectar_personas, muestras + frames_sinteticos(muestras) + [f for f, _ in clip]
+
+def _etapa_tracker(muestras, clip):
+    from tracking.tracker import crear_tracker, actualizar_tracker
+    tracker = crear_tracker()
+    if clip[0][1] is None:
+        # Clip grabado: las detecciones de referencia son las del clip sintético
+        clip = [(frame, detecciones) for (frame, _), (_, detecciones)
+                in zip(clip, clip_sintetico(muestras, len(clip)))]
+    return (lambda entrada: actualizar_tracker(entrada[1], entrada[0], tracker)), clip
+
+def _etapa_edad_genero(muestras, clip):
+    from classification.age_gender import clasificar_edad_genero
+    return clasificar_edad_genero, muestras
+
+def _etapa_emocion(muestras, clip):
+    from classification.emotion2 import reconocer_emocion
+    # El modelo de emoción espera RGB (igual que pipeline/tasks.py)
+    return reconocer_emocion, [cv2.cvtColor(m, cv2.COLOR_BGR2RGB) for m in muestras]
+
+def _etapa_productos(muestras, clip):
+    from segmentation.segmentation2 import segmentar_productos
+    return segmentar_productos, muestras + frames_sinteticos(muestras)
+
+def _etapa_extremo_a_extremo(muestras, clip):
+    from detectors.yolo2 import detectar_personas
+    from tracking.tracker import crear_tracker, actualizar_tracker
+    from tracking.attributes import TrackAttributeStore
+    from pipeline.classification import clasificar_personas, obtener_motor
+
+    tracker = crear_tracker()
+    store = TrackAttributeStore()
+    motor = obtener_motor()
+    motor.esperar()
+
+    def paso(frame):
+        frame_proc = cv2.resize(frame, (PROCESS_WIDTH, PROCESS_HEIGHT))
+        detecciones, _ = detectar_personas(frame_proc)
+        personas = actualizar_tracker(detecciones, frame_proc, tracker)
+        return clasificar_personas(frame_proc, frame, personas, store, motor)
+
+    return paso, [f for f, _ in clip]
+
+ETAPAS = {
+    "yolo_onnx": _etapa_yolo_onnx,
+    "yolo_ultralytics": _etapa_yolo_ultralytics,
+    "tracker": _etapa_tracker,
+    "edad_genero": _etapa_edad_genero,
+    "emocion": _etapa_emocion,
+    "productos": _etapa_productos,
+    "extremo_a_extremo": _etapa_extremo_a_extremo,
+}
+
+def medir_etapa(nombre, repeticiones, ruta_clip=None, n_frames=60):
+    """
+    Mide una etapa en el proceso actual (llamar en un proceso nuevo para medir el arranque en frío).
+
+    Retorna:
+      - resultado: diccionario con latencias (ms), throughput, arranque y pico de RSS.
+    """
+    muestras = cargar_muestras()
+    clip = cargar_clip(ruta_clip, muestras, n_frames)
+
+    t0 = time.perf_counter()
+    fn, entradas = ETAPAS[nombre](muestras, clip)
+    arranque = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fn(entradas[0])
+    primera = time.perf_counter() - t0
+
+    latencias = np.empty(repeticiones)
+    for i in range(repeticiones):
+        entrada = entradas[(i + 1) % len(entradas)]
+        t0 = time.perf_counter()
+        fn(entrada)
+        latencias[i] = time.perf_counter() - t0
+
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "media_ms": round(float(latencias.mean() * 1000), 3),
+        "throughput": round(repeticiones / float(latencias.sum()), 2),
+        "llamadas": repeticiones,
+        "entradas": len(entradas),
+        "arranque_frio_s": round(arranque, 3),
+        "primera_llamada_ms": round(primera * 1000, 3),
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+def ejecutar_en_proceso(nombre, repeticiones, ruta_clip, n_frames, entorno=None):
+    """
+    Corre medir_etapa en un intérprete nuevo y retorna su resultado (o el error).
+    entorno: variables de entorno adicionales para el proceso (p. ej. IALEPH_RUNTIME_THREADS).
+    """
+    cmd = [sys.executable, "-m", "benchmarks.stages", "--etapa-interna", nombre,
+           "--repeticiones", str(repeticiones), "--frames", str(n_frames)]
+    if ruta_clip:
+        cmd += ["--clip", ruta_clip]
+    proceso = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, env=dict(os.environ, **(entorno or {})))
+    for linea in reversed(proceso.stdout.splitlines()):
+        if linea.startswith(MARCA):
+            return json.loads(linea[len(MARCA):])
+    return {"error": f"La etapa terminó con código {proceso.returncode} sin resultado"}
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(actual, base):
+    """Imprime la variación de p50/p95/throughput de cada etapa respecto a un JSON anterior."""
+    print(f"\nComparación con {base.get('commit')}:")
+    print(f"{'etapa':>18} {'p50 ms':>17} {'p95 ms':>17} {'throughput':>19}")
+    for nombre, r in actual["etapas"].items():
+        b = base.get("etapas", {}).get(nombre)
+        if not b or "error" in r or "error" in b:
+            continue
+        celdas = []
+        for clave in ("p50_ms", "p95_ms", "throughput"):
+            variacion = (r[clave] - b[clave]) / b[clave] * 100 if b[clave] else 0.0
+            celdas.append(f"{b[clave]:.1f}->{r[clave]:.1f} ({variacion:+.0f}%)")
+        print(f"{nombre:>18} {celdas[0]:>17} {celdas[1]:>17} {celdas[2]:>19}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark por etapa y de extremo a extremo (salida JSON).")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help="Etapas separadas por comas")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Llamadas medidas por etapa")
+    parser.add_argument("--clip", default=None, help="Video grabado para el tracker y el extremo a extremo")
+    parser.add_argument("--frames", type=int, default=60, help="Frames del clip")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de salida (por defecto, solo stdout)")
+    parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--etapa-interna", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.etapa_interna:
+        resultado = medir_etapa(args.etapa_interna, args.repeticiones, args.clip, args.frames)
+        print(MARCA + json.dumps(resultado), flush=True)
+        sys.exit(0)
+
+    etapas = [nombre.strip() for nombre in args.etapas.split(",") if nombre.strip()]
+    desconocidas = [nombre for nombre in etapas if nombre not in ETAPAS]
+    if desconocidas:
+        parser.error(f"Etapas desconocidas: {', '.join(desconocidas)} (disponibles: {', '.join(ETAPAS)})")
+
+    informe = {
+        "commit": commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "plataforma": {"python": platform.python_version(), "sistema": platform.platform(),
+                       "procesador": platform.processor() or platform.machine()},
+        "parametros": {"repeticiones": args.repeticiones, "clip": args.clip or "sintetico", "frames": args.frames},
+        "etapas": {},
+    }
+    for nombre in etapas:
+        print(f"Midiendo {nombre}...", file=sys.stderr)
+        informe["etapas"][nombre] = ejecutar_en_proceso(nombre, args.repeticiones, args.clip, args.frames)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(informe, json.load(f))
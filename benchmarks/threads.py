@@ -0,0 +1,79 @@
+"""
+Barrido del reparto de hilos entre etapas para un número de núcleos dado (pipeline/runtime.py).
+
+Para cada reparto (hilos de detección d, hilos del resto de las etapas C - d) corre una etapa de
+benchmarks/stages.py (por defecto extremo_a_extremo) en un proceso nuevo con IALEPH_RUNTIME_THREADS y,
+con --afinidad, con núcleos disjuntos por etapa (IALEPH_RUNTIME_AFFINITY). También mide la configuración
+por defecto y la sobresuscrita (todas las etapas con C hilos, como sin configuración).
+Reporta throughput y latencias de cada reparto y la configuración recomendada (mayor throughput).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.threads
+    python -m benchmarks.threads --nucleos 4 --afinidad --backend process --salida hilos.json
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.stages import ETAPAS, ejecutar_en_proceso
+
+def repartos(nucleos, afinidad):
+    """Configuraciones a medir: (nombre, variables de entorno)."""
+    candidatos = [("por_defecto", {}),
+                  ("sobresuscrito", {"IALEPH_RUNTIME_THREADS": f"*={nucleos}"})]
+    for d in range(1, nucleos):
+        entorno = {"IALEPH_RUNTIME_THREADS": f"deteccion={d};*={nucleos - d}"}
+        if afinidad:
+            entorno["IALEPH_RUNTIME_AFFINITY"] = f"deteccion=0-{d - 1};*={d}-{nucleos - 1}"
+        candidatos.append((f"deteccion={d},resto={nucleos - d}", entorno))
+    return candidatos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barrido del reparto de hilos entre etapas.")
+    parser.add_argument("--nucleos", type=int, default=os.cpu_count() or 2, help="Núcleos a repartir")
+    parser.add_argument("--etapa", default="extremo_a_extremo", help="Etapa de benchmarks/stages.py a medir")
+    parser.add_argument("--inter", type=int, default=1, help="Hilos inter-op (IALEPH_RUNTIME_INTER_THREADS)")
+    parser.add_argument("--backend", default=None, help="HEAVY_BACKEND a usar (thread o process)")
+    parser.add_argument("--afinidad", action="store_true", help="Fijar núcleos disjuntos por etapa (solo Linux)")
+    parser.add_argument("--repeticiones", type=int, default=30, help="Llamadas medidas por reparto")
+    parser.add_argument("--clip", default=None, help="Video grabado (por defecto, el clip sintético)")
+    parser.add_argument("--frames", type=int, default=60, help="Frames del clip")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de salida (por defecto, solo stdout)")
+    args = parser.parse_args()
+
+    if args.etapa not in ETAPAS:
+        parser.error(f"Etapa desconocida: {args.etapa} (disponibles: {', '.join(ETAPAS)})")
+    if args.nucleos < 2:
+        parser.error("Se necesitan al menos 2 núcleos para repartir")
+
+    comunes = {"IALEPH_RUNTIME_INTER_THREADS": str(args.inter)}
+    if args.backend:
+        comunes["IALEPH_HEAVY_BACKEND"] = args.backend
+
+    informe = {
+        "parametros": {"nucleos": args.nucleos, "etapa": args.etapa, "inter": args.inter,
+                       "backend": args.backend, "afinidad": args.afinidad, "repeticiones": args.repeticiones},
+        "repartos": {},
+    }
+    for nombre, entorno in repartos(args.nucleos, args.afinidad):
+        print(f"Midiendo {nombre}...", file=sys.stderr)
+        resultado = ejecutar_en_proceso(args.etapa, args.repeticiones, args.clip, args.frames,
+                                        dict(comunes, **entorno))
+        resultado["entorno"] = entorno
+        informe["repartos"][nombre] = resultado
+
+    validos = {nombre: r for nombre, r in informe["repartos"].items() if "error" not in r}
+    if validos:
+        mejor = max(validos, key=lambda nombre: validos[nombre]["throughput"])
+        informe["recomendado"] = {"reparto": mejor, "entorno": dict(comunes, **validos[mejor]["entorno"])}
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    if validos:
+        print(f"\nMejor reparto: {mejor} ({validos[mejor]['throughput']} llamadas/s)", file=sys.stderr)
+        for clave, valor in informe["recomendado"]["entorno"].items():
+            print(f"  export {clave}='{valor}'", file=sys.stderr)
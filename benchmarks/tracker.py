@@ -0,0 +1,185 @@
+"""
+Benchmark de los backends de tracking: latencia por actualización y cambios de ID sobre un clip.
+
+Backends:
+  - deepsort:        Deep SORT con embeddings en cada actualización (comportamiento original)
+  - deepsort_cada_n: Deep SORT con embeddings completos cada --embed-every actualizaciones
+  - iou:             IoU + Kalman solo con NumPy (tracking/iou_tracker.py)
+
+Entradas:
+  - Sin --clip: escenario sintético con personas que se cruzan, ruido en las cajas y detecciones perdidas.
+  - --clip video.mp4 --gt gt.txt: video con anotaciones en formato MOT (frame,id,x,y,w,h,...); las
+    detecciones son las cajas anotadas.
+  - --clip video.mp4 sin --gt: detecciones de detectors.yolo2; sin referencia solo se reportan los IDs
+    creados (más IDs para las mismas personas = más fragmentación).
+
+Cambios de ID: para cada persona de referencia se toma el track con el que se solapa (IoU >= 0.5) en cada
+frame; cada vez que ese track cambia respecto al anterior cuenta como un cambio de ID.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.tracker
+    python -m benchmarks.tracker --clip pasillo.mp4 --gt pasillo_gt.txt --salida tracker.json
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.stages import ANCHO, ALTO, cargar_muestras, frame_sintetico
+from tracking.iou_tracker import IouTracker, asociar, iou_matriz
+
+BACKENDS = ("deepsort", "deepsort_cada_n", "iou")
+IOU_COINCIDENCIA = 0.5
+
+def escenario_sintetico(muestras, n_frames=300, n_personas=8, semilla=0):
+    """
+    Personas que se desplazan en línea recta con rebote en los bordes (y se cruzan entre sí), con ruido
+    de ±3 px en las cajas y un 10% de detecciones perdidas.
+
+    Retorna:
+      - clip: lista de (frame, detecciones, ids_gt) con ids_gt alineados a detecciones.
+    """
+    rng = np.random.default_rng(semilla)
+    tam = rng.integers([50, 110], [80, 170], size=(n_personas, 2)).astype(np.float64)
+    pos = rng.uniform([0, 0], [ANCHO, ALTO], size=(n_personas, 2)) - tam / 2
+    vel = rng.uniform(-6, 6, size=(n_personas, 2))
+    clip = []
+    for _ in range(n_frames):
+        pos += vel
+        for eje, limite in ((0, ANCHO), (1, ALTO)):
+            fuera = (pos[:, eje] < 0) | (pos[:, eje] + tam[:, eje] > limite)
+            vel[fuera, eje] *= -1
+            pos[:, eje] = np.clip(pos[:, eje], 0, limite - tam[:, eje])
+        cajas = np.hstack([pos, pos + tam]).astype(int)
+        frame = frame_sintetico(muestras, cajas.tolist())
+        detecciones, ids = [], []
+        for i, caja in enumerate(cajas):
+            if rng.random() < 0.1:
+                continue
+            ruido = rng.uniform(-3, 3, size=4)
+            detecciones.append(([float(v) for v in caja + ruido], float(rng.uniform(0.4, 0.95)), 0))
+            ids.append(i)
+        clip.append((frame, detecciones, ids))
+    return clip
+
+def cargar_clip_mot(ruta_clip, ruta_gt, n_frames):
+    """Frames del video con las cajas anotadas (formato MOT) como detecciones."""
+    anotaciones = np.loadtxt(ruta_gt, delimiter=",", ndmin=2)
+    cap = cv2.VideoCapture(ruta_clip)
+    clip = []
+    while len(clip) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        filas = anotaciones[anotaciones[:, 0] == len(clip) + 1]
+        detecciones = [([x, y, x + w, y + h], 1.0, 0) for _, _, x, y, w, h in filas[:, :6]]
+        clip.append((frame, detecciones, filas[:, 1].astype(int).tolist()))
+    cap.release()
+    if not clip:
+        raise IOError(f"No se pudo leer el clip: {ruta_clip}")
+    return clip
+
+def cargar_clip_detectado(ruta_clip, n_frames):
+    """Frames del video con las detecciones de detectors.yolo2 (sin referencia de IDs)."""
+    from detectors.yolo2 import detectar_personas
+
+    cap = cv2.VideoCapture(ruta_clip)
+    clip = []
+    while len(clip) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        detecciones, _ = detectar_personas(frame)
+        clip.append((frame, detecciones, None))
+    cap.release()
+    if not clip:
+        raise IOError(f"No se pudo leer el clip: {ruta_clip}")
+    return clip
+
+def crear_backend(nombre, embed_every, max_perdido):
+    if nombre == "iou":
+        return IouTracker(max_perdido=max_perdido)
+    from tracking.tracker import DeepSortTracker
+    return DeepSortTracker(max_perdido=max_perdido, embed_every=embed_every if nombre == "deepsort_cada_n" else 1)
+
+def medir_backend(nombre, clip, fps, embed_every, max_perdido):
+    """
+    Corre el clip completo por un backend.
+
+    Retorna:
+      - resultado: latencias por actualización (ms), IDs creados y cambios de ID (si hay referencia).
+    """
+    tracker = crear_backend(nombre, embed_every, max_perdido)
+    latencias = np.empty(len(clip))
+    ids_creados = set()
+    asignado = {}
+    cambios = 0
+    for t, (frame, detecciones, ids_gt) in enumerate(clip):
+        t0 = time.perf_counter()
+        personas = tracker.actualizar(detecciones, frame, t / fps)
+        latencias[t] = time.perf_counter() - t0
+        ids_creados.update(p['id'] for p in personas)
+        if ids_gt is None or not personas:
+            continue
+        cajas_gt = np.array([d[0] for d in detecciones], dtype=np.float64).reshape(-1, 4)
+        cajas_tracks = np.array([p['bbox'] for p in personas], dtype=np.float64).reshape(-1, 4)
+        pares, _, _ = asociar(iou_matriz(cajas_gt, cajas_tracks), IOU_COINCIDENCIA)
+        for g, p in pares:
+            anterior = asignado.get(ids_gt[g])
+            if anterior is not None and anterior != personas[p]['id']:
+                cambios += 1
+            asignado[ids_gt[g]] = personas[p]['id']
+
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+    resultado = {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "media_ms": round(float(latencias.mean() * 1000), 3),
+        "actualizaciones": len(clip),
+        "ids_creados": len(ids_creados),
+    }
+    if clip[0][2] is not None:
+        resultado["personas_referencia"] = len({i for _, _, ids in clip for i in ids})
+        resultado["cambios_id"] = cambios
+    return resultado
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia y cambios de ID de los backends de tracking.")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Backends separados por comas")
+    parser.add_argument("--clip", default=None, help="Video grabado (por defecto, escenario sintético)")
+    parser.add_argument("--gt", default=None, help="Anotaciones MOT del clip (frame,id,x,y,w,h,...)")
+    parser.add_argument("--frames", type=int, default=300, help="Frames del clip")
+    parser.add_argument("--fps", type=float, default=30.0, help="FPS con el que se avanza el tiempo del tracker")
+    parser.add_argument("--embed-every", type=int, default=5, help="Cadencia de embeddings de deepsort_cada_n")
+    parser.add_argument("--max-perdido", type=float, default=2.0, help="Segundos sin detección antes de podar")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de salida (por defecto, solo stdout)")
+    args = parser.parse_args()
+
+    backends = [nombre.strip() for nombre in args.backends.split(",") if nombre.strip()]
+    desconocidos = [nombre for nombre in backends if nombre not in BACKENDS]
+    if desconocidos:
+        parser.error(f"Backends desconocidos: {', '.join(desconocidos)} (disponibles: {', '.join(BACKENDS)})")
+
+    if not args.clip:
+        clip = escenario_sintetico(cargar_muestras(), args.frames)
+    elif args.gt:
+        clip = cargar_clip_mot(args.clip, args.gt, args.frames)
+    else:
+        clip = cargar_clip_detectado(args.clip, args.frames)
+
+    informe = {
+        "parametros": {"clip": args.clip or "sintetico", "gt": args.gt, "frames": len(clip), "fps": args.fps,
+                       "embed_every": args.embed_every, "max_perdido": args.max_perdido},
+        "backends": {},
+    }
+    for nombre in backends:
+        informe["backends"][nombre] = medir_backend(nombre, clip, args.fps, args.embed_every, args.max_perdido)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
@@ -2,34 +2,172 @@ import os
 # Filtra los mensajes INFO y WARNING de TensorFlow
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
-from deepface import DeepFace
 import cv2
+import numpy as np
+
+from config import AGE_GENDER_BACKEND, AGE_ONNX_PATH, GENDER_ONNX_PATH
+from pipeline.metrics import cronometrar
+
+# Tamaño de entrada de las redes de edad y género de DeepFace
+INPUT_SIZE = 224
+# Etiquetas de género en el orden de salida de la red (las mismas que "dominant_gender" de DeepFace)
+GENDER_LABELS = ["Woman", "Man"]
+# Las edades se predicen como una distribución sobre 0..100 años
+_AGE_BINS = np.arange(101, dtype=np.float32)
+# Margen (años) para la confianza de la edad: masa de probabilidad a ±AGE_MARGIN de la estimación
+AGE_MARGIN = 5
+
+# Funciones batch -> probabilidades; se asignan en cargar_modelos()
+_age_forward = None
+_gender_forward = None
+
+# Buffer preasignado (B, 224, 224, 3) reutilizado entre llamadas; crece si llega un batch mayor
+_batch_buffer = np.empty((16, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+
+def construir_modelo_deepface(nombre):
+    """
+    Construye (una sola vez) la red Keras de DeepFace indicada ("Age" o "Gender"),
+    sin pasar por DeepFace.analyze. Soporta las APIs de distintas versiones de DeepFace.
+    """
+    try:
+        from deepface.modules import modeling
+        try:
+            cliente = modeling.build_model(task="facial_attribute", model_name=nombre)
+        except TypeError:
+            cliente = modeling.build_model(nombre)
+    except ImportError:
+        from deepface import DeepFace
+        cliente = DeepFace.build_model(nombre)
+    # Las versiones recientes envuelven el modelo Keras en un cliente con atributo .model
+    return getattr(cliente, "model", cliente)
+
+def _forward_keras(nombre):
+    from pipeline.runtime import configurar_tensorflow
+
+    # DeepFace usa TensorFlow: fijar sus hilos antes de construir la red
+    configurar_tensorflow("edades_generos")
+    model = construir_modelo_deepface(nombre)
+    # Llamada directa al modelo (sin model.predict ni el preprocesamiento genérico de DeepFace)
+    return lambda batch: model(batch, training=False).numpy()
+
+def _forward_onnx(ruta):
+    from pipeline.models import crear_sesion_onnx
+
+    session = crear_sesion_onnx(ruta, familia="edades_generos")
+    input_name = session.get_inputs()[0].name
+    return lambda batch: session.run(None, {input_name: batch})[0]
+
+def cargar_modelos(backend=AGE_GENDER_BACKEND):
+    """
+    Carga las redes de edad y género una sola vez y las calienta con un batch vacío,
+    para que la primera clasificación real no bloquee al hilo pesado.
+    
+    Parámetros:
+      - backend: "keras" (redes de DeepFace) u "onnx" (modelos exportados).
+    """
+    global _age_forward, _gender_forward
+    if backend == "onnx":
+        _age_forward = _forward_onnx(AGE_ONNX_PATH)
+        _gender_forward = _forward_onnx(GENDER_ONNX_PATH)
+    elif backend == "keras":
+        _age_forward = _forward_keras("Age")
+        _gender_forward = _forward_keras("Gender")
+    else:
+        raise ValueError(f"Backend de edad/género desconocido: {backend!r} (usa 'keras' u 'onnx')")
+    # Calentamiento explícito (trazado del grafo / asignación de memoria)
+    calentamiento = np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+    _age_forward(calentamiento)
+    _gender_forward(calentamiento)
+
+def preparar_batch(faces):
+    """
+    Ajusta cada rostro al formato de DeepFace: relleno a cuadrado (conservando la proporción),
+    redimensionado a 224x224 y normalizado a [0, 1].
+    
+    Parámetros:
+      - faces: Lista de imágenes de rostro (numpy arrays BGR).
+    
+    Retorna:
+      - batch: vista (len(faces), 224, 224, 3) float32. Se sobrescribe en la siguiente llamada.
+    """
+    global _batch_buffer
+    if len(faces) > len(_batch_buffer):
+        _batch_buffer = np.empty((len(faces), INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+    batch = _batch_buffer[:len(faces)]
+    batch.fill(0)
+    for i, face in enumerate(faces):
+        alto, ancho = face.shape[:2]
+        escala = INPUT_SIZE / max(alto, ancho)
+        nuevo_ancho = max(1, int(ancho * escala))
+        nuevo_alto = max(1, int(alto * escala))
+        redimensionada = cv2.resize(face, (nuevo_ancho, nuevo_alto))
+        # Centrar la imagen en el lienzo negro (mismo relleno que DeepFace)
+        y0 = (INPUT_SIZE - nuevo_alto) // 2
+        x0 = (INPUT_SIZE - nuevo_ancho) // 2
+        batch[i, y0:y0 + nuevo_alto, x0:x0 + nuevo_ancho] = redimensionada
+    batch /= 255.0
+    return batch
+
+@cronometrar("edad_genero")
+def clasificar_edades_generos(faces):
+    """
+    Clasifica edad y género de varios rostros con una sola llamada a cada red.
+    
+    Parámetros:
+      - faces: Lista de imágenes de rostro (numpy arrays BGR).
+    
+    Retorna:
+      - resultados: Lista de diccionarios (mismo orden que faces) con:
+          "edad" (int), "edad_confianza" (probabilidad a ±AGE_MARGIN años),
+          "genero" ("Woman"/"Man") y "genero_confianza".
+    """
+    if len(faces) == 0:
+        return []
+    if _age_forward is None:
+        cargar_modelos()
+    batch = preparar_batch(faces)
+    age_probs = np.asarray(_age_forward(batch)).reshape(len(faces), -1)
+    gender_probs = np.asarray(_gender_forward(batch)).reshape(len(faces), -1)
+
+    # Edad aparente = esperanza de la distribución (igual que DeepFace)
+    edades = age_probs @ _AGE_BINS
+    cerca = np.abs(_AGE_BINS[None, :] - edades[:, None]) <= AGE_MARGIN
+    edad_confianzas = (age_probs * cerca).sum(axis=1)
+    generos = gender_probs.argmax(axis=1)
+
+    return [
+        {
+            "edad": int(round(float(edad))),
+            "edad_confianza": float(conf_edad),
+            "genero": GENDER_LABELS[int(g)],
+            "genero_confianza": float(gender_probs[i, g]),
+        }
+        for i, (edad, conf_edad, g) in enumerate(zip(edades, edad_confianzas, generos))
+    ]
 
 def clasificar_edad_genero(face_img):
     """
     Clasifica la edad y el género a partir de una imagen que contenga el rostro.
     
     Parámetros:
-      - face_img: Imagen del rostro (numpy array) extraída de la región de interés.
+      - face_img: Imagen del rostro (numpy array BGR) extraída de la región de interés.
     
     Retorna:
-      - edad: Edad predicha (o 'Desconocido' si no se detecta).
-      - genero dominante: Género predicho (o 'Desconocido' si no se detecta).
+      - edad: Edad predicha (o 'Desconocido' si falla el análisis).
+      - genero dominante: Género predicho (o 'Desconocido' si falla el análisis).
     """
     try:
-        result = DeepFace.analyze(face_img, actions=['age', 'gender'], enforce_detection=False)  
-        # Si DeepFace devuelve una lista, tomar el primer elemento
-        if isinstance(result, list):
-            result = result[0]
-            edad = result.get("age", "Desconocido")
-            genero = result.get("dominant_gender", "Desconocido")
-        return edad, genero
+        resultado = clasificar_edades_generos([face_img])[0]
+        return resultado["edad"], resultado["genero"]
     except Exception as e:
         print("Error en el análisis:", e)
-        return "Sin detección"
+        return "Desconocido", "Desconocido"
+
+# Cargar y calentar las redes al importar el módulo (una sola vez por proceso)
+cargar_modelos()
 
 # Bloque de prueba (se ejecuta solo si se corre este archivo directamente)
 if __name__ == "__main__":
-    face = cv2.imread('/home/jared/Desktop/IAleph/samples/imagen_prueba.jpg')
+    face = cv2.imread('samples/imagen_prueba.jpg')
     edad, genero = clasificar_edad_genero(face)
     print(f"Edad: {edad}, Género: {genero}")
@@ -1,51 +1,116 @@
-from tensorflow.keras.models import load_model  # Usamos tf.keras para garantizar compatibilidad
-from tensorflow.keras.layers import DepthwiseConv2D as BaseDepthwiseConv2D
-from tensorflow.keras.utils import get_custom_objects
 import cv2
 import numpy as np
 
+from config import EMOTION_BACKEND, EMOTION_MODEL_PATH, EMOTION_ONNX_PATH, EMOTION_LABELS_PATH
+from pipeline.metrics import cronometrar
+
 # Deshabilitar la notación científica para mayor claridad (opcional)
 np.set_printoptions(suppress=True)
 
-# Definimos una clase personalizada que ignora el argumento "groups"
-class DepthwiseConv2DCompat(BaseDepthwiseConv2D):
-    def __init__(self, **kwargs):
-        # Eliminar "groups" de los argumentos si existe
-        kwargs.pop("groups", None)
-        super().__init__(**kwargs)
+# Tamaño de entrada del modelo
+INPUT_SIZE = 224
+
+def _cargar_backend_keras(ruta):
+    """
+    Carga el modelo .h5 con TensorFlow y retorna una función batch -> probabilidades.
+    TensorFlow solo se importa aquí, de modo que el backend ONNX nunca lo carga.
+    """
+    import tensorflow as tf
+    from classification.keras_compat import cargar_modelo_keras
+    from pipeline.runtime import configurar_tensorflow
+
+    configurar_tensorflow("emociones")
+    model = cargar_modelo_keras(ruta)
+
+    # Llamada directa al modelo compilada con tf.function: evita la sobrecarga por llamada de model.predict.
+    # La firma acepta cualquier tamaño de batch, así que solo se traza una vez.
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, INPUT_SIZE, INPUT_SIZE, 3), dtype=tf.float32)])
+    def forward(batch):
+        return model(batch, training=False)
 
-# Registrar la clase personalizada con el nombre que espera el modelo (usualmente "DepthwiseConv2D")
-get_custom_objects()["DepthwiseConv2D"] = DepthwiseConv2DCompat
+    return lambda batch: forward(tf.constant(batch)).numpy()
 
-# Cargar el modelo usando el diccionario de objetos personalizados
-model = load_model("keras_model_emotion.h5", compile=False)
+def _cargar_backend_onnx(ruta):
+    """Carga el modelo exportado a ONNX con onnxruntime y retorna una función batch -> probabilidades."""
+    from pipeline.models import crear_sesion_onnx
+
+    session = crear_sesion_onnx(ruta, familia="emociones")
+    input_name = session.get_inputs()[0].name
+    return lambda batch: session.run(None, {input_name: batch})[0]
+
+# Cargar el modelo con el backend elegido en config.py
+if EMOTION_BACKEND == "onnx":
+    _forward = _cargar_backend_onnx(EMOTION_ONNX_PATH)
+elif EMOTION_BACKEND == "keras":
+    _forward = _cargar_backend_keras(EMOTION_MODEL_PATH)
+else:
+    raise ValueError(f"Backend de emociones desconocido: {EMOTION_BACKEND!r} (usa 'keras' u 'onnx')")
 
 # Cargar las etiquetas (asegúrate que "labels_emotion.txt" tenga una etiqueta por línea)
-with open("labels_emotion.txt", "r") as f:
+with open(EMOTION_LABELS_PATH, "r") as f:
     emotion_labels = [line.strip() for line in f.readlines()]
 
+# Buffer preasignado (B, 224, 224, 3) reutilizado entre llamadas; crece si llega un batch mayor
+_batch_buffer = np.empty((16, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+
+def preparar_batch(rois):
+    """
+    Redimensiona y normaliza las ROIs en el buffer preasignado.
+    
+    Parámetros:
+      - rois: Lista de imágenes (numpy arrays).
+    
+    Retorna:
+      - batch: vista (len(rois), 224, 224, 3) float32 normalizada a [-1, 1].
+        Se sobrescribe en la siguiente llamada.
+    """
+    global _batch_buffer
+    if len(rois) > len(_batch_buffer):
+        _batch_buffer = np.empty((len(rois), INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+    batch = _batch_buffer[:len(rois)]
+    for i, roi in enumerate(rois):
+        # cv2.resize escribe uint8; la conversión y normalización se hacen en el buffer
+        batch[i] = cv2.resize(roi, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_AREA)
+    # Normalizar a [-1, 1] en el propio buffer
+    batch /= 127.5
+    batch -= 1
+    return batch
+
+@cronometrar("emocion")
+def reconocer_emociones(rois, probabilidades=False):
+    """
+    Detecta la emoción predominante en varias imágenes de rostro con una sola llamada al modelo.
+    
+    Parámetros:
+      - rois: Lista de imágenes (numpy arrays), una por persona.
+      - probabilidades: Si es True, cada resultado incluye además la distribución completa.
+    
+    Retorna:
+      - resultados: Lista de tuplas (emoción, confidence), en el mismo orden que rois; con
+        probabilidades=True, (emoción, confidence, {etiqueta: probabilidad}).
+    """
+    if len(rois) == 0:
+        return []
+    prediction = np.asarray(_forward(preparar_batch(rois)))
+    indices = prediction.argmax(axis=1)
+    if probabilidades:
+        return [(emotion_labels[int(idx)], float(prediction[i, idx]),
+                 dict(zip(emotion_labels, prediction[i].tolist())))
+                for i, idx in enumerate(indices)]
+    return [(emotion_labels[int(idx)], float(prediction[i, idx])) for i, idx in enumerate(indices)]
+
 def reconocer_emocion(face_img):
     """
-    Detecta la emoción predominante en la imagen del rostro, usando el modelo Keras.
+    Detecta la emoción predominante en la imagen del rostro, usando el backend configurado.
     
     Parámetros:
       - face_img: Imagen del rostro (numpy array). Se espera que sea la ROI extraída desde el frame.
     
     Retorna:
-      - emoción: La emoción detectada (cadena de texto).
-      - confidence: La confianza de la predicción (valor entre 0 y 1).
+      - emoción: La emoción detectada (cadena de texto). Para la confianza, usar reconocer_emociones.
     """
-    # Redimensionar la imagen a 224x224 (tamaño de entrada del modelo)
-    img = cv2.resize(face_img, (224, 224), interpolation=cv2.INTER_AREA)
-    # Convertir la imagen a float32 y cambiar la forma para tener dimensión de batch
-    img = np.asarray(img, dtype=np.float32).reshape(1, 224, 224, 3)
-    # Normalizar la imagen (esto depende de cómo se entrenó el modelo; aquí se asume una escala de -1 a 1)
-    img = (img / 127.5) - 1
-    # Ejecutar la predicción
-    prediction = model.predict(img, verbose=0)
-    index = int(np.argmax(prediction))
-    emotion = emotion_labels[index]
-    # confidence = float(prediction[0][index])
+    # Se reutiliza el camino por lotes con un batch de tamaño 1
+    emotion, _ = reconocer_emociones([face_img])[0]
     return emotion
 
 if __name__ == "__main__":
@@ -58,7 +123,8 @@ if __name__ == "__main__":
         # Opcional: redimensionar la imagen para visualización
         image_disp = cv2.resize(image, (224, 224))
         cv2.imshow("Webcam Image", image_disp)
-        emotion, conf = reconocer_emocion(image)
+        # reconocer_emocion solo retorna la etiqueta; la confianza viene del camino por lotes
+        emotion, conf = reconocer_emociones([image])[0]
         print("Emotion:", emotion, "Confidence:", conf)
         if cv2.waitKey(1) & 0xFF == 27:
             break
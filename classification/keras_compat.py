@@ -0,0 +1,26 @@
+from tensorflow.keras.models import load_model  # Usamos tf.keras para garantizar compatibilidad
+from tensorflow.keras.layers import DepthwiseConv2D as BaseDepthwiseConv2D
+from tensorflow.keras.utils import get_custom_objects
+
+# Definimos una clase personalizada que ignora el argumento "groups"
+# (los modelos exportados por Teachable Machine lo incluyen y las versiones recientes de Keras lo rechazan)
+class DepthwiseConv2DCompat(BaseDepthwiseConv2D):
+    def __init__(self, **kwargs):
+        # Eliminar "groups" de los argumentos si existe
+        kwargs.pop("groups", None)
+        super().__init__(**kwargs)
+
+# Registrar la clase personalizada con el nombre que espera el modelo (usualmente "DepthwiseConv2D")
+get_custom_objects()["DepthwiseConv2D"] = DepthwiseConv2DCompat
+
+def cargar_modelo_keras(ruta):
+    """
+    Carga un modelo .h5 de Teachable Machine con la capa DepthwiseConv2D compatible.
+    
+    Parámetros:
+      - ruta: ruta al archivo .h5.
+    
+    Retorna:
+      - model: modelo tf.keras sin compilar (solo inferencia).
+    """
+    return load_model(ruta, compile=False)
@@ -0,0 +1,41 @@
+import cv2
+
+from config import FACE_MODEL_PATH, FACE_SCORE_THRESHOLD, FACE_MIN_SIZE
+from pipeline.metrics import cronometrar
+from pipeline.runtime import configurar_opencv
+
+# Hilos de OpenCV (DNN) de la etapa de rostros
+configurar_opencv("rostros")
+
+# Cargar el detector de rostros YuNet (ligero, corre en CPU con el módulo DNN de OpenCV).
+# El tamaño de entrada se ajusta en cada llamada al tamaño del frame.
+face_detector = cv2.FaceDetectorYN.create(FACE_MODEL_PATH, "", (320, 320), FACE_SCORE_THRESHOLD)
+
+@cronometrar("rostros")
+def detectar_rostros(frame):
+    """
+    Detecta todos los rostros del frame en una sola pasada.
+    
+    Parámetros:
+      - frame: Imagen BGR (numpy array) a resolución de captura.
+    
+    Retorna:
+      - rostros: Lista de tuplas ([x1, y1, x2, y2], score), solo con rostros de al menos FACE_MIN_SIZE píxeles.
+    """
+    alto, ancho = frame.shape[:2]
+    face_detector.setInputSize((ancho, alto))
+    _, faces = face_detector.detect(frame)
+    if faces is None:
+        return []
+    rostros = []
+    # Cada fila: x, y, w, h, 5 landmarks (x, y), score
+    for x, y, w, h, score in faces[:, [0, 1, 2, 3, 14]]:
+        if w < FACE_MIN_SIZE or h < FACE_MIN_SIZE:
+            continue
+        rostros.append(([float(x), float(y), float(x + w), float(y + h)], float(score)))
+    return rostros
+
+if __name__ == "__main__":
+    # Bloque de prueba: detectar rostros en una imagen de muestra
+    frame = cv2.imread('samples/imagen_prueba.jpg')
+    print("Rostros:", detectar_rostros(frame))
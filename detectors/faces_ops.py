@@ -0,0 +1,68 @@
+"""
+Operaciones puras sobre rostros ya detectados: asignación a personas, calidad y región de recorte.
+Están separadas de detectors/faces.py (que crea el detector YuNet al importarse) para que quien solo
+las usa (pipeline/classification.py, las tareas de emoción y edad/género) no cargue el modelo.
+"""
+import numpy as np
+
+def asignar_rostros(bboxes, rostros):
+    """
+    Asigna a cada persona el rostro de mayor score cuyo centro cae dentro de su bounding box.
+    
+    Parámetros:
+      - bboxes: Lista de bounding boxes [x1, y1, x2, y2] de las personas (mismas coordenadas que los rostros).
+      - rostros: Salida de detectar_rostros.
+    
+    Retorna:
+      - asignados: Lista (mismo orden que bboxes) con el rostro asignado o None si no hay ninguno.
+    """
+    asignados = [None] * len(bboxes)
+    if not rostros or not bboxes:
+        return asignados
+    cajas = np.asarray(bboxes, dtype=np.float32)
+    usados = set()
+    # Recorrer los rostros de mayor a menor score; cada rostro se asigna a una sola persona
+    for j in sorted(range(len(rostros)), key=lambda k: -rostros[k][1]):
+        fx1, fy1, fx2, fy2 = rostros[j][0]
+        cx, cy = (fx1 + fx2) / 2, (fy1 + fy2) / 2
+        dentro = ((cajas[:, 0] <= cx) & (cx <= cajas[:, 2]) &
+                  (cajas[:, 1] <= cy) & (cy <= cajas[:, 3]))
+        for i in np.flatnonzero(dentro):
+            if i not in usados:
+                asignados[i] = rostros[j]
+                usados.add(i)
+                break
+    return asignados
+
+def calidad_rostro(rostro, lado_referencia=64):
+    """
+    Calidad de un rostro entre 0 y 1: score del detector penalizado si el rostro es menor que lado_referencia.
+    
+    Parámetros:
+      - rostro: Tupla ([x1, y1, x2, y2], score) de detectar_rostros.
+      - lado_referencia: Lado (en píxeles de la captura) a partir del cual el tamaño ya no penaliza.
+    """
+    (x1, y1, x2, y2), score = rostro
+    return float(score) * min(1.0, min(x2 - x1, y2 - y1) / lado_referencia)
+
+def region_rostro(forma, box, margen=0.2):
+    """
+    Región de recorte del rostro con un margen relativo alrededor de la caja, limitada al frame.
+    Se calcula una sola vez por rostro: la usan el filtro de rostros utilizables y las tareas que recortan.
+    
+    Parámetros:
+      - forma: frame.shape de la imagen BGR a resolución de captura.
+      - box: [x1, y1, x2, y2] del rostro.
+      - margen: Fracción del tamaño del rostro que se añade a cada lado.
+    
+    Retorna:
+      - region: (x1, y1, x2, y2) enteros (el recorte es frame[y1:y2, x1:x2]) o None si queda vacía.
+    """
+    alto, ancho = forma[:2]
+    x1, y1, x2, y2 = box
+    mx, my = (x2 - x1) * margen, (y2 - y1) * margen
+    x1, y1 = max(0, int(x1 - mx)), max(0, int(y1 - my))
+    x2, y2 = min(ancho, int(x2 + mx)), min(alto, int(y2 + my))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
@@ -1,107 +1,157 @@
+import threading
+
 import cv2
 import numpy as np
-import onnxruntime as ort
+from config import DETECTOR_INPUT_SIZE
+from detectors.yolo_ops import geometria_letterbox, postprocess
+from pipeline.metrics import cronometrar
+from pipeline.models import crear_sesion_onnx
 
-# Cargar el modelo ONNX generado
-session = ort.InferenceSession("yolov8n.onnx")
+# Cargar el modelo ONNX generado (tools/export_yolo_onnx.py lo exporta con ejes de batch y tamaño dinámicos)
+session = crear_sesion_onnx("yolov8n.onnx", familia="deteccion")
+INPUT_NAME = session.get_inputs()[0].name
+_forma = session.get_inputs()[0].shape
+# True si el modelo acepta lotes de cualquier tamaño (eje 0 simbólico); si no, el lote se procesa frame a frame
+BATCH_DINAMICO = not isinstance(_forma[0], int)
 
-def preprocess(frame):
-    """
-    Convierte el frame de OpenCV (BGR) a un tensor adecuado para el modelo ONNX.
-    - Redimensiona la imagen a 640x480 (ancho x alto) para que coincida con lo esperado por el modelo.
-    - Convierte BGR a RGB.
-    - Normaliza la imagen a valores entre 0 y 1.
-    - Reordena la imagen a formato [1, 3, H, W].
-    """
-    # Redimensionar la imagen a 640x480
-    frame_resized = cv2.resize(frame, (640, 480))
-    
-    # Convertir BGR a RGB
-    rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-    
-    # Normalizar a [0, 1]
-    rgb = rgb.astype(np.float32) / 255.0
-    
-    # Reordenar dimensiones: de (H, W, C) a (C, H, W)
-    tensor = np.transpose(rgb, (2, 0, 1))
-    
-    # Agregar dimensión batch: (1, C, H, W)
-    tensor = np.expand_dims(tensor, axis=0)
-    return tensor
+# Dimensiones de entrada del modelo ONNX (ancho, alto). Un modelo exportado con tamaño fijo impone el suyo;
+# con tamaño dinámico se usa DETECTOR_INPUT_SIZE (múltiplos de 32)
+if isinstance(_forma[2], int) and isinstance(_forma[3], int):
+    INPUT_WIDTH, INPUT_HEIGHT = _forma[3], _forma[2]
+else:
+    INPUT_WIDTH, INPUT_HEIGHT = DETECTOR_INPUT_SIZE
+# Valor de relleno del letterbox (gris 114, como en el entrenamiento de YOLOv8), ya normalizado
+RELLENO = 114 / 255.0
+
+# Buffers reutilizados entre llamadas, uno por hilo: tensor NCHW float32 y redimensionados uint8 por tamaño
+_buffers = threading.local()
 
-def sigmoid(x):
-    """Aplica la función sigmoide."""
-    return 1 / (1 + np.exp(-x))
+def _buffer_redimensionado(ancho, alto):
+    cache = getattr(_buffers, "redimensionados", None)
+    if cache is None:
+        cache = _buffers.redimensionados = {}
+    if (ancho, alto) not in cache:
+        cache[(ancho, alto)] = np.empty((alto, ancho, 3), dtype=np.uint8)
+    return cache[(ancho, alto)]
 
-def softmax(x):
-    """Aplica la función softmax."""
-    e_x = np.exp(x - np.max(x))
-    return e_x / e_x.sum()
+def _tensor(n):
+    """Tensor [n, 3, H, W] float32 preasignado del hilo (se reasigna solo si cambia n)."""
+    tensor = getattr(_buffers, "tensor", None)
+    if tensor is None or tensor.shape[0] != n:
+        tensor = _buffers.tensor = np.empty((n, 3, INPUT_HEIGHT, INPUT_WIDTH), dtype=np.float32)
+    return tensor
 
-def postprocess(outputs, conf_threshold=0.5):
+def letterbox(frame, destino):
     """
-    Postprocesa la salida del modelo ONNX para extraer las detecciones.
-    Se asume que la salida es un tensor de forma [1, N, 85]:
-      - Los primeros 4 valores son [x1, y1, x2, y2].
-      - El 5º valor es la confianza del objeto (raw score).
-      - Los restantes (80 para COCO) son los scores crudos para cada clase.
-    
+    Escribe el frame en destino ([3, H, W] float32) conservando su aspecto: un solo resize, y la conversión
+    BGR->RGB, el paso a CHW y la normalización a [0, 1] en una sola operación sobre el buffer.
+    El resto del tensor se rellena con gris.
+
     Retorna:
-      - detecciones: Lista de tuplas con (bounding box, confidence, class_id),
-        donde 'confidence' es la probabilidad de la clase detectada.
+      - transformacion: (escala, dx, dy) para llevar las cajas de la entrada del modelo al frame
+        (x_frame = (x_modelo - dx) / escala).
     """
-    detecciones = []
-    output = outputs[0]  # Se asume que la salida principal es el primer elemento
-    
-    # Iterar sobre cada detección (suponemos batch_size=1)
-    for detection in output[0]:
-        # Aplicar sigmoide a la confianza del objeto
-        obj_conf = sigmoid(detection[4])
-        if obj_conf < conf_threshold:
-            continue
+    alto, ancho = frame.shape[:2]
+    escala, nuevo_ancho, nuevo_alto, dx, dy = geometria_letterbox(ancho, alto, INPUT_WIDTH, INPUT_HEIGHT)
 
-        # Aplicar softmax a los scores de las clases (valores crudos)
-        class_scores = softmax(detection[5:])
-        class_id = np.argmax(class_scores)
-        # Usar la probabilidad de la clase detectada
-        confidence = class_scores[class_id]
-        if confidence < conf_threshold:
-            continue
+    redimensionado = cv2.resize(frame, (nuevo_ancho, nuevo_alto), dst=_buffer_redimensionado(nuevo_ancho, nuevo_alto),
+                                interpolation=cv2.INTER_LINEAR)
+    # Franjas de relleno (arriba/abajo o izquierda/derecha)
+    destino[:, :dy] = RELLENO
+    destino[:, dy + nuevo_alto:] = RELLENO
+    destino[:, dy:dy + nuevo_alto, :dx] = RELLENO
+    destino[:, dy:dy + nuevo_alto, dx + nuevo_ancho:] = RELLENO
+    # BGR (H, W, C) -> RGB (C, H, W) como vista, normalizada directamente sobre el buffer
+    np.multiply(redimensionado[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0,
+                out=destino[:, dy:dy + nuevo_alto, dx:dx + nuevo_ancho], casting="unsafe")
+    return escala, dx, dy
 
-        # Extraer el bounding box (los primeros 4 valores)
-        box = detection[:4].tolist()
-        # Agregar la detección en el formato (bbox, confidence, class_id)
-        detecciones.append((box, float(confidence), int(class_id)))
-    
-    return detecciones
+def preprocess(frame):
+    """
+    Convierte el frame de OpenCV (BGR) a un tensor [1, 3, H, W] para el modelo ONNX, con letterbox
+    (sin deformar el aspecto) a INPUT_WIDTH x INPUT_HEIGHT.
+    El tensor es un buffer reutilizado: es válido hasta la siguiente llamada desde el mismo hilo.
+
+    Retorna:
+      - tensor: Entrada del modelo.
+      - transformacion: (escala, dx, dy) para reproyectar las cajas (ver letterbox).
+    """
+    tensor = _tensor(1)
+    return tensor, letterbox(frame, tensor[0])
 
-def detectar_personas(frame, conf_threshold=0.5):
+def preprocess_lote(frames):
+    """
+    Igual que preprocess, pero para varios frames: retorna un tensor [B, 3, H, W] y una transformación
+    por frame. Cada frame se escribe directamente en su posición del tensor (sin tensores intermedios).
+    """
+    tensor = _tensor(len(frames))
+    return tensor, [letterbox(frame, tensor[i]) for i, frame in enumerate(frames)]
+
+@cronometrar("yolo_onnx")
+def detectar_personas(frame, conf_threshold=0.5, iou_threshold=0.45):
     """
     Ejecuta el modelo ONNX optimizado sobre el frame actual para detectar personas.
     
     Parámetros:
       - frame: Imagen (frame) capturada de la cámara (numpy array).
       - conf_threshold: Umbral de confianza para filtrar detecciones.
+      - iou_threshold: Umbral de IoU para el NMS.
     
     Retorna:
       - detecciones: Lista de detecciones en el formato:
-          ( [x1, y1, x2, y2], confidence, class_id )
+          ( [x1, y1, x2, y2], confidence, class_id ), en coordenadas del frame recibido.
       - outputs: Salida completa del modelo ONNX.
     """
-    # Preprocesar el frame para convertirlo en un tensor
-    input_tensor = preprocess(frame)
+    # Preprocesar el frame para convertirlo en un tensor (letterbox)
+    input_tensor, transformacion = preprocess(frame)
     
     # Ejecutar la inferencia usando ONNX Runtime
-    outputs = session.run(None, {"input": input_tensor})
+    outputs = session.run(None, {INPUT_NAME: input_tensor})
     
-    # Postprocesar la salida para extraer las detecciones
-    detecciones = postprocess(outputs, conf_threshold)
+    # Postprocesar la salida para extraer las detecciones (ya reproyectadas al frame)
+    alto, ancho = frame.shape[:2]
+    detecciones = postprocess(outputs, conf_threshold, iou_threshold, frame_size=(ancho, alto),
+                              transformacion=transformacion)
     
     return detecciones, outputs
 
+@cronometrar("yolo_onnx_lote")
+def detectar_personas_lote(frames, conf_threshold=0.5, iou_threshold=0.45):
+    """
+    Ejecuta el modelo ONNX sobre varios frames en una sola llamada (requiere eje de batch dinámico;
+    con un modelo de batch fijo se ejecuta frame a frame).
+    
+    Parámetros:
+      - frames: Lista de imágenes (numpy arrays); pueden tener tamaños distintos.
+      - conf_threshold: Umbral de confianza para filtrar detecciones.
+      - iou_threshold: Umbral de IoU para el NMS.
+    
+    Retorna:
+      - detecciones_lote: Lista (una por frame) de listas de detecciones
+          ( [x1, y1, x2, y2], confidence, class_id ), en coordenadas de cada frame.
+    """
+    if not frames:
+        return []
+    if BATCH_DINAMICO:
+        tensor, transformaciones = preprocess_lote(frames)
+        salida = session.run(None, {INPUT_NAME: tensor})[0]
+    else:
+        salidas, transformaciones = [], []
+        for frame in frames:
+            tensor, transformacion = preprocess(frame)
+            salidas.append(session.run(None, {INPUT_NAME: tensor})[0])
+            transformaciones.append(transformacion)
+        salida = np.concatenate(salidas)
+    detecciones_lote = []
+    for i, (frame, transformacion) in enumerate(zip(frames, transformaciones)):
+        alto, ancho = frame.shape[:2]
+        detecciones_lote.append(postprocess([salida[i:i + 1]], conf_threshold, iou_threshold,
+                                            frame_size=(ancho, alto), transformacion=transformacion))
+    return detecciones_lote
+
 if __name__ == "__main__":
     # Bloque de prueba: cargar una imagen de prueba y verificar las detecciones
-    frame = cv2.imread('/home/jared/Desktop/IAleph/samples/imagen_prueba.jpg')
+    frame = cv2.imread('samples/imagen_prueba.jpg')
     if frame is None:
         print("Error al cargar la imagen.")
     else:
@@ -1,9 +1,16 @@
 import cv2
 from ultralytics import YOLO
 
+from pipeline.metrics import cronometrar
+from pipeline.runtime import configurar_torch
+
+# Hilos de torch de la etapa de detección (antes de crear el modelo)
+configurar_torch("deteccion")
+
 # Cargar el modelo YOLOv8 (versión ligera para mayor velocidad)
 yolo_model = YOLO('yolov8n.pt')
 
+@cronometrar("yolo_ultralytics")
 def detectar_personas(frame):
     """
     Ejecuta YOLOv8 sobre el frame actual para detectar personas.
@@ -32,8 +39,34 @@ def detectar_personas(frame):
     
     return detecciones, results
 
+@cronometrar("yolo_ultralytics_lote")
+def detectar_personas_lote(frames, conf_threshold=0.9):
+    """
+    Ejecuta YOLOv8 sobre varios frames (por ejemplo, uno por cámara) en una sola llamada batch.
+    
+    Parámetros:
+      - frames: Lista de imágenes (numpy arrays).
+      - conf_threshold: Umbral de confianza para filtrar detecciones.
+    
+    Retorna:
+      - detecciones_lote: Lista (una por frame) de listas de detecciones ( [x1, y1, x2, y2], confidence, class_id ).
+    """
+    if not frames:
+        return []
+    results = yolo_model(frames, verbose=False)
+    detecciones_lote = []
+    for result in results:
+        boxes = result.boxes
+        detecciones = [
+            (box.tolist(), float(conf), int(cls))
+            for box, conf, cls in zip(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+            if int(cls) == 0 and float(conf) > conf_threshold
+        ]
+        detecciones_lote.append(detecciones)
+    return detecciones_lote
+
 if __name__ == "__main__":
     # Bloque de prueba: cargar una imagen y verificar las detecciones
-    frame = cv2.imread('/home/jared/Desktop/IAleph/samples/imagen_prueba.jpg')
+    frame = cv2.imread('samples/imagen_prueba.jpg')
     detecciones, _ = detectar_personas(frame)
     print("Detecciones:", detecciones)
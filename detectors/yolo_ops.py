@@ -0,0 +1,162 @@
+"""
+Operaciones puras (solo NumPy) del detector ONNX: activaciones, conversión de cajas, NMS, geometría
+del letterbox y el postprocesamiento de la salida. Están separadas de detectors/yolo.py (que carga el modelo al importarse) para poder
+usarlas y probarlas sin los pesos del modelo.
+"""
+import numpy as np
+
+# Clase "persona" en COCO
+PERSON_CLASS_ID = 0
+
+def sigmoid(x):
+    """Aplica la función sigmoide (funciona sobre arreglos completos)."""
+    return 1 / (1 + np.exp(-x))
+
+def softmax(x, axis=-1):
+    """Aplica la función softmax sobre el eje indicado (por defecto, por fila)."""
+    e_x = np.exp(x - np.max(x, axis=axis, keepdims=True))
+    return e_x / e_x.sum(axis=axis, keepdims=True)
+
+def xywh_a_xyxy(boxes):
+    """Convierte cajas [cx, cy, w, h] a [x1, y1, x2, y2] (arreglo Nx4)."""
+    xyxy = np.empty_like(boxes)
+    mitad_w = boxes[:, 2] / 2
+    mitad_h = boxes[:, 3] / 2
+    xyxy[:, 0] = boxes[:, 0] - mitad_w
+    xyxy[:, 1] = boxes[:, 1] - mitad_h
+    xyxy[:, 2] = boxes[:, 0] + mitad_w
+    xyxy[:, 3] = boxes[:, 1] + mitad_h
+    return xyxy
+
+def nms(boxes, scores, class_ids, iou_threshold=0.45):
+    """
+    Non-max suppression por clase, vectorizada con NumPy.
+    Las cajas de clases distintas se desplazan a regiones disjuntas (offset por clase),
+    de modo que un solo NMS equivale a un NMS independiente por clase.
+    
+    Parámetros:
+      - boxes: arreglo Nx4 en formato [x1, y1, x2, y2].
+      - scores: arreglo N con la confianza de cada caja.
+      - class_ids: arreglo N con la clase de cada caja.
+      - iou_threshold: IoU a partir del cual se suprime una caja.
+    
+    Retorna:
+      - keep: índices (ordenados por confianza descendente) de las cajas conservadas.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    offset = class_ids.astype(np.float32)[:, None] * (float(boxes.max()) + 1.0)
+    b = boxes + offset
+    x1, y1, x2, y2 = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        resto = order[1:]
+        # IoU de la caja actual contra todas las restantes en una sola operación
+        ix1 = np.maximum(x1[i], x1[resto])
+        iy1 = np.maximum(y1[i], y1[resto])
+        ix2 = np.minimum(x2[i], x2[resto])
+        iy2 = np.minimum(y2[i], y2[resto])
+        inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+        iou = inter / (areas[i] + areas[resto] - inter + 1e-9)
+        order = resto[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+def geometria_letterbox(ancho, alto, ancho_entrada, alto_entrada):
+    """
+    Geometría del letterbox de un frame de ancho x alto en una entrada de ancho_entrada x alto_entrada:
+    se escala conservando el aspecto y se centra, rellenando el resto.
+
+    Retorna:
+      - (escala, nuevo_ancho, nuevo_alto, dx, dy): tamaño del frame escalado y su desplazamiento en la entrada.
+    """
+    escala = min(ancho_entrada / ancho, alto_entrada / alto)
+    nuevo_ancho = min(ancho_entrada, max(1, round(ancho * escala)))
+    nuevo_alto = min(alto_entrada, max(1, round(alto * escala)))
+    return escala, nuevo_ancho, nuevo_alto, (ancho_entrada - nuevo_ancho) // 2, (alto_entrada - nuevo_alto) // 2
+
+def reproyectar_cajas(boxes, transformacion, frame_size=None):
+    """
+    Lleva cajas Nx4 [x1, y1, x2, y2] de la entrada del modelo al frame original, deshaciendo el letterbox.
+
+    Parámetros:
+      - transformacion: (escala, dx, dy) de letterbox (x_frame = (x_modelo - dx) / escala).
+      - frame_size: (ancho, alto) del frame para recortar las cajas a sus bordes; None para no recortar.
+    """
+    escala, dx, dy = transformacion
+    boxes = (boxes - np.array([dx, dy, dx, dy], dtype=np.float32)) / escala
+    if frame_size is not None:
+        boxes = np.clip(boxes, 0, np.array([frame_size[0], frame_size[1]] * 2, dtype=np.float32))
+    return boxes
+
+def postprocess(outputs, conf_threshold=0.5, iou_threshold=0.45, classes=(PERSON_CLASS_ID,),
+                frame_size=None, input_size=None, num_classes=80, transformacion=None):
+    """
+    Postprocesa la salida del modelo ONNX para extraer las detecciones, de forma vectorizada.
+    Se soportan dos formatos de salida:
+      - Legado [1, N, 5 + nc]: [x1, y1, x2, y2, obj, cls...] con scores crudos
+        (sigmoide para el objeto y softmax para las clases).
+      - YOLOv8 nativo [1, 4 + nc, N]: [cx, cy, w, h, cls...] con scores ya activados.
+    
+    Parámetros:
+      - outputs: salida de session.run (se usa el primer tensor).
+      - conf_threshold: umbral de confianza.
+      - iou_threshold: umbral de IoU para el NMS por clase.
+      - classes: clases a conservar (por defecto solo personas); None para todas.
+      - frame_size: (ancho, alto) del frame original para reescalar las cajas; None para no reescalar.
+      - input_size: (ancho, alto) de la entrada del modelo; necesario con frame_size y sin transformacion
+        (entrada estirada).
+      - num_classes: número de clases del modelo (80 para COCO).
+      - transformacion: (escala, dx, dy) del letterbox de preprocess; las cajas se reproyectan con ella
+        y se recortan a frame_size.
+    
+    Retorna:
+      - detecciones: Lista de tuplas con (bounding box, confidence, class_id).
+    """
+    output = np.asarray(outputs[0])
+    preds = output[0]  # Una sola imagen (para lotes, ver detectar_personas_lote)
+    # YOLOv8 exporta los canales primero ([84, N]); se transpone a [N, 84]
+    if preds.shape[0] < preds.shape[1]:
+        preds = preds.T
+
+    if preds.shape[1] == 4 + num_classes:
+        # Formato YOLOv8: filtrar primero por el score máximo antes de decodificar
+        class_scores = preds[:, 4:]
+        max_scores = class_scores.max(axis=1)
+        mask = max_scores >= conf_threshold
+        preds = preds[mask]
+        class_ids = class_scores[mask].argmax(axis=1)
+        confidences = max_scores[mask]
+        boxes = xywh_a_xyxy(preds[:, :4])
+    else:
+        # Formato legado: objectness con sigmoide y probabilidades de clase con softmax
+        obj_conf = sigmoid(preds[:, 4])
+        preds = preds[obj_conf >= conf_threshold]
+        class_probs = softmax(preds[:, 5:], axis=1)
+        class_ids = class_probs.argmax(axis=1)
+        confidences = class_probs[np.arange(len(class_ids)), class_ids]
+        boxes = preds[:, :4]
+
+    mask = confidences >= conf_threshold
+    if classes is not None:
+        mask &= np.isin(class_ids, classes)
+    boxes, confidences, class_ids = boxes[mask], confidences[mask], class_ids[mask]
+
+    keep = nms(boxes, confidences, class_ids, iou_threshold)
+    boxes, confidences, class_ids = boxes[keep], confidences[keep], class_ids[keep]
+
+    # Reproyectar las cajas de la entrada del modelo al frame original
+    if transformacion is not None:
+        boxes = reproyectar_cajas(boxes, transformacion, frame_size)
+    elif frame_size is not None:
+        if input_size is None:
+            raise ValueError("postprocess necesita input_size para reescalar sin transformacion")
+        escala = np.array([frame_size[0] / input_size[0], frame_size[1] / input_size[1]] * 2,
+                          dtype=np.float32)
+        boxes = boxes * escala
+
+    return [(box, float(conf), int(cls))
+            for box, conf, cls in zip(boxes.tolist(), confidences, class_ids)]
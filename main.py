@@ -2,204 +2,288 @@ import os
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"  # Deshabilita GPU
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
-import cv2
 import time
+T_INICIO = time.perf_counter()  # referencia para el desglose del arranque
+
+import cv2
 import threading
 import queue
 import json
+import argparse
 
-# Importar las funciones de cada módulo (ajusta las rutas según corresponda)
-from detectors.yolo2 import detectar_personas
-from tracking.tracker import actualizar_tracker
-from classification.age_gender import clasificar_edad_genero
-from classification.emotion2 import reconocer_emocion
-from segmentation.segmentation2 import segmentar_productos
+# Importar las funciones de cada módulo (ajusta las rutas según corresponda).
+# El detector y el tracker no se importan aquí: los carga el registro de modelos en segundo plano
+from tracking.attributes import TrackAttributeStore
+from tracking.snapshot import crear_snapshot
+from pipeline.classification import clasificar_personas, obtener_motor
+from pipeline.scheduler import AdaptiveScheduler
+from pipeline.events import DetectorCambios, EventSink
+from pipeline.capture import CapturaAnillo
+from pipeline.metrics import (contador, medidor, observar_etapa, iniciar_servidor, dibujar_overlay,
+                              registrar_error)
+from pipeline.models import registro
+from pipeline.tasks import TAREAS
+from config import CAMERA_SOURCES, HEAVY_BACKEND, ADAPTIVE_SCHEDULING, OFFLINE_OUTPUT_DIR, OFFLINE_PROCESSES
 
 # Parámetros globales
-CAPTURE_WIDTH = 640
-CAPTURE_HEIGHT = 480
 PROCESS_WIDTH = 240    # Resolución baja para procesamiento pesado
 PROCESS_HEIGHT = 180
-DETECTION_EVERY_N_FRAME = 8    # Actualizar boxes cada 8 frames
-CLASSIFICATION_EVERY_N_FRAME = 20  # Ejecutar inferencia pesada cada 20 frames
+DETECTION_EVERY_N_FRAME = 8    # Actualizar boxes cada 8 frames (intervalo inicial si el planificador es adaptativo)
+CLASSIFICATION_EVERY_N_FRAME = 20  # Ejecutar inferencia pesada cada 20 frames (ídem)
 DISAPPEAR_THRESHOLD = 0.0  # Usaremos detección actual para dibujar boxes
 
 # Cola para enviar frames para inferencia pesada
 heavy_frame_queue = queue.Queue(maxsize=5)
 # Variable global (protegida por lock) para almacenar los resultados pesados actuales
 last_registros = []
+# Resumen del último ciclo pesado (se imprime en el resumen periódico, no en cada ciclo)
+ultimo_ciclo = {}
 lock = threading.Lock()
-# Diccionario para cachear la clasificación por ID (edad y género se mantienen; emoción se actualiza)
-person_cache = {}
+# Caché de atributos por ID de track (segura entre hilos; agrega y expulsa según el ciclo de vida del track)
+person_cache = TrackAttributeStore()
 # (Opcional) Lock para cajas si se requiere separar la actualización de "current_boxes"
 boxes_lock = threading.Lock()
 current_boxes = []  # Para actualización rápida de boxes (detección y tracking) cada DETECTION_EVERY_N_FRAME
+# Último snapshot publicado por la etapa de detección/tracking (frame id + tracks + frames)
+last_snapshot = None
+# Salida de eventos (NDJSON/Parquet con rotación y endpoint en vivo opcional); se crea en main()
+event_sink = None
+# Decide en qué frames se detecta y se clasifica (intervalos fijos si ADAPTIVE_SCHEDULING está desactivado)
+scheduler = AdaptiveScheduler(DETECTION_EVERY_N_FRAME, CLASSIFICATION_EVERY_N_FRAME,
+                              adaptativo=ADAPTIVE_SCHEDULING)
 
 def heavy_classification_worker():
     """
-    Hilo que procesa frames para inferencia pesada (clasificación, segmentación) cada CLASSIFICATION_EVERY_N_FRAME.
-    Actualiza la caché y genera una salida JSON con la información: ID, edad, género, emoción, productos.
+    Hilo que procesa snapshots de tracking para inferencia pesada (clasificación, segmentación) según el planificador.
+    No vuelve a detectar ni toca el tracker: consume el snapshot (frame id + tracks + frames) publicado por el bucle principal.
+    Actualiza la caché y emite eventos de cambio (ID, edad, género, emoción, productos) al sink de eventos.
     """
-    global last_registros, person_cache
-    MIN_ROI_SIZE = 20
+    global last_registros, ultimo_ciclo
+    detector_cambios = DetectorCambios()
     while True:
         try:
-            frame = heavy_frame_queue.get(timeout=1)
+            snapshot = heavy_frame_queue.get(timeout=1)
         except queue.Empty:
             continue
 
-        detecciones, _ = detectar_personas(frame)
-        personas = actualizar_tracker(detecciones, frame)
-        resultados = []
+        # Un error en un snapshot no debe detener el único hilo pesado (ni dejar la cola sin task_done)
+        try:
+            t0 = time.perf_counter()
+            resultados, tiempos, n_con_rostro = clasificar_personas(
+                snapshot.frame, snapshot.frame_captura, snapshot.personas, person_cache)
+            duracion = time.perf_counter() - t0
+            scheduler.registrar_pesado(duracion, heavy_frame_queue.qsize())
+            observar_etapa("ciclo_pesado", duracion)
+            # Olvidar los atributos de los tracks que el tracker ya eliminó o que expiraron
+            eliminados = person_cache.podar(snapshot.ids_vivos)
+            # Antigüedad del snapshot al terminar la inferencia pesada
+            tiempos['retraso_snapshot'] = time.time() - snapshot.timestamp
+            for etapa, segundos in tiempos.items():
+                observar_etapa(etapa, segundos)
+            with lock:
+                last_registros = resultados
+                ultimo_ciclo = {"frame": snapshot.frame_id, "personas": len(resultados), "con_rostro": n_con_rostro,
+                                "ms": {etapa: round(seg * 1000, 1) for etapa, seg in tiempos.items()}}
 
-        for persona in personas:
-            x1, y1, x2, y2 = map(int, persona['bbox'])
-            if (x2 - x1) < MIN_ROI_SIZE or (y2 - y1) < MIN_ROI_SIZE:
-                continue
-            roi = frame[y1:y2, x1:x2]
-            if roi.size == 0:
-                continue
-            person_id = persona['id']
-
-            # Actualizar clasificación:
-            try:
-                roi_rgb = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
-            except Exception as e:
-                print("Error en conversión de color (heavy):", e)
-                roi_rgb = roi
-            roi_resized = cv2.resize(roi_rgb, (112, 112))
-            if person_id in person_cache:
-                cached = person_cache[person_id]
-                edad = cached['edad']
-                genero = cached['genero']
-                try:
-                    emocion = reconocer_emocion(roi_resized)
-                    if not emocion:
-                        emocion = "Sin detección"
-                except Exception as e:
-                    print("Error en reconocimiento de emoción (heavy):", e)
-                    emocion = "Sin detección"
-                person_cache[person_id]['emocion'] = emocion
-            else:
-                try:
-                    edad, genero = clasificar_edad_genero(roi_resized)
-                except Exception as e:
-                    print("Error en clasificación de edad/género (heavy):", e)
-                    edad, genero = "Desconocido", "Desconocido"
-                try:
-                    emocion = reconocer_emocion(roi_resized)
-                    if not emocion:
-                        emocion = "Sin detección"
-                except Exception as e:
-                    print("Error en reconocimiento de emoción (heavy):", e)
-                    emocion = "Sin detección"
-                person_cache[person_id] = {'edad': edad, 'genero': genero, 'emocion': emocion}
-
-            # Actualizar productos usando el modelo de Keras (entrenado con Teachable Machine o reentrenado para 5 clases)
-            try:
-                nuevos_productos = segmentar_productos(roi)
-            except Exception as e:
-                print("Error en segmentación de productos (heavy):", e)
-                nuevos_productos = []
-            # Reescribe la lista de productos con la detección actual:
-            productos = nuevos_productos
-
-            registro = {
-                "id": person_id,
-                "bbox": persona['bbox'],  # Coordenadas en el frame reducido
-                "edad": edad,
-                "genero": genero,
-                "emocion": emocion,
-                "productos": productos,
-                "timestamp": time.time()
-            }
-            resultados.append(registro)
-        with lock:
-            last_registros = resultados
-
-        # Genera salida JSON (puedes elegir imprimirla o guardarla en un archivo)
-        output_json = json.dumps(
-            [{"id": r["id"],
-              "edad": r["edad"],
-              "genero": r["genero"],
-              "emocion": r["emocion"],
-              "productos": r["productos"]}
-             for r in resultados],
-            indent=2
-        )
-        print("Heavy Frame JSON Output:")
-        print(output_json)
-
-        heavy_frame_queue.task_done()
-
-def main():
-    global last_registros, current_boxes, person_cache
-    cap = cv2.VideoCapture(2)
-    # Si usas una cámara secundaria, cambia el índice (ej: 2)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAPTURE_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAPTURE_HEIGHT)
+            # Emitir solo los cambios (tracks nuevos/terminados, atributos, productos) al sink de eventos
+            event_sink.publicar(detector_cambios.eventos(resultados, eliminados))
+        except Exception as e:
+            registrar_error("ciclo_pesado", f"Error en la inferencia pesada del frame {snapshot.frame_id}:", e)
+        finally:
+            heavy_frame_queue.task_done()
+
+def familias_pendientes(motor):
+    """Familias de modelos que todavía no están listas (detección/tracking en el registro, el resto en el motor)."""
+    pendientes = [familia for familia in ("deteccion", "tracker") if not registro.listo(familia)]
+    return pendientes + [familia for familia in TAREAS if not motor.listo(familia)]
+
+def main(fuente="2", headless=False):
+    """
+    Pipeline de una cámara.
+    La captura y la visualización arrancan de inmediato; la detección/tracking y cada etapa pesada
+    se activan cuando sus modelos terminan de cargar en segundo plano.
+
+    Parámetros:
+      - fuente: Índice de cámara (ej: "2" para una cámara secundaria), URL RTSP o archivo de video.
+      - headless: Si es True no se dibuja ni se muestra nada (servidores sin GUI); se sale con Ctrl+C.
+    """
+    global current_boxes, last_snapshot, event_sink
     frame_count = 0
+    ultimo_enviado = None
+    # FPS del bucle de procesamiento (para comparar los backends pesados "thread" y "process")
+    fps = 0.0
+    fps_frames = 0
+    fps_inicio = time.perf_counter()
 
+    # Desglose del arranque (segundos desde el inicio del proceso)
+    arranque = {"importaciones": round(time.perf_counter() - T_INICIO, 3)}
+    # Cargar todos los modelos en paralelo y en segundo plano: detector y tracker en el registro,
+    # los pesados en el motor (hilos del registro o procesos worker)
+    registro.iniciar(["deteccion", "tracker"])
+    motor = obtener_motor()
+    detectar_personas = actualizar_tracker = ids_activos = None
+    event_sink = EventSink()
     heavy_thread = threading.Thread(target=heavy_classification_worker, daemon=True)
     heavy_thread.start()
+    # Hilo de captura: el bucle toma siempre el frame más reciente (ya reducido) sin esperar a cap.read()
+    captura = CapturaAnillo(fuente, (PROCESS_WIDTH, PROCESS_HEIGHT)).iniciar()
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("No se pudo capturar el frame.")
-            break
-
-        frame_count += 1
-        display_frame = frame.copy()
-
-        # Actualización de boxes (detección y tracking) cada DETECTION_EVERY_N_FRAME
-        if frame_count % DETECTION_EVERY_N_FRAME == 0:
-            frame_proc = cv2.resize(frame, (PROCESS_WIDTH, PROCESS_HEIGHT))
-            detecciones, _ = detectar_personas(frame_proc)
-            personas = actualizar_tracker(detecciones, frame_proc)
-            with boxes_lock:
-                current_boxes = personas
-
-        # Envío de frame para inferencia pesada cada CLASSIFICATION_EVERY_N_FRAME
-        if frame_count % CLASSIFICATION_EVERY_N_FRAME == 0:
-            frame_proc = cv2.resize(frame, (PROCESS_WIDTH, PROCESS_HEIGHT))
-            try:
-                heavy_frame_queue.put(frame_proc, timeout=0.05)
-            except queue.Full:
-                pass
-
-        # Dibujar boxes de current_boxes (detección/tracking) para mayor fluidez
-        with boxes_lock:
-            boxes_to_draw = current_boxes.copy()
-        scale_x = CAPTURE_WIDTH / PROCESS_WIDTH
-        scale_y = CAPTURE_HEIGHT / PROCESS_HEIGHT
-        for persona in boxes_to_draw:
-            x1, y1, x2, y2 = map(int, persona["bbox"])
-            x1 = int(x1 * scale_x)
-            x2 = int(x2 * scale_x)
-            y1 = int(y1 * scale_y)
-            y2 = int(y2 * scale_y)
-            # Dibujar solo si el box es válido (no dummy)
-            if x1 == 0 and y1 == 0 and x2 == 0 and y2 == 0:
+    # Métricas (objetos nulos sin costo si IALEPH_METRICS no está activado)
+    iniciar_servidor()
+    medidor("ialeph_cola_pesada_profundidad", "Snapshots esperando inferencia pesada", funcion=heavy_frame_queue.qsize)
+    medidor("ialeph_cache_tracks", "Tracks con atributos en la caché", funcion=lambda: len(person_cache))
+    contador("ialeph_cache_aciertos_total", "Clasificaciones evitadas por la caché", funcion=lambda: person_cache.aciertos)
+    contador("ialeph_cache_fallos_total", "Clasificaciones requeridas por la caché", funcion=lambda: person_cache.fallos)
+    contador("ialeph_descartes_total", "Frames descartados por motivo", funcion=lambda: captura.descartados,
+             motivo="captura_sin_leer")
+    contador("ialeph_descartes_total", "Frames descartados por motivo", funcion=lambda: captura.viejos,
+             motivo="captura_vieja")
+    contador("ialeph_descartes_total", "Frames descartados por motivo", funcion=lambda: event_sink.descartados,
+             motivo="eventos")
+    contador("ialeph_descartes_total", "Frames descartados por motivo", funcion=lambda: scheduler.descartes_pesados,
+             motivo="cola_pesada")
+    # Estado del planificador: intervalos actuales y detecciones adelantadas por movimiento
+    medidor("ialeph_intervalo_deteccion", "Frames entre detecciones según el planificador",
+            funcion=lambda: scheduler.detection_interval)
+    medidor("ialeph_intervalo_clasificacion", "Frames entre envíos a la inferencia pesada según el planificador",
+            funcion=lambda: scheduler.classification_interval)
+    contador("ialeph_detecciones_por_movimiento_total", "Detecciones adelantadas por movimiento en la escena",
+             funcion=lambda: scheduler.detecciones_por_movimiento)
+    tracks_vivos = medidor("ialeph_tracks_vivos", "Tracks que el tracker conserva")
+    medidor_fps = medidor("ialeph_fps", "FPS del bucle de procesamiento")
+
+    try:
+        while True:
+            lectura = captura.leer()
+            if lectura is None:
+                if captura.terminado():
+                    print("No se pudo capturar el frame.")
+                    break
                 continue
-            cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            pid = persona["id"]
-            if pid in person_cache:
-                info = person_cache[pid]
-                etiqueta = f"ID: {pid} {info['genero']}, {info['edad']}, {info['emocion']}"
-            else:
-                etiqueta = f"ID: {pid} Cargando..."
-            cv2.putText(display_frame, etiqueta, (x1, y1 - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-        cv2.imshow("Predicciones en Tiempo Real", display_frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+            frame_count, frame, frame_proc = lectura
+            arranque.setdefault("primer_frame", round(time.perf_counter() - T_INICIO, 3))
+
+            # La detección/tracking se activa en cuanto el detector y el tracker están cargados
+            if detectar_personas is None and registro.listo("deteccion") and registro.listo("tracker"):
+                detectar_personas = registro.modulo("deteccion").detectar_personas
+                actualizar_tracker = registro.modulo("tracker").actualizar_tracker
+                ids_activos = registro.modulo("tracker").ids_activos
+                arranque["deteccion_activa"] = round(time.perf_counter() - T_INICIO, 3)
+            if "modelos_listos" not in arranque and not familias_pendientes(motor):
+                arranque["modelos_listos"] = round(time.perf_counter() - T_INICIO, 3)
+                print("Arranque (s):", json.dumps({**arranque, "carga_por_modelo": {
+                    **registro.desglose()["modelos"], **motor.desglose_carga()}}))
+
+            # Única etapa de detección y tracking (por intervalo adaptativo o por movimiento): publica un snapshot inmutable
+            if detectar_personas is not None and scheduler.debe_detectar(frame_count, frame_proc):
+                t0 = time.perf_counter()
+                detecciones, _ = detectar_personas(frame_proc)
+                t1 = time.perf_counter()
+                personas = actualizar_tracker(detecciones, frame_proc)
+                t2 = time.perf_counter()
+                scheduler.registrar_deteccion(t2 - t0)
+                observar_etapa("deteccion", t1 - t0)
+                observar_etapa("tracking", t2 - t1)
+                # Los frames del anillo se reutilizan: el snapshot (que vive en la cola pesada) lleva su propia copia
+                snapshot = crear_snapshot(frame_count, frame_proc.copy(), frame.copy(), personas, ids_activos())
+                with boxes_lock:
+                    current_boxes = snapshot.personas
+                    last_snapshot = snapshot
+                tracks_vivos.fijar(len(snapshot.ids_vivos))
+
+            # Envío del último snapshot (aún no enviado) para inferencia pesada según el intervalo de clasificación
+            if scheduler.debe_clasificar(frame_count):
+                with boxes_lock:
+                    snapshot = last_snapshot
+                if snapshot is not None and snapshot.frame_id != ultimo_enviado:
+                    try:
+                        # El snapshot incluye la captura original para recortar los rostros a resolución completa
+                        heavy_frame_queue.put(snapshot, timeout=0.05)
+                        ultimo_enviado = snapshot.frame_id
+                        scheduler.registrar_envio(descartado=False)
+                    except queue.Full:
+                        scheduler.registrar_envio(descartado=True)
+
+            fps_frames += 1
+            transcurrido = time.perf_counter() - fps_inicio
+            if transcurrido >= 2.0:
+                fps = fps_frames / transcurrido
+                medidor_fps.fijar(round(fps, 1))
+                print(f"FPS de procesamiento: {fps:.1f} (backend pesado: {HEAVY_BACKEND})")
+                with lock:
+                    ciclo = ultimo_ciclo
+                print("Planificador:", json.dumps(scheduler.metricas()), "| Eventos:", json.dumps(event_sink.metricas()),
+                      "| Captura:", json.dumps(captura.metricas()), "| Último ciclo pesado:", json.dumps(ciclo))
+                fps_frames = 0
+                fps_inicio = time.perf_counter()
+
+            if headless:
+                continue
+
+            # Dibujar boxes de current_boxes (detección/tracking) directamente sobre el frame del anillo
+            # (el slot queda reservado hasta la siguiente lectura, así que no hace falta copiarlo)
+            with boxes_lock:
+                boxes_to_draw = current_boxes
+            scale_x = frame.shape[1] / PROCESS_WIDTH
+            scale_y = frame.shape[0] / PROCESS_HEIGHT
+            for persona in boxes_to_draw:
+                x1, y1, x2, y2 = map(int, persona["bbox"])
+                x1 = int(x1 * scale_x)
+                x2 = int(x2 * scale_x)
+                y1 = int(y1 * scale_y)
+                y2 = int(y2 * scale_y)
+                # Dibujar solo si el box es válido (no dummy)
+                if x1 == 0 and y1 == 0 and x2 == 0 and y2 == 0:
+                    continue
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                pid = persona["id"]
+                info = person_cache.obtener(pid)
+                if info:
+                    etiqueta = f"ID: {pid} {info['genero']}, {info['edad']}, {info['emocion']}"
+                else:
+                    etiqueta = f"ID: {pid} Cargando..."
+                cv2.putText(frame, etiqueta, (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            cv2.putText(frame, f"FPS: {fps:.1f}", (10, 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+            if "modelos_listos" not in arranque:
+                cv2.putText(frame, "Cargando modelos: " + ", ".join(familias_pendientes(motor)),
+                            (10, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+
+            dibujar_overlay(frame)
+            cv2.imshow("Predicciones en Tiempo Real", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        captura.detener()
+        if not headless:
+            cv2.destroyAllWindows()
+        motor.cerrar()
+        event_sink.cerrar()
 
 if __name__ == "__main__":
     # Se define boxes_lock para proteger current_boxes
     boxes_lock = threading.Lock()
-    main()
+    parser = argparse.ArgumentParser(description="IAleph: análisis de clientes en tiempo real.")
+    parser.add_argument("--headless", action="store_true",
+                        help="Sin dibujo ni ventanas (servidores sin GUI); salir con Ctrl+C")
+    parser.add_argument("--offline", action="store_true",
+                        help="Procesa video grabado (archivos o directorios en --fuentes) sin descartar frames")
+    parser.add_argument("--salida", default=OFFLINE_OUTPUT_DIR, help="Directorio de resultados del modo offline")
+    parser.add_argument("--procesos", type=int, default=OFFLINE_PROCESSES,
+                        help="Videos procesados en paralelo en el modo offline")
+    parser.add_argument("--fuentes", default=",".join(CAMERA_SOURCES),
+                        help="Cámaras, URLs RTSP o archivos separados por comas (más de una activa el modo multicámara)")
+    args = parser.parse_args()
+    fuentes = [fuente.strip() for fuente in args.fuentes.split(",") if fuente.strip()]
+    if args.offline:
+        from pipeline.offline import procesar_entradas
+        procesar_entradas(fuentes, args.salida, args.procesos)
+    elif len(fuentes) > 1:
+        # Importación diferida: el modo multicámara solo se carga cuando se usa
+        from pipeline.multicam import ejecutar_multicamara
+        ejecutar_multicamara(fuentes, mostrar=not args.headless)
+    else:
+        main(fuentes[0], headless=args.headless)
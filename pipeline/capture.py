@@ -0,0 +1,168 @@
+"""
+Captura en un hilo propio sobre un anillo de frames preasignados (modo de una cámara, main.py).
+
+- El hilo de captura lee con cap.read(image=...) directamente en un slot libre del anillo
+  y calcula ahí mismo el frame reducido (cv2.resize con dst): no se asigna memoria por frame
+  y el frame reducido se calcula una sola vez para todos los consumidores
+  (planificador, detección/tracking y snapshot para la inferencia pesada).
+- El bucle de procesamiento toma siempre el frame más reciente sin bloquearse en cap.read().
+  El slot tomado queda reservado hasta la siguiente llamada a leer(), así la captura nunca lo sobrescribe
+  mientras se usa.
+- Cámaras y streams de red descartan los frames no leídos (se procesa lo más reciente); los archivos
+  locales esperan a que se lea cada frame. En vivo, opcionalmente se descartan los frames con más de
+  max_latencia segundos desde su captura, para acotar la latencia.
+"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import CAPTURE_RING_SIZE, CAPTURE_MAX_LATENCY
+
+CAPTURE_WIDTH = 640
+CAPTURE_HEIGHT = 480
+
+# Políticas de descarte cuando el consumidor no alcanza a la captura:
+#   "descartar": se elimina el frame más viejo (cámaras en vivo: siempre se procesa lo más reciente)
+#   "bloquear": la captura espera a que haya espacio (archivos de video: no se pierde ningún frame)
+POLITICA_DESCARTAR = "descartar"
+POLITICA_BLOQUEAR = "bloquear"
+
+def abrir_fuente(fuente):
+    """Abre una fuente de video: índice de cámara ("2"), URL RTSP/HTTP o ruta a un archivo."""
+    cap = cv2.VideoCapture(int(fuente) if fuente.isdigit() else fuente)
+    if fuente.isdigit():
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAPTURE_WIDTH)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAPTURE_HEIGHT)
+    return cap
+
+def politica_por_defecto(fuente):
+    """Los archivos locales se procesan completos; cámaras y streams de red descartan frames viejos."""
+    return POLITICA_BLOQUEAR if os.path.isfile(fuente) else POLITICA_DESCARTAR
+
+class CapturaAnillo:
+    """
+    Hilo de captura con anillo de n_slots frames preasignados (captura + reducido).
+
+    Uso:
+        captura = CapturaAnillo("2", (240, 180))
+        captura.iniciar()
+        frame_id, frame, reducido = captura.leer()  # válidos hasta la siguiente llamada a leer()
+
+    Contadores: capturados, descartados (sobrescritos sin leer), viejos (descartados por latencia).
+    """
+
+    def __init__(self, fuente, tam_reducido, n_slots=CAPTURE_RING_SIZE, max_latencia=CAPTURE_MAX_LATENCY,
+                 politica=None):
+        if n_slots < 3:
+            raise ValueError("El anillo necesita al menos 3 slots (escritura, último frame y frame en uso)")
+        self.fuente = fuente
+        self.tam_reducido = tam_reducido
+        self.max_latencia = max_latencia
+        self.politica = politica or politica_por_defecto(fuente)
+        self.cap = abrir_fuente(fuente)
+        if self.politica == POLITICA_DESCARTAR:
+            # Que el driver no acumule frames viejos por su cuenta
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        # Cada slot: frame de captura, frame reducido, frame_id y momento de captura.
+        # Los arreglos se asignan con el primer frame (la resolución real se conoce al leer)
+        self._slots = [{"frame": None, "reducido": None, "id": 0, "t": 0.0} for _ in range(n_slots)]
+        self._ultimo = None      # índice del slot con el frame más reciente sin leer
+        self._en_uso = None      # índice del slot que tiene el consumidor
+        self._escribiendo = None
+        self._cond = threading.Condition()
+        self.activo = True
+        self.capturados = 0
+        self.descartados = 0
+        self.viejos = 0
+        self._hilo = threading.Thread(target=self._capturar, daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def _slot_libre(self):
+        """Índice de un slot que no es el último frame ni el que tiene el consumidor (llamar con _cond)."""
+        for i in range(len(self._slots)):
+            if i != self._ultimo and i != self._en_uso:
+                return i
+
+    def _capturar(self):
+        """Bucle del hilo de captura: lee en un slot libre y lo publica como el frame más reciente."""
+        while self.activo:
+            with self._cond:
+                if self.politica == POLITICA_BLOQUEAR:
+                    while self.activo and self._ultimo is not None:
+                        self._cond.wait(timeout=0.5)
+                self._escribiendo = self._slot_libre()
+            slot = self._slots[self._escribiendo]
+            ret, frame = self.cap.read(slot["frame"])
+            if not ret:
+                print(f"Fin de la fuente o error de captura: {self.fuente}")
+                break
+            # cap.read reutiliza el arreglo si la forma coincide; si no (primer frame), retorna uno nuevo
+            slot["frame"] = frame
+            alto, ancho = self.tam_reducido[1], self.tam_reducido[0]
+            if slot["reducido"] is None:
+                slot["reducido"] = np.empty((alto, ancho, 3), dtype=np.uint8)
+            cv2.resize(frame, self.tam_reducido, dst=slot["reducido"])
+            with self._cond:
+                self.capturados += 1
+                slot["id"] = self.capturados
+                slot["t"] = time.monotonic()
+                if self._ultimo is not None:
+                    self.descartados += 1
+                self._ultimo = self._escribiendo
+                self._escribiendo = None
+                self._cond.notify_all()
+        with self._cond:
+            self.activo = False
+            self._cond.notify_all()
+        self.cap.release()
+
+    def leer(self, timeout=1.0):
+        """
+        Toma el frame más reciente (espera hasta timeout segundos si aún no hay uno nuevo).
+        Libera el frame entregado en la llamada anterior.
+
+        Retorna:
+          - (frame_id, frame, reducido), o None si no llegó ningún frame (ver terminado()).
+            Los arreglos pertenecen al anillo: copiarlos si deben sobrevivir a la siguiente lectura.
+        """
+        limite = time.monotonic() + timeout
+        with self._cond:
+            self._en_uso = None
+            self._cond.notify_all()
+            while True:
+                while self._ultimo is None and self.activo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        return None
+                    self._cond.wait(timeout=restante)
+                if self._ultimo is None:
+                    return None
+                slot = self._slots[self._ultimo]
+                self._ultimo = None
+                self._cond.notify_all()
+                if (self.politica == POLITICA_DESCARTAR and self.max_latencia
+                        and time.monotonic() - slot["t"] > self.max_latencia):
+                    # Frame viejo (captura o consumidor atrasados): se espera uno nuevo.
+                    # Solo en vivo: con "bloquear" (archivos) no se pierde ningún frame
+                    self.viejos += 1
+                    continue
+                self._en_uso = self._slots.index(slot)
+                return slot["id"], slot["frame"], slot["reducido"]
+
+    def terminado(self):
+        with self._cond:
+            return not self.activo and self._ultimo is None
+
+    def metricas(self):
+        with self._cond:
+            return {"capturados": self.capturados, "descartados": self.descartados, "viejos": self.viejos}
+
+    def detener(self):
+        self.activo = False
+        self._hilo.join(timeout=2)
@@ -0,0 +1,203 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from config import HEAVY_BACKEND
+from detectors.faces_ops import asignar_rostros, calidad_rostro, region_rostro
+from pipeline.metrics import registrar_error
+from pipeline.models import registro
+from pipeline.tasks import TAREAS
+
+# Lado mínimo (en píxeles del frame reducido) de una persona para procesarla
+MIN_ROI_SIZE = 20
+
+class MotorLocal:
+    """
+    Ejecuta las tareas pesadas en el hilo que llama (HEAVY_BACKEND="thread").
+    Misma interfaz que pipeline.process_pool.MotorProcesos; los Futures se retornan ya resueltos.
+    """
+
+    def __init__(self):
+        # Cargar todos los modelos en segundo plano; clasificar_personas usa solo las familias listas
+        registro.iniciar(TAREAS)
+        # Un lock por familia: si varios hilos clasifican a la vez (modo offline), cada modelo
+        # atiende una tarea a la vez, pero familias distintas pueden ejecutarse en paralelo
+        self._locks = {familia: threading.Lock() for familia in TAREAS}
+
+    def publicar(self, frame, frame_captura):
+        return (frame, frame_captura)
+
+    def liberar(self, ref):
+        pass
+
+    def enviar(self, familia, ref, args=None):
+        futuro = Future()
+        try:
+            with self._locks[familia]:
+                resultado = TAREAS[familia](ref[0], ref[1], args)
+            futuro.set_result(resultado)
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+    def listo(self, familia):
+        """True si los modelos de la familia ya están cargados."""
+        return registro.listo(familia)
+
+    def esperar(self, timeout=None):
+        """Espera a que carguen todas las familias; retorna True si todas quedaron listas."""
+        return registro.esperar(TAREAS, timeout)
+
+    def desglose_carga(self):
+        """Segundos de carga por familia y errores de carga, si los hubo."""
+        desglose = {familia: registro.tiempos[familia] for familia in TAREAS if familia in registro.tiempos}
+        errores = {familia: registro.errores[familia] for familia in TAREAS if familia in registro.errores}
+        if errores:
+            desglose["errores"] = errores
+        return desglose
+
+    def cerrar(self):
+        pass
+
+_motor = None
+
+def obtener_motor():
+    """Retorna el motor de inferencia pesada del proceso (se crea una sola vez según HEAVY_BACKEND)."""
+    global _motor
+    if _motor is None:
+        if HEAVY_BACKEND == "process":
+            from pipeline.process_pool import MotorProcesos
+            _motor = MotorProcesos()
+        elif HEAVY_BACKEND == "thread":
+            _motor = MotorLocal()
+        else:
+            raise ValueError(f"Backend pesado desconocido: {HEAVY_BACKEND!r} (usa 'thread' o 'process')")
+    return _motor
+
+def clasificar_personas(frame, frame_captura, personas, store, motor=None, ahora=None):
+    """
+    Inferencia pesada sobre las personas ya trackeadas de un frame: rostros, emoción, edad/género y productos.
+    Los modelos se cargan una sola vez por motor, así que todas las cámaras comparten una sola copia.
+    Mientras una familia de modelos sigue cargando, su etapa se omite (sin rostros no hay emoción ni edad/género).
+    
+    Parámetros:
+      - frame: Frame reducido sobre el que se hizo la detección/tracking (coordenadas de las bbox).
+      - frame_captura: Captura original, de la que se recortan los rostros a resolución completa.
+      - personas: Lista de diccionarios {'id', 'bbox'} devuelta por actualizar_tracker.
+      - store: TrackAttributeStore con los atributos agregados por ID (se actualiza in situ); decide
+        qué personas necesitan reclasificarse.
+      - motor: Motor de inferencia (por defecto, obtener_motor()).
+      - ahora: Tiempo en segundos para la caché (intervalo de emoción y TTL); por defecto, el reloj.
+        El modo offline pasa el tiempo del video.
+    
+    Retorna:
+      - resultados: Lista de registros con ID, bbox, edad, género, emoción, productos y timestamp.
+      - tiempos: Diccionario etapa -> segundos (con el backend de procesos, tiempo hasta tener el resultado).
+      - n_con_rostro: Número de personas con rostro utilizable.
+    """
+    motor = motor or obtener_motor()
+    tiempos = {}
+    resultados = []
+
+    # Primera pasada: ROIs de persona válidas (para productos) en el frame reducido
+    validas = []
+    for persona in personas:
+        x1, y1, x2, y2 = map(int, persona['bbox'])
+        if (x2 - x1) < MIN_ROI_SIZE or (y2 - y1) < MIN_ROI_SIZE:
+            continue
+        if frame[y1:y2, x1:x2].size == 0:
+            continue
+        validas.append((persona, (max(0, x1), max(0, y1), x2, y2)))
+
+    ref = motor.publicar(frame, frame_captura)
+    try:
+        # Productos no depende de los rostros: se lanza primero (en paralelo con el backend de procesos)
+        t_productos = time.perf_counter()
+        futuro_productos = motor.enviar("productos", ref, [bbox for _, bbox in validas]) \
+            if motor.listo("productos") else None
+
+        # Rostros: una sola detección sobre la captura original y asignación a cada persona
+        t0 = time.perf_counter()
+        scale_x = frame_captura.shape[1] / frame.shape[1]
+        scale_y = frame_captura.shape[0] / frame.shape[0]
+        bboxes_captura = [[x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y]
+                          for x1, y1, x2, y2 in (persona['bbox'] for persona, _ in validas)]
+        asignados = [None] * len(validas)
+        if motor.listo("rostros"):
+            try:
+                asignados = asignar_rostros(bboxes_captura, motor.enviar("rostros", ref).result())
+            except Exception as e:
+                registrar_error("rostros", "Error en detección de rostros (heavy):", e)
+        # Solo las personas con rostro utilizable pasan a clasificación; la región de recorte se calcula
+        # una sola vez y se envía a las tareas, que recortan directamente
+        regiones = {i: region_rostro(frame_captura.shape, r[0]) for i, r in enumerate(asignados) if r is not None}
+        con_rostro = [i for i, region in regiones.items() if region is not None]
+        tiempos['rostros'] = time.perf_counter() - t0
+
+        calidades = {i: calidad_rostro(asignados[i]) for i in con_rostro}
+
+        # La caché decide quién se (re)clasifica: emoción si la última es vieja; edad/género si la
+        # confianza agregada es baja o el rostro actual es mejor que el mejor visto
+        ids = [persona['id'] for persona, _ in validas]
+        store.tocar(ids, ahora)
+        pendientes_emocion = [i for i in con_rostro if store.necesita_emocion(ids[i], ahora)] \
+            if motor.listo("emociones") else []
+        pendientes_edad = [i for i in con_rostro if store.necesita_edad_genero(ids[i], calidades[i])] \
+            if motor.listo("edades_generos") else []
+
+        # Cada clasificador en una sola llamada por lotes. Cada etapa se mide desde su propio envío hasta su
+        # resultado; con MotorLocal el futuro ya viene resuelto y el tiempo es el del propio envío
+        t0 = time.perf_counter()
+        futuro_emociones = motor.enviar("emociones", ref, [regiones[i] for i in pendientes_emocion]) \
+            if pendientes_emocion else None
+        fin_emocion = time.perf_counter() if futuro_emociones is None or futuro_emociones.done() else None
+        t_edad = time.perf_counter()
+        futuro_edades = motor.enviar("edades_generos", ref, [regiones[i] for i in pendientes_edad]) \
+            if pendientes_edad else None
+        fin_edad = time.perf_counter() if futuro_edades is None or futuro_edades.done() else None
+        try:
+            for i, (_, _, probabilidades) in zip(pendientes_emocion,
+                                                 futuro_emociones.result() if futuro_emociones else []):
+                store.actualizar_emocion(ids[i], probabilidades, calidades[i], ahora)
+        except Exception as e:
+            registrar_error("emocion", "Error en reconocimiento de emoción (heavy):", e)
+        tiempos['emocion'] = (time.perf_counter() if fin_emocion is None else fin_emocion) - t0
+        try:
+            for i, resultado in zip(pendientes_edad, futuro_edades.result() if futuro_edades else []):
+                store.actualizar_edad_genero(ids[i], resultado, calidades[i], ahora)
+        except Exception as e:
+            registrar_error("edad_genero", "Error en clasificación de edad/género (heavy):", e)
+        tiempos['edad_genero'] = (time.perf_counter() if fin_edad is None else fin_edad) - t_edad
+
+        productos_por_persona = [[] for _ in validas]
+        if futuro_productos is not None:
+            try:
+                productos_por_persona = futuro_productos.result()
+            except Exception as e:
+                registrar_error("productos", "Error en segmentación de productos (heavy):", e)
+        tiempos['productos'] = time.perf_counter() - t_productos
+    finally:
+        motor.liberar(ref)
+
+    for (persona, _), productos in zip(validas, productos_por_persona):
+        person_id = persona['id']
+
+        # Atributos agregados del track (una persona sin rostro utilizable todavía no tiene ninguno)
+        atributos = store.obtener(person_id)
+        if atributos:
+            edad, genero, emocion = atributos['edad'], atributos['genero'], atributos['emocion']
+        else:
+            edad, genero, emocion = "Desconocido", "Desconocido", "Sin detección"
+
+        registro = {
+            "id": person_id,
+            "bbox": persona['bbox'],  # Coordenadas en el frame reducido
+            "edad": edad,
+            "genero": genero,
+            "emocion": emocion,
+            "productos": productos,
+            "timestamp": time.time()
+        }
+        resultados.append(registro)
+
+    return resultados, tiempos, len(con_rostro)
@@ -0,0 +1,280 @@
+"""
+Salida estructurada de eventos, en lugar de imprimir todos los resultados en cada ciclo pesado.
+
+- Solo se emiten cambios: track nuevo, cambio de atributos (edad/género/emoción), cambio de
+  productos y fin de track.
+- Un hilo escritor en segundo plano agrupa los eventos y los escribe en NDJSON compacto
+  (o en lotes Parquet si pyarrow está instalado), con rotación por tamaño.
+- Opcionalmente, un endpoint HTTP local (GET /eventos) transmite los eventos en vivo.
+- Todo el buffering es acotado: si el disco o un consumidor son lentos, los eventos se descartan
+  y se contabilizan, pero la inferencia nunca se bloquea.
+"""
+import collections
+import importlib.util
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import (EVENTS_DIR, EVENTS_FORMAT, EVENTS_ROTATE_MB, EVENTS_QUEUE_MAX,
+                    EVENTS_FLUSH_INTERVAL, EVENTS_FLUSH_BATCH, EVENTS_HTTP_PORT)
+from pipeline.metrics import registrar_error
+
+TRACK_NUEVO = "track_nuevo"
+ATRIBUTOS = "atributos"
+PRODUCTOS = "productos"
+TRACK_FIN = "track_fin"
+
+# Eventos pendientes máximos por consumidor en vivo
+MAX_PENDIENTES_CONSUMIDOR = 1000
+
+class DetectorCambios:
+    """Compara cada ciclo pesado con el anterior y genera solo los eventos de lo que cambió."""
+
+    def __init__(self, camara=0):
+        self.camara = camara
+        # ID -> (edad, genero, emocion, etiquetas de productos)
+        self._estado = {}
+
+    def eventos(self, resultados, eliminados=()):
+        """
+        Parámetros:
+          - resultados: registros de clasificar_personas.
+          - eliminados: IDs de tracks terminados (TrackAttributeStore.podar).
+
+        Retorna:
+          - eventos: lista de diccionarios listos para serializar.
+        """
+        eventos = []
+        ahora = time.time()
+        for r in resultados:
+            base = {"ts": ahora, "camara": self.camara, "id": r["id"]}
+            atributos = (r["edad"], r["genero"], r["emocion"])
+            productos = tuple(sorted(p["label"] for p in r["productos"]))
+            previo = self._estado.get(r["id"])
+            if previo is None:
+                eventos.append({**base, "tipo": TRACK_NUEVO, "bbox": list(r["bbox"]),
+                                "edad": r["edad"], "genero": r["genero"], "emocion": r["emocion"],
+                                "productos": r["productos"]})
+            else:
+                if atributos != previo[0]:
+                    eventos.append({**base, "tipo": ATRIBUTOS,
+                                    "edad": r["edad"], "genero": r["genero"], "emocion": r["emocion"]})
+                if productos != previo[1]:
+                    eventos.append({**base, "tipo": PRODUCTOS, "productos": r["productos"]})
+            self._estado[r["id"]] = (atributos, productos)
+        for track_id in eliminados:
+            if self._estado.pop(track_id, None) is not None:
+                eventos.append({"ts": ahora, "camara": self.camara, "id": track_id, "tipo": TRACK_FIN})
+        return eventos
+
+class EscritorNDJSON:
+    """Escribe NDJSON compacto con rotación por tamaño (un archivo nuevo por rotación)."""
+
+    extension = "ndjson"
+
+    def __init__(self, directorio, rotar_bytes):
+        self.directorio = directorio
+        self.rotar_bytes = rotar_bytes
+        self._archivo = None
+        self._escritos = 0
+
+    def _abrir(self):
+        os.makedirs(self.directorio, exist_ok=True)
+        nombre = time.strftime("eventos-%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}.{self.extension}"
+        self._archivo = open(os.path.join(self.directorio, nombre), "a", encoding="utf-8")
+        self._escritos = 0
+
+    def escribir(self, lineas):
+        if self._archivo is None or self._escritos >= self.rotar_bytes:
+            self.cerrar()
+            self._abrir()
+        texto = "".join(linea + "\n" for linea in lineas)
+        self._archivo.write(texto)
+        self._archivo.flush()
+        self._escritos += len(texto)
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+class EscritorParquet:
+    """Escribe cada lote de eventos como un row group de Parquet (columna 'evento' con el JSON y columnas clave)."""
+
+    extension = "parquet"
+
+    def __init__(self, directorio, rotar_bytes):
+        # Falla aquí, al crear el sink, y no en el primer lote si pyarrow no está instalado
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("EVENTS_FORMAT='parquet' requiere pyarrow (pip install pyarrow)")
+        self.directorio = directorio
+        self.rotar_bytes = rotar_bytes
+        self._writer = None
+        self._ruta = None
+
+    def escribir(self, lineas):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        eventos = [json.loads(linea) for linea in lineas]
+        tabla = pa.table({
+            "ts": [e["ts"] for e in eventos],
+            "camara": [e["camara"] for e in eventos],
+            "id": [str(e["id"]) for e in eventos],
+            "tipo": [e["tipo"] for e in eventos],
+            "evento": lineas,
+        })
+        if self._writer is not None and os.path.getsize(self._ruta) >= self.rotar_bytes:
+            self.cerrar()
+        if self._writer is None:
+            os.makedirs(self.directorio, exist_ok=True)
+            nombre = time.strftime("eventos-%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}.parquet"
+            self._ruta = os.path.join(self.directorio, nombre)
+            self._writer = pq.ParquetWriter(self._ruta, tabla.schema)
+        self._writer.write_table(tabla)
+
+    def cerrar(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+class _ManejadorEventos(BaseHTTPRequestHandler):
+    """GET /eventos: transmite los eventos en vivo (NDJSON, una línea por evento) hasta que el cliente cierre."""
+
+    sink = None
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/eventos":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        pendientes = self.sink._suscribir()
+        try:
+            while self.sink.activo:
+                with pendientes["cond"]:
+                    if not pendientes["lineas"]:
+                        pendientes["cond"].wait(timeout=1.0)
+                    lineas = list(pendientes["lineas"])
+                    pendientes["lineas"].clear()
+                if lineas:
+                    self.wfile.write("".join(linea + "\n" for linea in lineas).encode("utf-8"))
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.sink._desuscribir(pendientes)
+
+    def log_message(self, formato, *args):
+        pass  # sin registro por petición en stdout
+
+class EventSink:
+    """
+    Etapa de salida: recibe eventos sin bloquear (publicar) y los escribe en un hilo en segundo plano.
+
+    Contadores: emitidos, escritos, descartados (cola llena), descartados_consumidores (consumidor en vivo lento).
+    """
+
+    def __init__(self, directorio=EVENTS_DIR, formato=EVENTS_FORMAT, rotar_mb=EVENTS_ROTATE_MB,
+                 max_cola=EVENTS_QUEUE_MAX, intervalo=EVENTS_FLUSH_INTERVAL, lote=EVENTS_FLUSH_BATCH,
+                 puerto_http=EVENTS_HTTP_PORT):
+        escritores = {"ndjson": EscritorNDJSON, "parquet": EscritorParquet}
+        if formato not in escritores:
+            raise ValueError(f"Formato de eventos desconocido: {formato!r} (usa 'ndjson' o 'parquet')")
+        self._escritor = escritores[formato](directorio, int(rotar_mb * 1024 * 1024))
+        self._cola = queue.Queue(maxsize=max_cola)
+        self.intervalo = intervalo
+        self.lote = lote
+        self.activo = True
+        self.emitidos = 0
+        self.escritos = 0
+        self.descartados = 0
+        self.descartados_consumidores = 0
+        self._consumidores = []
+        self._lock_consumidores = threading.Lock()
+        self._hilo = threading.Thread(target=self._escribir, daemon=True)
+        self._hilo.start()
+        self._servidor = None
+        if puerto_http:
+            _ManejadorEventos.sink = self
+            self._servidor = ThreadingHTTPServer(("127.0.0.1", puerto_http), _ManejadorEventos)
+            self._servidor.daemon_threads = True
+            threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+
+    def publicar(self, eventos):
+        """Encola eventos sin bloquear; si la cola está llena se descartan y se contabilizan."""
+        for evento in eventos:
+            self.emitidos += 1
+            try:
+                self._cola.put_nowait(evento)
+            except queue.Full:
+                self.descartados += 1
+
+    def _escribir(self):
+        pendientes = []
+        ultimo = time.monotonic()
+        while self.activo or not self._cola.empty():
+            try:
+                pendientes.append(self._cola.get(timeout=self.intervalo))
+                # Vaciar lo que ya esté en la cola sin esperar (hasta completar el lote)
+                while len(pendientes) < self.lote:
+                    pendientes.append(self._cola.get_nowait())
+            except queue.Empty:
+                pass
+            if pendientes and (len(pendientes) >= self.lote or time.monotonic() - ultimo >= self.intervalo
+                               or not self.activo):
+                lineas = [json.dumps(evento, separators=(",", ":"), ensure_ascii=False, default=str)
+                          for evento in pendientes]
+                try:
+                    self._escritor.escribir(lineas)
+                    self.escritos += len(lineas)
+                except OSError as e:
+                    registrar_error("eventos", "Error al escribir eventos:", e)
+                    self.descartados += len(lineas)
+                self._difundir(lineas)
+                pendientes = []
+                ultimo = time.monotonic()
+        self._escritor.cerrar()
+
+    def _suscribir(self):
+        pendientes = {"lineas": collections.deque(), "cond": threading.Condition()}
+        with self._lock_consumidores:
+            self._consumidores.append(pendientes)
+        return pendientes
+
+    def _desuscribir(self, pendientes):
+        with self._lock_consumidores:
+            self._consumidores.remove(pendientes)
+
+    def _difundir(self, lineas):
+        with self._lock_consumidores:
+            consumidores = list(self._consumidores)
+        for pendientes in consumidores:
+            with pendientes["cond"]:
+                for linea in lineas:
+                    if len(pendientes["lineas"]) >= MAX_PENDIENTES_CONSUMIDOR:
+                        # Consumidor lento: se descarta lo más viejo
+                        pendientes["lineas"].popleft()
+                        self.descartados_consumidores += 1
+                    pendientes["lineas"].append(linea)
+                pendientes["cond"].notify()
+
+    def metricas(self):
+        return {
+            "emitidos": self.emitidos,
+            "escritos": self.escritos,
+            "descartados": self.descartados,
+            "descartados_consumidores": self.descartados_consumidores,
+            "pendientes": self._cola.qsize(),
+        }
+
+    def cerrar(self):
+        """Escribe lo pendiente y detiene el hilo escritor y el servidor HTTP."""
+        self.activo = False
+        self._hilo.join(timeout=5)
+        if self._servidor is not None:
+            self._servidor.shutdown()
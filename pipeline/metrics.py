@@ -0,0 +1,224 @@
+"""
+Métricas en proceso: histogramas de latencia, medidores (gauges) y contadores, expuestos en formato
+Prometheus por un endpoint HTTP local (GET /metrics) y, opcionalmente, como overlay sobre el frame.
+
+Con METRICS_ENABLED desactivado, histograma()/contador()/medidor() retornan un objeto nulo cuyos métodos
+no hacen nada y cronometrar() retorna la función sin envolver: el costo es prácticamente cero.
+
+Con HEAVY_BACKEND="process" los modelos corren en procesos worker: sus histogramas por modelo
+(ialeph_modelo_segundos) quedan en esos procesos, pero los tiempos por etapa del proceso principal
+(ialeph_etapa_segundos) los cubren.
+"""
+import bisect
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+from config import METRICS_ENABLED, METRICS_HTTP_PORT, METRICS_OVERLAY
+
+# Límites (segundos) de los buckets de latencia
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, buckets=BUCKETS_SEGUNDOS):
+        self.buckets = tuple(buckets)
+        self._conteos = [0] * (len(self.buckets) + 1)
+        self.suma = 0.0
+        self.cuenta = 0
+        self.ultimo = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            self._conteos[indice] += 1
+            self.suma += valor
+            self.cuenta += 1
+            self.ultimo = valor
+
+    def muestras(self, nombre, etiquetas):
+        with self._lock:
+            conteos, suma, cuenta = list(self._conteos), self.suma, self.cuenta
+        lineas = []
+        acumulado = 0
+        for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+            acumulado += conteo
+            le = "+Inf" if limite == float("inf") else repr(limite)
+            lineas.append(f"{nombre}_bucket{_formatear(etiquetas, le=le)} {acumulado}")
+        lineas.append(f"{nombre}_sum{_formatear(etiquetas)} {suma}")
+        lineas.append(f"{nombre}_count{_formatear(etiquetas)} {cuenta}")
+        return lineas
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, funcion=None):
+        self.valor = 0
+        # Si se indica, el valor se lee de funcion() al exponer (contadores que ya lleva otro objeto)
+        self.funcion = funcion
+        self._lock = threading.Lock()
+
+    def incrementar(self, n=1):
+        with self._lock:
+            self.valor += n
+
+    def leer(self):
+        return self.funcion() if self.funcion else self.valor
+
+    def muestras(self, nombre, etiquetas):
+        return [f"{nombre}{_formatear(etiquetas)} {self.leer()}"]
+
+class Medidor:
+    tipo = "gauge"
+
+    def __init__(self, funcion=None):
+        self.valor = 0.0
+        self.funcion = funcion
+
+    def fijar(self, valor):
+        self.valor = valor
+
+    def leer(self):
+        return self.funcion() if self.funcion else self.valor
+
+    def muestras(self, nombre, etiquetas):
+        return [f"{nombre}{_formatear(etiquetas)} {self.leer()}"]
+
+class _MetricaNula:
+    """Sustituto sin efecto cuando las métricas están desactivadas."""
+
+    def observar(self, valor):
+        pass
+
+    def incrementar(self, n=1):
+        pass
+
+    def fijar(self, valor):
+        pass
+
+NULA = _MetricaNula()
+
+# nombre -> {"tipo", "ayuda", "series": {tupla de etiquetas: métrica}}
+_registro = {}
+_lock_registro = threading.Lock()
+_servidor = None
+
+def _formatear(etiquetas, **extra):
+    pares = list(etiquetas) + list(extra.items())
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{clave}="{valor}"' for clave, valor in pares) + "}"
+
+def _obtener(clase, nombre, ayuda, etiquetas, **kwargs):
+    if not METRICS_ENABLED:
+        return NULA
+    clave = tuple(sorted(etiquetas.items()))
+    with _lock_registro:
+        familia = _registro.setdefault(nombre, {"tipo": clase.tipo, "ayuda": ayuda, "series": {}})
+        metrica = familia["series"].get(clave)
+        if metrica is None:
+            metrica = familia["series"][clave] = clase(**kwargs)
+        return metrica
+
+def histograma(nombre, ayuda, buckets=BUCKETS_SEGUNDOS, **etiquetas):
+    """Retorna (creándolo una sola vez) el histograma con ese nombre y etiquetas."""
+    return _obtener(Histograma, nombre, ayuda, etiquetas, buckets=buckets)
+
+def contador(nombre, ayuda, funcion=None, **etiquetas):
+    """Retorna el contador con ese nombre y etiquetas; con funcion, su valor se lee al exponer."""
+    return _obtener(Contador, nombre, ayuda, etiquetas, funcion=funcion)
+
+def medidor(nombre, ayuda, funcion=None, **etiquetas):
+    """Retorna el medidor (gauge) con ese nombre y etiquetas; con funcion, su valor se lee al exponer."""
+    return _obtener(Medidor, nombre, ayuda, etiquetas, funcion=funcion)
+
+def observar_etapa(etapa, segundos):
+    """Registra la duración de una etapa del pipeline en ialeph_etapa_segundos."""
+    histograma("ialeph_etapa_segundos", "Duración de cada etapa del pipeline", etapa=etapa).observar(segundos)
+
+def cronometrar(modelo):
+    """
+    Decorador: registra la duración de cada llamada en ialeph_modelo_segundos{modelo=...}.
+    Con las métricas desactivadas retorna la función original (sin envoltura).
+    """
+    def decorador(fn):
+        hist = histograma("ialeph_modelo_segundos", "Duración de cada llamada a un modelo", modelo=modelo)
+        if hist is NULA:
+            return fn
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observar(time.perf_counter() - t0)
+        return envoltura
+    return decorador
+
+def registrar_error(componente, mensaje, error):
+    """Imprime el error (como hasta ahora) y lo cuenta en ialeph_errores_total{componente=...}."""
+    print(mensaje, error)
+    contador("ialeph_errores_total", "Errores capturados por componente", componente=componente).incrementar()
+
+def exposicion():
+    """Texto en formato de exposición de Prometheus con todas las métricas registradas."""
+    with _lock_registro:
+        familias = [(nombre, familia["tipo"], familia["ayuda"], list(familia["series"].items()))
+                    for nombre, familia in sorted(_registro.items())]
+    lineas = []
+    for nombre, tipo, ayuda, series in familias:
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for etiquetas, metrica in series:
+            try:
+                lineas.extend(metrica.muestras(nombre, etiquetas))
+            except Exception as e:
+                # Un callback que falla no debe tumbar el endpoint
+                lineas.append(f"# error en {nombre}: {e!r}")
+    return "\n".join(lineas) + "\n"
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = exposicion().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass  # sin registro por petición en stdout
+
+def iniciar_servidor(puerto=METRICS_HTTP_PORT):
+    """Arranca (una sola vez) el endpoint GET /metrics en 127.0.0.1; no hace nada si están desactivadas."""
+    global _servidor
+    if not METRICS_ENABLED or not puerto or _servidor is not None:
+        return _servidor
+    _servidor = ThreadingHTTPServer(("127.0.0.1", puerto), _ManejadorMetricas)
+    _servidor.daemon_threads = True
+    threading.Thread(target=_servidor.serve_forever, daemon=True).start()
+    print(f"Métricas en http://127.0.0.1:{puerto}/metrics")
+    return _servidor
+
+def dibujar_overlay(frame, x=10, y=40):
+    """Dibuja sobre el frame la última duración de cada etapa y los medidores (si METRICS_OVERLAY)."""
+    if not (METRICS_ENABLED and METRICS_OVERLAY):
+        return
+    with _lock_registro:
+        etapas = list(_registro.get("ialeph_etapa_segundos", {}).get("series", {}).items())
+        medidores = [(nombre, serie) for nombre, familia in _registro.items() if familia["tipo"] == "gauge"
+                     for serie in familia["series"].items()]
+    lineas = [f"{dict(etiquetas).get('etapa')}: {hist.ultimo * 1000:.1f} ms" for etiquetas, hist in etapas]
+    lineas += [f"{nombre.replace('ialeph_', '')}{_formatear(etiquetas)}: {metrica.leer():g}"
+               for nombre, (etiquetas, metrica) in medidores]
+    for i, linea in enumerate(lineas):
+        cv2.putText(frame, linea, (x, y + 16 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
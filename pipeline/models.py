@@ -0,0 +1,145 @@
+"""
+Registro de modelos: carga en paralelo y en segundo plano, con banderas de "listo" por familia.
+
+Cada familia corresponde a un módulo que carga sus modelos al importarse (ver pipeline/tasks.py).
+registro.iniciar() importa cada módulo en su propio hilo, así la captura y la visualización arrancan
+de inmediato y cada etapa se activa cuando su modelo está listo (registro.listo(familia)).
+
+crear_sesion_onnx crea las sesiones con los hilos y providers de la etapa (pipeline/runtime.py) y guarda
+en MODEL_CACHE_DIR el modelo ya optimizado por onnxruntime (formato ORT); los arranques siguientes lo
+cargan sin volver a optimizar el grafo.
+"""
+import hashlib
+import importlib
+import os
+import platform
+import threading
+import time
+
+from config import MODEL_CACHE_DIR
+from pipeline.metrics import registrar_error
+from pipeline.runtime import fijar_afinidad, opciones_onnx, providers_onnx
+from pipeline.tasks import MODULOS
+
+# Familia -> módulo que carga sus modelos al importarse
+FAMILIAS = {
+    "deteccion": "detectors.yolo2",
+    "tracker": "tracking.tracker",
+    **MODULOS,
+}
+
+class RegistroModelos:
+    """
+    Carga los módulos de modelos en hilos de fondo (uno por familia) y registra cuánto tardó cada uno.
+    Los módulos de Python solo se importan una vez por proceso, así que iniciar() puede llamarse
+    varias veces y desde distintos lugares.
+    """
+
+    def __init__(self, familias=FAMILIAS):
+        self.familias = dict(familias)
+        self.inicio = time.perf_counter()
+        self.tiempos = {}
+        self.errores = {}
+        self._terminados = {familia: threading.Event() for familia in self.familias}
+        self._iniciadas = set()
+        self._lock = threading.Lock()
+
+    def iniciar(self, familias=None):
+        """Lanza la carga en segundo plano de las familias indicadas (por defecto, todas); no bloquea."""
+        with self._lock:
+            nuevas = [f for f in (familias or self.familias) if f not in self._iniciadas]
+            self._iniciadas.update(nuevas)
+        for familia in nuevas:
+            threading.Thread(target=self._cargar, args=(familia,), name=f"carga-{familia}", daemon=True).start()
+        return self
+
+    def _cargar(self, familia):
+        # Los pools de hilos de los motores se crean al cargar y heredan la afinidad de este hilo
+        fijar_afinidad(familia)
+        t0 = time.perf_counter()
+        try:
+            modulo = importlib.import_module(self.familias[familia])
+            # Módulos que difieren su carga pesada (p. ej. el embedder del tracker) la exponen en precargar()
+            if callable(getattr(modulo, "precargar", None)):
+                modulo.precargar()
+            self.tiempos[familia] = round(time.perf_counter() - t0, 3)
+        except Exception as e:
+            self.errores[familia] = repr(e)
+            registrar_error("carga_modelos", f"Error al cargar los modelos de {familia}:", e)
+        finally:
+            self._terminados[familia].set()
+
+    def listo(self, familia):
+        """True si los modelos de la familia ya están cargados (sin bloquear)."""
+        return self._terminados[familia].is_set() and familia in self.tiempos
+
+    def esperar(self, familias=None, timeout=None):
+        """Espera a que terminen de cargar las familias indicadas; retorna True si todas quedaron listas."""
+        familias = list(familias or self.familias)
+        self.iniciar(familias)
+        limite = None if timeout is None else time.perf_counter() + timeout
+        for familia in familias:
+            restante = None if limite is None else max(0.0, limite - time.perf_counter())
+            self._terminados[familia].wait(restante)
+        return all(self.listo(familia) for familia in familias)
+
+    def modulo(self, familia):
+        """Módulo de la familia (llamar solo cuando listo(familia) es True, o bloquea hasta importarlo)."""
+        return importlib.import_module(self.familias[familia])
+
+    def desglose(self):
+        """Segundos de carga por familia (medidos en su hilo) y errores, si los hubo."""
+        desglose = {"modelos": dict(self.tiempos)}
+        if self.errores:
+            desglose["errores"] = dict(self.errores)
+        return desglose
+
+# Registro del proceso
+registro = RegistroModelos()
+
+def _ruta_cache(ruta, version, nivel):
+    """Ruta del modelo optimizado en caché; la clave cambia si cambian el modelo, onnxruntime, el nivel o la CPU."""
+    estado = os.stat(ruta)
+    clave = "|".join([os.path.abspath(ruta), str(estado.st_size), str(estado.st_mtime_ns), version, str(nivel),
+                      platform.machine(), platform.processor()])
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    return os.path.join(MODEL_CACHE_DIR, f"{nombre}-{hashlib.sha1(clave.encode()).hexdigest()[:16]}.ort")
+
+def crear_sesion_onnx(ruta, opciones=None, providers=None, familia=None):
+    """
+    Crea una sesión de onnxruntime usando (y, si no existe, generando) el modelo optimizado en caché.
+
+    Parámetros:
+      - ruta: Modelo .onnx original.
+      - opciones: ort.SessionOptions (por defecto, las de la etapa según pipeline/runtime.py).
+      - providers: Lista de (nombre, opciones) de execution providers (por defecto, los de la configuración).
+      - familia: Etapa dueña de la sesión (define sus hilos; ver RUNTIME_THREADS).
+
+    Retorna:
+      - session: ort.InferenceSession.
+    """
+    import onnxruntime as ort
+
+    providers = providers or providers_onnx(familia)
+    opciones = opciones or opciones_onnx(familia, providers)
+    nombres = [nombre for nombre, _ in providers]
+    argumentos = {"providers": nombres, "provider_options": [opciones_provider for _, opciones_provider in providers]}
+    # El formato ORT guarda el grafo con los nodos asignados a CPU; con otros providers (OpenVINO, XNNPACK)
+    # la partición se decide al cargar, así que solo se usa la caché con CPU
+    if not MODEL_CACHE_DIR or nombres != ["CPUExecutionProvider"]:
+        return ort.InferenceSession(ruta, opciones, **argumentos)
+    cache = _ruta_cache(ruta, ort.__version__, opciones.graph_optimization_level)
+    if os.path.exists(cache):
+        # El grafo ya está optimizado: no repetir las optimizaciones al cargar
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        return ort.InferenceSession(cache, opciones, **argumentos)
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    temporal = f"{cache}.{os.getpid()}.tmp.ort"
+    opciones.optimized_model_filepath = temporal
+    opciones.add_session_config_entry("session.save_model_format", "ORT")
+    session = ort.InferenceSession(ruta, opciones, **argumentos)
+    try:
+        os.replace(temporal, cache)
+    except OSError as e:
+        registrar_error("cache_modelos", f"No se pudo guardar el modelo optimizado {cache}:", e)
+    return session
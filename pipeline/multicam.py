@@ -0,0 +1,259 @@
+import collections
+import json
+import queue
+import threading
+import time
+
+import cv2
+
+from config import (MULTICAM_MAX_BATCH, MULTICAM_BUFFER, MULTICAM_CLASSIFICATION_EVERY,
+                    MULTICAM_REPORT_INTERVAL)
+from detectors.yolo2 import detectar_personas_lote
+from tracking.tracker import crear_tracker, actualizar_tracker, ids_activos
+from tracking.attributes import TrackAttributeStore
+from tracking.snapshot import crear_snapshot
+from pipeline.classification import clasificar_personas, obtener_motor
+from pipeline.events import DetectorCambios, EventSink
+from pipeline.metrics import contador, registrar_error
+from pipeline.capture import POLITICA_BLOQUEAR, abrir_fuente, politica_por_defecto
+
+PROCESS_WIDTH = 240    # Resolución baja para detección/tracking
+PROCESS_HEIGHT = 180
+
+class Stream:
+    """
+    Estado de una cámara: hilo de captura, buffer acotado de frames pendientes, tracker propio
+    y caché de clasificación propia (los IDs de distintas cámaras son independientes).
+    """
+
+    def __init__(self, stream_id, fuente, buffer_size=MULTICAM_BUFFER, politica=None):
+        self.stream_id = stream_id
+        self.fuente = fuente
+        self.politica = politica or politica_por_defecto(fuente)
+        self.cap = abrir_fuente(fuente)
+        self.tracker = crear_tracker()
+        self.person_cache = TrackAttributeStore()
+        self.cambios = DetectorCambios(camara=stream_id)
+        self.pendientes = collections.deque()
+        self.buffer_size = buffer_size
+        self.cond = threading.Condition()
+        # Último frame capturado y última salida de tracking, para dibujar
+        self.ultimo_frame = None
+        self.personas = []
+        self.activo = True
+        # Contadores para el reporte de throughput
+        self.capturados = 0
+        self.descartados = 0
+        self.detectados = 0
+        self.pesados_descartados = 0
+
+    def capturar(self):
+        """Bucle del hilo de captura: lee frames y los deja en el buffer según la política."""
+        while self.activo:
+            ret, frame = self.cap.read()
+            if not ret:
+                print(f"[cam {self.stream_id}] Fin de la fuente o error de captura: {self.fuente}")
+                break
+            with self.cond:
+                self.capturados += 1
+                self.ultimo_frame = frame
+                if self.politica == POLITICA_BLOQUEAR:
+                    while self.activo and len(self.pendientes) >= self.buffer_size:
+                        self.cond.wait(timeout=0.5)
+                elif len(self.pendientes) >= self.buffer_size:
+                    self.pendientes.popleft()
+                    self.descartados += 1
+                self.pendientes.append((self.capturados, frame))
+        with self.cond:
+            self.activo = False
+        self.cap.release()
+
+    def tomar(self):
+        """Retorna el par (frame_id, frame) pendiente más antiguo o None (no bloquea)."""
+        with self.cond:
+            if not self.pendientes:
+                return None
+            pendiente = self.pendientes.popleft()
+            self.cond.notify()
+            return pendiente
+
+    def terminado(self):
+        with self.cond:
+            return not self.activo and not self.pendientes
+
+class InferenceScheduler:
+    """
+    Planificador central: una sola copia de cada modelo atiende a todas las cámaras.
+    - Agrupa en un lote como máximo un frame por cámara (reparto justo, con turno rotatorio
+      cuando hay más cámaras que MULTICAM_MAX_BATCH) y lo pasa al detector en una sola llamada.
+    - El tracking se hace por cámara, con su propio tracker, en el mismo hilo (actualizaciones serializadas).
+    - Cada MULTICAM_CLASSIFICATION_EVERY detecciones de una cámara, su frame pasa a la cola pesada;
+      si la cola está llena el frame se descarta y se contabiliza.
+    """
+
+    def __init__(self, streams, event_sink, max_batch=MULTICAM_MAX_BATCH,
+                 classification_every=MULTICAM_CLASSIFICATION_EVERY, report_interval=MULTICAM_REPORT_INTERVAL):
+        self.streams = streams
+        self.event_sink = event_sink
+        self.max_batch = max_batch
+        self.classification_every = classification_every
+        self.report_interval = report_interval
+        self.heavy_queue = queue.Queue(maxsize=2 * len(streams))
+        self.activo = True
+        self._turno = 0
+        self._lotes = 0
+        self._frames_en_lotes = 0
+
+    def _armar_lote(self):
+        lote = []
+        n = len(self.streams)
+        for k in range(n):
+            stream = self.streams[(self._turno + k) % n]
+            pendiente = stream.tomar()
+            if pendiente is not None:
+                lote.append((stream, pendiente))
+                if len(lote) >= self.max_batch:
+                    break
+        self._turno = (self._turno + 1) % n
+        return lote
+
+    def ejecutar_deteccion(self):
+        """Bucle del hilo de detección/tracking compartido."""
+        while self.activo:
+            lote = self._armar_lote()
+            if not lote:
+                if all(stream.terminado() for stream in self.streams):
+                    break
+                time.sleep(0.002)
+                continue
+
+            frames_proc = [cv2.resize(frame, (PROCESS_WIDTH, PROCESS_HEIGHT)) for _, (_, frame) in lote]
+            try:
+                detecciones_lote = detectar_personas_lote(frames_proc)
+            except Exception as e:
+                registrar_error("deteccion_lote", "Error en detección por lotes:", e)
+                continue
+            self._lotes += 1
+            self._frames_en_lotes += len(lote)
+
+            for (stream, (frame_id, frame)), frame_proc, detecciones in zip(lote, frames_proc, detecciones_lote):
+                personas = actualizar_tracker(detecciones, frame_proc, stream.tracker)
+                stream.detectados += 1
+                snapshot = crear_snapshot(frame_id, frame_proc, frame, personas, ids_activos(stream.tracker))
+                stream.personas = snapshot.personas
+                if stream.detectados % self.classification_every == 0:
+                    try:
+                        self.heavy_queue.put_nowait((stream, snapshot))
+                    except queue.Full:
+                        stream.pesados_descartados += 1
+                        contador("ialeph_descartes_total", "Frames descartados por motivo",
+                                 motivo="cola_pesada", camara=stream.stream_id).incrementar()
+        self.activo = False
+
+    def ejecutar_pesado(self):
+        """Bucle del hilo de inferencia pesada compartido por todas las cámaras."""
+        while self.activo or not self.heavy_queue.empty():
+            try:
+                stream, snapshot = self.heavy_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            # Un error en un frame no debe detener el hilo pesado que comparten todas las cámaras
+            try:
+                resultados, _, _ = clasificar_personas(snapshot.frame, snapshot.frame_captura,
+                                                       snapshot.personas, stream.person_cache)
+                eliminados = stream.person_cache.podar(snapshot.ids_vivos)
+                self.event_sink.publicar(stream.cambios.eventos(resultados, eliminados))
+            except Exception as e:
+                registrar_error("inferencia_pesada", f"[cam {stream.stream_id}] Error en la inferencia pesada:", e)
+            finally:
+                self.heavy_queue.task_done()
+
+    def reportar(self):
+        """Imprime periódicamente el throughput agregado y por cámara."""
+        previos = {stream.stream_id: 0 for stream in self.streams}
+        t_previo = time.perf_counter()
+        while self.activo:
+            time.sleep(self.report_interval)
+            ahora = time.perf_counter()
+            dt = ahora - t_previo
+            t_previo = ahora
+            partes = []
+            total = 0
+            for stream in self.streams:
+                fps = (stream.detectados - previos[stream.stream_id]) / dt
+                previos[stream.stream_id] = stream.detectados
+                total += fps
+                partes.append(f"cam {stream.stream_id}: {fps:.1f} fps, capturados {stream.capturados}, "
+                              f"descartados {stream.descartados}, pesados descartados {stream.pesados_descartados}")
+            lote_medio = self._frames_en_lotes / self._lotes if self._lotes else 0.0
+            print(f"Throughput: {total:.1f} fps de detección en {len(self.streams)} cámaras, "
+                  f"lote medio {lote_medio:.2f} | " + " | ".join(partes)
+                  + f" | eventos {json.dumps(self.event_sink.metricas())}")
+
+def dibujar(stream):
+    """Dibuja las cajas y etiquetas de la última salida de tracking sobre el último frame de la cámara."""
+    frame = stream.ultimo_frame
+    if frame is None:
+        return None
+    display_frame = frame.copy()
+    scale_x = frame.shape[1] / PROCESS_WIDTH
+    scale_y = frame.shape[0] / PROCESS_HEIGHT
+    for persona in stream.personas:
+        x1, y1, x2, y2 = persona["bbox"]
+        x1, x2 = int(x1 * scale_x), int(x2 * scale_x)
+        y1, y2 = int(y1 * scale_y), int(y2 * scale_y)
+        cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        pid = persona["id"]
+        info = stream.person_cache.obtener(pid)
+        if info:
+            etiqueta = f"ID: {pid} {info['genero']}, {info['edad']}, {info['emocion']}"
+        else:
+            etiqueta = f"ID: {pid} Cargando..."
+        cv2.putText(display_frame, etiqueta, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return display_frame
+
+def ejecutar_multicamara(fuentes, mostrar=True):
+    """
+    Ejecuta el pipeline sobre varias fuentes con un solo conjunto de modelos.
+
+    Parámetros:
+      - fuentes: Lista de fuentes (índices de cámara, URLs RTSP o archivos de video).
+      - mostrar: Si es True, muestra una ventana por cámara (presiona 'q' para salir).
+    """
+    motor = obtener_motor()
+    streams = [Stream(i, fuente) for i, fuente in enumerate(fuentes)]
+    event_sink = EventSink()
+    scheduler = InferenceScheduler(streams, event_sink)
+
+    hilo_pesado = threading.Thread(target=scheduler.ejecutar_pesado, daemon=True)
+    hilos = [threading.Thread(target=stream.capturar, daemon=True) for stream in streams]
+    hilos.append(threading.Thread(target=scheduler.ejecutar_deteccion, daemon=True))
+    hilos.append(hilo_pesado)
+    hilos.append(threading.Thread(target=scheduler.reportar, daemon=True))
+    for hilo in hilos:
+        hilo.start()
+
+    try:
+        while scheduler.activo:
+            if mostrar:
+                # cv2.imshow debe llamarse desde el hilo principal
+                for stream in streams:
+                    display_frame = dibujar(stream)
+                    if display_frame is not None:
+                        cv2.imshow(f"Camara {stream.stream_id}", display_frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            else:
+                time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.activo = False
+        for stream in streams:
+            stream.activo = False
+        if mostrar:
+            cv2.destroyAllWindows()
+        # Terminar de clasificar los frames que ya estaban en la cola pesada
+        hilo_pesado.join()
+        motor.cerrar()
+        event_sink.cerrar()
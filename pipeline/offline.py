@@ -0,0 +1,319 @@
+"""
+Modo offline: reprocesa video grabado (archivos o directorios) a máximo throughput, sin descartar frames.
+
+- Un hilo decodifica el video y reduce cada frame; la cola entre ambos es acotada (la decodificación espera).
+- La detección se ejecuta por lotes de OFFLINE_BATCH frames con la sesión ONNX de detectors/yolo.py
+  (eje de batch dinámico, ver tools/export_yolo_onnx.py) y el tracking se hace en orden, frame a frame.
+- La clasificación (rostros, emoción, edad/género, productos) se reparte en un pool de OFFLINE_WORKERS hilos
+  sobre el motor pesado (HEAVY_BACKEND="process" la ejecuta en procesos worker).
+- Los resultados se escriben por frame, en orden, en <salida>/<video>-<hash>.ndjson (el hash de la ruta absoluta
+  distingue videos con el mismo nombre en directorios distintos), y cada OFFLINE_CHECKPOINT_EVERY frames se
+  guarda un checkpoint (<video>-<hash>.checkpoint.json) desde el que se reanuda si el proceso se interrumpe.
+  Al reanudar el tracker empieza de cero: cada registro lleva el número de segmento, y (segmento, id)
+  identifica al track.
+- Varios archivos se procesan en paralelo, cada uno en su propio proceso (OFFLINE_PROCESSES).
+
+Uso (desde la raíz del repositorio):
+    python -m pipeline.offline grabaciones/ --salida resultados --procesos 4
+    python main.py --offline --fuentes grabaciones/
+"""
+import argparse
+import collections
+import hashlib
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from config import (OFFLINE_OUTPUT_DIR, OFFLINE_BATCH, OFFLINE_WORKERS, OFFLINE_CLASSIFICATION_EVERY,
+                    OFFLINE_CHECKPOINT_EVERY, OFFLINE_PROCESSES)
+from pipeline.metrics import registrar_error
+
+PROCESS_WIDTH = 240    # Misma resolución de detección/tracking que el modo en vivo
+PROCESS_HEIGHT = 180
+EXTENSIONES_VIDEO = (".mp4", ".avi", ".mkv", ".mov", ".m4v", ".ts", ".webm")
+# Segundos entre reportes de frames/seg
+INTERVALO_REPORTE = 5.0
+
+def listar_videos(entradas):
+    """Expande las entradas (archivos o directorios, recursivamente) a la lista ordenada de videos."""
+    videos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, _, archivos in os.walk(entrada):
+                videos.extend(os.path.join(raiz, nombre) for nombre in archivos
+                              if nombre.lower().endswith(EXTENSIONES_VIDEO))
+        elif os.path.isfile(entrada):
+            videos.append(entrada)
+        else:
+            print(f"Entrada no encontrada: {entrada}")
+    return sorted(videos)
+
+def rutas_salida(video, salida_dir):
+    """
+    Retorna (ruta de resultados .ndjson, ruta del checkpoint) para un video.
+    El nombre lleva un hash corto de la ruta absoluta: camA/clip.mp4 y camB/clip.mp4 no comparten resultados
+    ni checkpoint.
+    """
+    nombre = os.path.splitext(os.path.basename(video))[0]
+    clave = hashlib.sha1(os.path.abspath(video).encode()).hexdigest()[:8]
+    base = os.path.join(salida_dir, f"{nombre}-{clave}")
+    return base + ".ndjson", base + ".checkpoint.json"
+
+def leer_checkpoint(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def guardar_checkpoint(ruta, datos):
+    """Escribe el checkpoint de forma atómica (archivo temporal + os.replace)."""
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+    os.replace(temporal, ruta)
+
+def _encolar(cola, item, activo):
+    """Encola item esperando si la cola está llena; desiste si el consumidor se detuvo."""
+    while activo.is_set():
+        try:
+            cola.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+def _decodificar(cap, cola, activo):
+    """
+    Hilo de decodificación: lee cada frame, lo reduce y lo encola (espera si la cola está llena).
+    Al terminar encola siempre el fin: None, o la excepción si la decodificación falló (p. ej. un archivo
+    corrupto), para que el consumidor la relance en lugar de esperar para siempre.
+    """
+    fin = None
+    try:
+        frame_id = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        while activo.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_id += 1
+            reducido = cv2.resize(frame, (PROCESS_WIDTH, PROCESS_HEIGHT))
+            _encolar(cola, (frame_id, frame, reducido), activo)
+    except Exception as e:
+        fin = e
+    finally:
+        _encolar(cola, fin, activo)
+
+def _tomar_lote(cola, tamano):
+    """
+    Toma hasta `tamano` frames de la cola (espera el primero). Retorna (lote, fin_de_video).
+    Relanza la excepción del hilo de decodificación si este falló.
+    """
+    lote = []
+    item = cola.get()
+    while item is not None:
+        if isinstance(item, Exception):
+            raise item
+        lote.append(item)
+        if len(lote) >= tamano:
+            return lote, False
+        try:
+            item = cola.get(timeout=0.05)
+        except queue.Empty:
+            return lote, False
+    return lote, True
+
+def _registro_frame(segmento, frame_id, fps_video, personas, resultados):
+    """Registro de un frame: todas las personas trackeadas, con sus atributos si el frame se clasificó."""
+    clasificadas = {r["id"]: r for r in resultados or ()}
+    return {
+        "segmento": segmento,
+        "frame": frame_id,
+        "t": round((frame_id - 1) / fps_video, 3) if fps_video else None,
+        "personas": [clasificadas.get(p["id"], {"id": p["id"], "bbox": list(p["bbox"])}) for p in personas],
+    }
+
+def procesar_video(ruta, salida_dir=OFFLINE_OUTPUT_DIR, lote=OFFLINE_BATCH, workers=OFFLINE_WORKERS,
+                   clasificar_cada=OFFLINE_CLASSIFICATION_EVERY, checkpoint_cada=OFFLINE_CHECKPOINT_EVERY):
+    """
+    Procesa un video completo (o lo reanuda desde su checkpoint).
+
+    Parámetros:
+      - ruta: Ruta del video.
+      - salida_dir: Directorio de resultados y checkpoints.
+      - lote: Frames por llamada al detector.
+      - workers: Hilos del pool de clasificación.
+      - clasificar_cada: Se clasifica uno de cada N frames (el tracking y los registros son de todos).
+      - checkpoint_cada: Frames escritos entre checkpoints.
+
+    Retorna:
+      - resumen: {'video', 'frames', 'segundos', 'fps'} (frames procesados en esta ejecución).
+    """
+    # Importación diferida: el proceso que solo reparte archivos entre procesos no carga los modelos
+    from detectors.yolo import detectar_personas_lote
+    from tracking.tracker import crear_tracker, actualizar_tracker, ids_activos
+    from tracking.attributes import TrackAttributeStore
+    from pipeline.classification import clasificar_personas, obtener_motor
+
+    nombre = os.path.basename(ruta)
+    ruta_resultados, ruta_checkpoint = rutas_salida(ruta, salida_dir)
+    os.makedirs(salida_dir, exist_ok=True)
+    checkpoint = leer_checkpoint(ruta_checkpoint) or {"video": ruta, "frame": 0, "bytes": 0, "segmento": -1}
+    if checkpoint.get("terminado"):
+        print(f"[{nombre}] Ya procesado, se omite ({ruta_resultados})")
+        return {"video": ruta, "frames": 0, "segundos": 0.0, "fps": 0.0}
+
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        raise IOError(f"No se pudo abrir el video: {ruta}")
+    fps_video = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    segmento = checkpoint["segmento"] + 1
+    if checkpoint["frame"]:
+        # Reanudar: descartar lo escrito después del último checkpoint y saltar los frames ya procesados
+        cap.set(cv2.CAP_PROP_POS_FRAMES, checkpoint["frame"])
+        print(f"[{nombre}] Reanudando desde el frame {checkpoint['frame']} (segmento {segmento})")
+    archivo = open(ruta_resultados, "a+b")
+    archivo.truncate(checkpoint["bytes"])
+    archivo.seek(checkpoint["bytes"])
+
+    tracker = crear_tracker()
+    store = TrackAttributeStore()
+    motor = obtener_motor()
+    # Offline no se omite ninguna etapa: esperar a que carguen todos los modelos
+    motor.esperar()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    cola = queue.Queue(maxsize=4 * lote)
+    activo = threading.Event()
+    activo.set()
+    hilo = threading.Thread(target=_decodificar, args=(cap, cola, activo), daemon=True)
+    hilo.start()
+
+    # Frames ya trackeados pendientes de escribir, en orden: (frame_id, personas, futuro o None, ids_vivos)
+    pendientes = collections.deque()
+    escritos = 0
+    ultimo_escrito = checkpoint["frame"]
+    t_inicio = t_reporte = time.perf_counter()
+    escritos_reporte = 0
+
+    def escribir_listos(maximo):
+        """Escribe en orden los frames cuyo resultado ya está; si quedan más de `maximo`, espera al primero."""
+        nonlocal escritos, ultimo_escrito
+        while pendientes and (len(pendientes) > maximo or pendientes[0][2] is None or pendientes[0][2].done()):
+            frame_id, personas, futuro, ids_vivos = pendientes.popleft()
+            resultados = None
+            if futuro is not None:
+                try:
+                    resultados, _, _ = futuro.result()
+                except Exception as e:
+                    registrar_error("clasificacion", f"[{nombre}] Error en clasificación del frame {frame_id}:", e)
+                # Mismo reloj que el tracker y la clasificación: el tiempo del video
+                store.podar(ids_vivos, (frame_id - 1) / fps_video if fps_video else None)
+            linea = json.dumps(_registro_frame(segmento, frame_id, fps_video, personas, resultados),
+                               separators=(",", ":"), ensure_ascii=False, default=str)
+            archivo.write(linea.encode("utf-8") + b"\n")
+            escritos += 1
+            ultimo_escrito = frame_id
+            if escritos % checkpoint_cada == 0:
+                archivo.flush()
+                guardar_checkpoint(ruta_checkpoint, {"video": ruta, "frame": ultimo_escrito,
+                                                     "bytes": archivo.tell(), "segmento": segmento})
+
+    try:
+        fin = False
+        while not fin:
+            bloque, fin = _tomar_lote(cola, lote)
+            if not bloque:
+                continue
+            detecciones_lote = detectar_personas_lote([reducido for _, _, reducido in bloque])
+            for (frame_id, frame, reducido), detecciones in zip(bloque, detecciones_lote):
+                # Tiempo del video (no del reloj) para la poda de tracks y la caché de atributos:
+                # el offline corre más rápido que tiempo real
+                ahora = (frame_id - 1) / fps_video if fps_video else None
+                personas = actualizar_tracker(detecciones, reducido, tracker, ahora)
+                futuro = None
+                if personas and frame_id % clasificar_cada == 0:
+                    futuro = pool.submit(clasificar_personas, reducido, frame, personas, store, motor, ahora)
+                pendientes.append((frame_id, personas, futuro, ids_activos(tracker)))
+            # Contrapresión: no acumular más de unos pocos lotes esperando a la clasificación
+            escribir_listos(maximo=4 * lote)
+
+            ahora = time.perf_counter()
+            if ahora - t_reporte >= INTERVALO_REPORTE:
+                fps = (escritos - escritos_reporte) / (ahora - t_reporte)
+                print(f"[{nombre}] frame {ultimo_escrito}/{total}: {fps:.1f} fps "
+                      f"(media {escritos / (ahora - t_inicio):.1f} fps)")
+                t_reporte, escritos_reporte = ahora, escritos
+        escribir_listos(maximo=0)
+        archivo.flush()
+        guardar_checkpoint(ruta_checkpoint, {"video": ruta, "frame": ultimo_escrito, "bytes": archivo.tell(),
+                                             "segmento": segmento, "terminado": True})
+    finally:
+        activo.clear()
+        hilo.join(timeout=2)
+        pool.shutdown(wait=True)
+        archivo.close()
+        cap.release()
+
+    segundos = time.perf_counter() - t_inicio
+    resumen = {"video": ruta, "frames": escritos, "segundos": round(segundos, 2),
+               "fps": round(escritos / segundos, 2) if segundos > 0 else 0.0}
+    print(f"[{nombre}] Terminado:", json.dumps(resumen))
+    return resumen
+
+def procesar_entradas(entradas, salida_dir=OFFLINE_OUTPUT_DIR, procesos=OFFLINE_PROCESSES):
+    """
+    Procesa todos los videos de las entradas. Con procesos > 1, cada video corre en un intérprete
+    propio (python -m pipeline.offline <video>), con a lo sumo `procesos` videos a la vez.
+    Retorna la lista de videos que fallaron.
+    """
+    videos = listar_videos(entradas)
+    if not videos:
+        print("No se encontraron videos en:", ", ".join(entradas))
+        return []
+    if procesos <= 1 or len(videos) == 1:
+        fallidos = []
+        for video in videos:
+            try:
+                procesar_video(video, salida_dir)
+            except Exception as e:
+                # Un video que falla (p. ej. corrupto) no detiene el resto; su checkpoint permite reanudarlo
+                registrar_error("offline", f"Error al procesar {video}:", e)
+                fallidos.append(video)
+        if fallidos:
+            print(f"Fallidos (se reanudan al volver a ejecutar): {', '.join(fallidos)}")
+        return fallidos
+
+    t_inicio = time.perf_counter()
+    restantes = collections.deque(videos)
+    activos = {}
+    fallidos = []
+    while restantes or activos:
+        while restantes and len(activos) < procesos:
+            video = restantes.popleft()
+            cmd = [sys.executable, "-m", "pipeline.offline", video, "--salida", salida_dir, "--procesos", "1"]
+            activos[video] = subprocess.Popen(cmd)
+        for video, proceso in list(activos.items()):
+            if proceso.poll() is not None:
+                del activos[video]
+                if proceso.returncode != 0:
+                    fallidos.append(video)
+        time.sleep(0.2)
+    print(f"{len(videos)} videos en {time.perf_counter() - t_inicio:.1f} s con {procesos} procesos"
+          + (f"; fallidos (se reanudan al volver a ejecutar): {', '.join(fallidos)}" if fallidos else ""))
+    return fallidos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IAleph: procesamiento offline de video grabado.")
+    parser.add_argument("entradas", nargs="+", help="Archivos de video o directorios")
+    parser.add_argument("--salida", default=OFFLINE_OUTPUT_DIR, help="Directorio de resultados y checkpoints")
+    parser.add_argument("--procesos", type=int, default=OFFLINE_PROCESSES, help="Videos en paralelo")
+    args = parser.parse_args()
+    # Código de salida distinto de 0 si algún video falló (así lo cuenta el proceso padre)
+    sys.exit(1 if procesar_entradas(args.entradas, args.salida, args.procesos) else 0)
@@ -0,0 +1,301 @@
+"""
+Backend de procesos para la inferencia pesada (HEAVY_BACKEND="process").
+
+Cada familia de modelos (rostros, emociones, edad/género, productos) vive en su propio
+proceso worker, que carga sus modelos una sola vez al arrancar. Así el pre/postprocesamiento
+en Python de DeepFace, Keras y ultralytics no compite por el GIL con el bucle de captura y dibujo.
+
+- Los frames viajan por memoria compartida (multiprocessing.shared_memory): el proceso principal
+  los copia una vez en un slot y los workers crean vistas NumPy sin copiar ni serializar.
+- Las tareas y los resultados (pequeños: cajas, etiquetas) viajan por una conexión
+  multiprocessing.connection por worker.
+- Los workers se lanzan como intérpretes nuevos (python -m pipeline.process_pool <familia>)
+  para no reimportar main.py ni heredar los modelos del proceso principal.
+"""
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+import queue
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from pipeline.metrics import registrar_error
+from pipeline.runtime import aplicar_entorno, fijar_afinidad
+from pipeline.tasks import TAREAS, cargar
+
+# Variable de entorno con la clave de autenticación (no se pasa por argv para que no aparezca en ps)
+_ENV_AUTHKEY = "IALEPH_WORKER_AUTHKEY"
+# Segundos máximos para que un worker recién lanzado se conecte (se conecta antes de cargar los modelos)
+TIMEOUT_CONEXION = 60
+
+class MotorProcesos:
+    """
+    Ejecuta las tareas de pipeline/tasks.py en un proceso worker por familia.
+    Misma interfaz que MotorLocal: publicar(), enviar() -> Future, liberar().
+    """
+
+    def __init__(self, n_slots=2):
+        authkey = os.urandom(16)
+        self._listener = Listener(authkey=authkey)
+        self._conexiones = {}
+        self._locks_envio = {}
+        self._procesos = []
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        # Cada worker avisa cuando terminó de cargar sus modelos (mensaje ("listo", ok, segundos o error));
+        # _terminados se activa en ambos casos (o si el worker muere), así esperar() no se cuelga
+        self._listos = {familia: threading.Event() for familia in TAREAS}
+        self._terminados = {familia: threading.Event() for familia in TAREAS}
+        self.tiempos_carga = {}
+        self.errores_carga = {}
+
+        env = dict(os.environ, **{_ENV_AUTHKEY: authkey.hex()})
+        for familia in TAREAS:
+            cmd = [sys.executable, "-m", "pipeline.process_pool", familia, self._listener.address]
+            proceso = subprocess.Popen(cmd, env=env)
+            self._procesos.append(proceso)
+            try:
+                conexion = self._aceptar(familia, proceso)
+            except RuntimeError:
+                self._abortar()
+                raise
+            nombre = conexion.recv()  # cada worker se presenta con su familia
+            self._conexiones[nombre] = conexion
+            self._locks_envio[nombre] = threading.Lock()
+            threading.Thread(target=self._leer, args=(nombre, conexion), daemon=True).start()
+
+        # Pool de slots de memoria compartida (cada uno guarda frame reducido + captura)
+        self._n_slots = n_slots
+        self._slots = []
+        self._libres = queue.Queue()
+        self._lock_slots = threading.Lock()
+
+    def _aceptar(self, familia, proceso, timeout=TIMEOUT_CONEXION):
+        """
+        Espera la conexión del worker recién lanzado. Falla con un error claro si el proceso termina
+        antes de conectarse (p. ej. un error de importación) o si no se conecta en timeout segundos.
+        """
+        aceptadas = queue.Queue()
+
+        def aceptar():
+            try:
+                aceptadas.put(self._listener.accept())
+            except OSError as e:
+                aceptadas.put(e)
+
+        threading.Thread(target=aceptar, name=f"aceptar-{familia}", daemon=True).start()
+        limite = time.perf_counter() + timeout
+        while True:
+            try:
+                resultado = aceptadas.get(timeout=0.2)
+                break
+            except queue.Empty:
+                pass
+            if proceso.poll() is not None:
+                raise RuntimeError(f"El worker de {familia} terminó (código {proceso.returncode}) "
+                                   "antes de conectarse")
+            if time.perf_counter() > limite:
+                raise RuntimeError(f"El worker de {familia} no se conectó en {timeout} s")
+        if isinstance(resultado, Exception):
+            raise RuntimeError(f"Error al aceptar la conexión del worker de {familia}: {resultado!r}")
+        return resultado
+
+    def _abortar(self):
+        """Termina los workers ya lanzados y cierra el listener (arranque fallido)."""
+        for proceso in self._procesos:
+            if proceso.poll() is None:
+                proceso.kill()
+        for conexion in self._conexiones.values():
+            conexion.close()
+        self._listener.close()
+
+    def _leer(self, familia, conexion):
+        """Hilo lector: resuelve los Futures con los resultados que envía un worker."""
+        while True:
+            try:
+                id_tarea, ok, resultado = conexion.recv()
+            except (EOFError, OSError):
+                break
+            if id_tarea == "listo":
+                if ok:
+                    self.tiempos_carga[familia] = resultado
+                    self._listos[familia].set()
+                else:
+                    self.errores_carga[familia] = resultado
+                    registrar_error("carga_modelos", f"Error al cargar los modelos de {familia} (worker):", resultado)
+                self._terminados[familia].set()
+                continue
+            with self._lock:
+                futuro = self._pendientes.pop(id_tarea, None)
+            if futuro is None:
+                continue
+            if ok:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(RuntimeError(resultado))
+        # El worker terminó: fallar las tareas que quedaron pendientes
+        if not self._terminados[familia].is_set():
+            self.errores_carga[familia] = "El proceso worker terminó antes de cargar los modelos"
+            self._terminados[familia].set()
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        for futuro in pendientes.values():
+            if not futuro.done():
+                futuro.set_exception(RuntimeError("El proceso worker terminó"))
+
+    def _slot(self, nbytes):
+        """Toma un slot libre con al menos nbytes; crea o agranda slots según haga falta."""
+        # Puede llamarse desde varios hilos a la vez (p. ej. el pool de clasificación del modo offline)
+        with self._lock_slots:
+            try:
+                shm = self._libres.get_nowait()
+            except queue.Empty:
+                shm = None
+                if len(self._slots) < self._n_slots:
+                    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+                    self._slots.append(shm)
+        if shm is None:
+            shm = self._libres.get()
+        if shm.size < nbytes:
+            # Frame mayor que el slot (p. ej. otra resolución de captura): se reemplaza por uno mayor
+            with self._lock_slots:
+                self._slots.remove(shm)
+                shm.close()
+                shm.unlink()
+                shm = shared_memory.SharedMemory(create=True, size=nbytes)
+                self._slots.append(shm)
+        return shm
+
+    def publicar(self, frame, frame_captura):
+        """Copia ambos frames en un slot de memoria compartida y retorna la referencia para los workers."""
+        shm = self._slot(frame.nbytes + frame_captura.nbytes)
+        np.ndarray(frame.shape, np.uint8, buffer=shm.buf)[:] = frame
+        np.ndarray(frame_captura.shape, np.uint8, buffer=shm.buf, offset=frame.nbytes)[:] = frame_captura
+        return (shm.name, frame.shape, frame_captura.shape)
+
+    def liberar(self, ref):
+        """Devuelve el slot al pool (llamar cuando todas las tareas sobre ref terminaron)."""
+        with self._lock_slots:
+            for shm in self._slots:
+                if shm.name == ref[0]:
+                    self._libres.put(shm)
+                    return
+
+    def listo(self, familia):
+        """True si el worker de la familia ya cargó sus modelos."""
+        return self._listos[familia].is_set()
+
+    def esperar(self, timeout=None):
+        """Espera a que todos los workers carguen sus modelos; retorna True si todos quedaron listos."""
+        limite = None if timeout is None else time.perf_counter() + timeout
+        for evento in self._terminados.values():
+            evento.wait(None if limite is None else max(0.0, limite - time.perf_counter()))
+        return all(evento.is_set() for evento in self._listos.values())
+
+    def desglose_carga(self):
+        """Segundos de carga por familia, medidos en cada worker, y errores de carga, si los hubo."""
+        desglose = dict(self.tiempos_carga)
+        if self.errores_carga:
+            desglose["errores"] = dict(self.errores_carga)
+        return desglose
+
+    def enviar(self, familia, ref, args=None):
+        """Envía una tarea al worker de la familia y retorna un Future con su resultado."""
+        futuro = Future()
+        id_tarea = next(self._ids)
+        with self._lock:
+            self._pendientes[id_tarea] = futuro
+        try:
+            with self._locks_envio[familia]:
+                self._conexiones[familia].send((id_tarea, ref, args))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._pendientes.pop(id_tarea, None)
+            futuro.set_exception(e)
+        return futuro
+
+    def cerrar(self):
+        """Detiene los workers y libera la memoria compartida."""
+        for familia, conexion in self._conexiones.items():
+            try:
+                with self._locks_envio[familia]:
+                    conexion.send(None)
+            except OSError:
+                pass
+        for proceso in self._procesos:
+            try:
+                proceso.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+        self._slots = []
+        self._listener.close()
+
+def _vistas(ref, adjuntos):
+    """Crea vistas NumPy (sin copia) sobre los frames de un slot de memoria compartida."""
+    nombre, forma, forma_captura = ref
+    shm = adjuntos.get(nombre)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=nombre)
+        # El proceso principal es el dueño del segmento: el worker no debe eliminarlo al salir
+        resource_tracker.unregister(shm._name, "shared_memory")
+        adjuntos[nombre] = shm
+    frame = np.ndarray(forma, np.uint8, buffer=shm.buf)
+    frame_captura = np.ndarray(forma_captura, np.uint8, buffer=shm.buf, offset=frame.nbytes)
+    return frame, frame_captura
+
+def ejecutar_worker(familia, direccion):
+    """Bucle de un proceso worker: carga los modelos de su familia y atiende tareas hasta recibir None."""
+    os.environ["CUDA_VISIBLE_DEVICES"] = "-1"  # Deshabilita GPU (igual que main.py)
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    # Hilos y núcleos del proceso según la etapa (antes de importar los motores de inferencia)
+    aplicar_entorno(familia)
+    fijar_afinidad(familia)
+    conexion = Client(direccion, authkey=bytes.fromhex(os.environ[_ENV_AUTHKEY]))
+    conexion.send(familia)
+    # Los modelos se cargan después de conectarse, así todos los workers cargan en paralelo;
+    # el proceso principal no envía tareas a la familia hasta recibir el aviso de "listo"
+    t0 = time.perf_counter()
+    try:
+        cargar(familia)
+    except Exception as e:
+        conexion.send(("listo", False, repr(e)))
+        conexion.close()
+        return
+    conexion.send(("listo", True, round(time.perf_counter() - t0, 3)))
+    tarea = TAREAS[familia]
+    adjuntos = {}
+    while True:
+        try:
+            mensaje = conexion.recv()
+        except EOFError:
+            break
+        if mensaje is None:
+            break
+        id_tarea, ref, args = mensaje
+        try:
+            frame, frame_captura = _vistas(ref, adjuntos)
+            resultado = tarea(frame, frame_captura, args)
+            # Soltar las vistas antes de la siguiente tarea (el slot puede reutilizarse o reemplazarse)
+            del frame, frame_captura
+            conexion.send((id_tarea, True, resultado))
+        except Exception as e:
+            conexion.send((id_tarea, False, f"{familia}: {e!r}"))
+    for shm in adjuntos.values():
+        try:
+            shm.close()
+        except BufferError:
+            pass
+    conexion.close()
+
+if __name__ == "__main__":
+    ejecutar_worker(sys.argv[1], sys.argv[2])
@@ -0,0 +1,163 @@
+"""
+Configuración central de hilos, afinidad y execution providers de los motores de inferencia.
+
+Sin configuración, onnxruntime, TensorFlow (Keras y DeepFace), torch (ultralytics) y OpenCV crean cada uno
+un pool con tantos hilos como núcleos, y cuando el bucle de detección y el worker pesado coinciden compiten
+por los mismos núcleos. Aquí cada etapa (familia de pipeline/models.py) recibe su número de hilos
+(RUNTIME_THREADS) y, opcionalmente, sus núcleos (RUNTIME_AFFINITY).
+
+- onnxruntime: hilos por sesión, así que cada etapa usa los suyos aunque compartan proceso.
+- TensorFlow, torch y OpenCV: un solo pool por proceso, configurado por la primera etapa que lo usa.
+  Con HEAVY_BACKEND="process" cada familia tiene su proceso y su configuración exacta.
+- Afinidad: en Linux se aplica al hilo que llama (y a los hilos que cree después), por eso se fija en el
+  hilo que carga los modelos de cada familia (los pools se crean al cargar) o en todo el proceso worker.
+"""
+import os
+import threading
+
+from config import (RUNTIME_THREADS, RUNTIME_INTER_THREADS, RUNTIME_AFFINITY, ORT_GRAPH_OPTIMIZATION,
+                    ORT_PROVIDERS)
+from pipeline.metrics import registrar_error
+
+# Providers que "auto" usa si están disponibles, en orden de preferencia
+PROVIDERS_PREFERIDOS = ("OpenVINOExecutionProvider", "XnnpackExecutionProvider")
+
+# Motores con un solo pool por proceso que ya se configuraron (el primero gana)
+_configurados = set()
+_lock = threading.Lock()
+
+def hilos(familia=None):
+    """Hilos intra-op de la etapa: RUNTIME_THREADS[familia], luego RUNTIME_THREADS["*"], luego la mitad de los núcleos."""
+    if familia in RUNTIME_THREADS:
+        return max(1, RUNTIME_THREADS[familia])
+    if "*" in RUNTIME_THREADS:
+        return max(1, RUNTIME_THREADS["*"])
+    return max(1, (os.cpu_count() or 2) // 2)
+
+def parsear_nucleos(texto):
+    """'0-2,5' -> {0, 1, 2, 5}."""
+    nucleos = set()
+    for parte in texto.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        inicio, _, fin = parte.partition("-")
+        nucleos.update(range(int(inicio), int(fin or inicio) + 1))
+    return nucleos
+
+def fijar_afinidad(familia):
+    """
+    Fija los núcleos de la etapa en el hilo actual (y los hilos que cree después) según RUNTIME_AFFINITY.
+    Retorna los núcleos fijados, o None si no hay configuración o la plataforma no lo soporta.
+    """
+    texto = RUNTIME_AFFINITY.get(familia, RUNTIME_AFFINITY.get("*"))
+    if not texto or not hasattr(os, "sched_setaffinity"):
+        return None
+    try:
+        nucleos = parsear_nucleos(texto)
+        os.sched_setaffinity(0, nucleos)
+        return nucleos
+    except (ValueError, OSError) as e:
+        registrar_error("runtime", f"No se pudo fijar la afinidad de {familia} ({texto}):", e)
+        return None
+
+def variables_entorno(familia):
+    """
+    Variables de entorno de hilos (OpenMP/MKL/OpenBLAS/TensorFlow) para un proceso dedicado a la etapa.
+    Deben aplicarse antes de importar los motores; las ya definidas no se pisan.
+    """
+    n = str(hilos(familia))
+    return {"OMP_NUM_THREADS": n, "MKL_NUM_THREADS": n, "OPENBLAS_NUM_THREADS": n,
+            "TF_NUM_INTRAOP_THREADS": n, "TF_NUM_INTEROP_THREADS": str(RUNTIME_INTER_THREADS)}
+
+def aplicar_entorno(familia):
+    for clave, valor in variables_entorno(familia).items():
+        os.environ.setdefault(clave, valor)
+
+def _primera_vez(motor):
+    with _lock:
+        if motor in _configurados:
+            return False
+        _configurados.add(motor)
+        return True
+
+def configurar_tensorflow(familia):
+    """Fija los hilos de TensorFlow (debe llamarse antes de ejecutar cualquier operación)."""
+    if not _primera_vez("tensorflow"):
+        return
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(hilos(familia))
+        tf.config.threading.set_inter_op_parallelism_threads(RUNTIME_INTER_THREADS)
+    except RuntimeError as e:
+        # TensorFlow ya se inicializó (otra parte del proceso ejecutó operaciones antes)
+        registrar_error("runtime", "TensorFlow ya estaba inicializado; se mantienen sus hilos:", e)
+
+def configurar_torch(familia):
+    """Fija los hilos de torch (ultralytics)."""
+    if not _primera_vez("torch"):
+        return
+    import torch
+    torch.set_num_threads(hilos(familia))
+    try:
+        torch.set_num_interop_threads(RUNTIME_INTER_THREADS)
+    except RuntimeError as e:
+        registrar_error("runtime", "torch ya había iniciado su pool inter-op; se mantienen sus hilos:", e)
+
+def configurar_opencv(familia):
+    """Fija los hilos de OpenCV (DNN de YuNet, resize, etc.)."""
+    if not _primera_vez("opencv"):
+        return
+    import cv2
+    cv2.setNumThreads(hilos(familia))
+
+def _nivel_grafo(ort):
+    niveles = {
+        "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }
+    if ORT_GRAPH_OPTIMIZATION not in niveles:
+        raise ValueError(f"Nivel de optimización desconocido: {ORT_GRAPH_OPTIMIZATION!r} (usa {', '.join(niveles)})")
+    return niveles[ORT_GRAPH_OPTIMIZATION]
+
+def providers_onnx(familia=None):
+    """
+    Execution providers para una sesión de la etapa, como lista de (nombre, opciones).
+    Con "auto" se usan OpenVINO o XNNPACK si están instalados; CPU siempre queda como respaldo.
+    """
+    import onnxruntime as ort
+
+    disponibles = ort.get_available_providers()
+    if ORT_PROVIDERS == "auto":
+        nombres = [p for p in PROVIDERS_PREFERIDOS if p in disponibles][:1]
+    else:
+        nombres = [p.strip() for p in ORT_PROVIDERS.split(",") if p.strip() and p.strip() in disponibles]
+    nombres = [p for p in nombres if p != "CPUExecutionProvider"] + ["CPUExecutionProvider"]
+
+    n = hilos(familia)
+    opciones = {
+        "OpenVINOExecutionProvider": {"device_type": "CPU", "num_of_threads": str(n)},
+        "XnnpackExecutionProvider": {"intra_op_num_threads": str(n)},
+    }
+    return [(nombre, opciones.get(nombre, {})) for nombre in nombres]
+
+def opciones_onnx(familia=None, providers=None):
+    """
+    SessionOptions para la etapa: hilos intra/inter-op propios, ejecución secuencial, sin spinning
+    (los hilos ociosos no consumen CPU que necesita otra etapa) y el nivel de optimización configurado.
+    """
+    import onnxruntime as ort
+
+    opciones = ort.SessionOptions()
+    opciones.graph_optimization_level = _nivel_grafo(ort)
+    opciones.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opciones.inter_op_num_threads = RUNTIME_INTER_THREADS
+    if providers and providers[0][0] == "XnnpackExecutionProvider":
+        # XNNPACK usa su propio pool (provider option); el de ORT queda para los nodos que caen en CPU
+        opciones.intra_op_num_threads = 1
+    else:
+        opciones.intra_op_num_threads = hilos(familia)
+    opciones.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return opciones
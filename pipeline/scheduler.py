@@ -0,0 +1,150 @@
+import math
+import threading
+
+import cv2
+import numpy as np
+
+from config import TARGET_FPS, DETECTION_BUDGET, MOTION_THRESHOLD, STATIC_THRESHOLD
+
+# Resolución del frame en escala de grises usado para la diferencia entre frames (muy barata)
+MOTION_SIZE = (64, 48)
+
+class AdaptiveScheduler:
+    """
+    Decide en qué frames se ejecuta la detección/tracking y en cuáles se envía un snapshot a la
+    inferencia pesada, en lugar de los intervalos fijos DETECTION_EVERY_N_FRAME / CLASSIFICATION_EVERY_N_FRAME.
+
+    - Intervalo de detección: el mínimo que mantiene el costo amortizado de detectar por debajo de
+      DETECTION_BUDGET del periodo de TARGET_FPS, según la latencia medida (media móvil).
+    - Movimiento: una diferencia grande entre frames reducidos adelanta la detección (a lo sumo a la mitad
+      del intervalo, para respetar DETECTION_BUDGET); si la escena está estática el intervalo se duplica (hasta max_interval).
+    - Intervalo de clasificación: el necesario para que el hilo pesado alcance a procesar cada snapshot,
+      y aumenta cuando la cola pesada se llena o descarta frames; disminuye cuando la cola está vacía.
+    """
+
+    def __init__(self, detection_interval, classification_interval, target_fps=TARGET_FPS,
+                 detection_budget=DETECTION_BUDGET, motion_threshold=MOTION_THRESHOLD,
+                 static_threshold=STATIC_THRESHOLD, min_interval=1, max_interval=120, adaptativo=True):
+        self.detection_interval = detection_interval
+        self.classification_interval = classification_interval
+        self.target_fps = target_fps
+        self.detection_budget = detection_budget
+        self.motion_threshold = motion_threshold
+        self.static_threshold = static_threshold
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.adaptativo = adaptativo
+        self._lock = threading.Lock()
+        self._ultima_deteccion = 0
+        self._ultima_clasificacion = 0
+        self._frame_movimiento = None
+        # Latencias (segundos, media móvil) y estado de la cola pesada
+        self.latencia_deteccion = None
+        self.latencia_pesada = None
+        self.profundidad_cola = 0
+        self.estatico = False
+        # Métricas
+        self.detecciones = 0
+        self.detecciones_por_movimiento = 0
+        self.clasificaciones = 0
+        self.descartes_pesados = 0
+
+    @staticmethod
+    def _ema(previo, nuevo, alpha=0.2):
+        return nuevo if previo is None else (1 - alpha) * previo + alpha * nuevo
+
+    def _limitar(self, valor):
+        return int(min(self.max_interval, max(self.min_interval, valor)))
+
+    def movimiento(self, frame):
+        """Retorna la diferencia media absoluta (0-255) respecto al último frame de detección."""
+        pequeno = cv2.cvtColor(cv2.resize(frame, MOTION_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if self._frame_movimiento is None:
+            return float("inf"), pequeno
+        return float(np.mean(cv2.absdiff(pequeno, self._frame_movimiento))), pequeno
+
+    def debe_detectar(self, frame_count, frame):
+        """True si en este frame toca detección/tracking (por intervalo o por movimiento)."""
+        desde_ultima = frame_count - self._ultima_deteccion
+        if not self.adaptativo:
+            # Por frames transcurridos y no por frame_count % N: los IDs del anillo saltan cuando se descartan frames
+            if desde_ultima >= self.detection_interval:
+                self._ultima_deteccion = frame_count
+                return True
+            return False
+        if desde_ultima < self.min_interval:
+            return False
+        diferencia, pequeno = self.movimiento(frame)
+        # El movimiento adelanta la detección, pero no más allá de la mitad del intervalo del presupuesto:
+        # con movimiento continuo no se detecta en cada frame
+        piso_movimiento = max(self.min_interval, self.detection_interval // 2)
+        por_movimiento = diferencia >= self.motion_threshold and desde_ultima >= piso_movimiento
+        self.estatico = diferencia < self.static_threshold
+        # En escena estática se espera el doble del intervalo calculado
+        intervalo = self._limitar(self.detection_interval * (2 if self.estatico else 1))
+        if por_movimiento or desde_ultima >= intervalo:
+            self._ultima_deteccion = frame_count
+            self._frame_movimiento = pequeno
+            if por_movimiento and desde_ultima < intervalo:
+                self.detecciones_por_movimiento += 1
+            return True
+        return False
+
+    def registrar_deteccion(self, segundos):
+        """Registra la latencia de una detección y recalcula el intervalo de detección."""
+        with self._lock:
+            self.detecciones += 1
+            self.latencia_deteccion = self._ema(self.latencia_deteccion, segundos)
+            if self.adaptativo:
+                # Costo amortizado por frame = latencia / intervalo <= presupuesto * periodo objetivo
+                presupuesto = self.detection_budget / self.target_fps
+                self.detection_interval = self._limitar(math.ceil(self.latencia_deteccion / presupuesto))
+
+    def debe_clasificar(self, frame_count):
+        """True si en este frame toca enviar el último snapshot a la inferencia pesada."""
+        # También sin modo adaptativo: por frames transcurridos, no por frame_count % N
+        if frame_count - self._ultima_clasificacion >= self.classification_interval:
+            self._ultima_clasificacion = frame_count
+            return True
+        return False
+
+    def registrar_envio(self, descartado):
+        """Registra el resultado de encolar un snapshot pesado (descartado=True si la cola estaba llena)."""
+        with self._lock:
+            if descartado:
+                self.descartes_pesados += 1
+                if self.adaptativo:
+                    # La inferencia pesada no alcanza: espaciar los envíos
+                    self.classification_interval = self._limitar(self.classification_interval * 1.5)
+
+    def registrar_pesado(self, segundos, profundidad_cola):
+        """Registra la latencia de un ciclo pesado y la profundidad de la cola; ajusta el intervalo de clasificación."""
+        with self._lock:
+            self.clasificaciones += 1
+            self.latencia_pesada = self._ema(self.latencia_pesada, segundos)
+            self.profundidad_cola = profundidad_cola
+            if not self.adaptativo:
+                return
+            # Frames que dura un ciclo pesado a la tasa objetivo: enviar más seguido solo acumula cola
+            minimo = math.ceil(self.latencia_pesada * self.target_fps)
+            if profundidad_cola > 0:
+                intervalo = self.classification_interval + 1
+            else:
+                intervalo = self.classification_interval - 1
+            self.classification_interval = self._limitar(max(minimo, intervalo))
+
+    def metricas(self):
+        """Intervalos actuales, latencias y contadores, para registro o exposición como métricas."""
+        with self._lock:
+            return {
+                "detection_interval": self.detection_interval,
+                "classification_interval": self.classification_interval,
+                "latencia_deteccion_ms": None if self.latencia_deteccion is None else self.latencia_deteccion * 1000,
+                "latencia_pesada_ms": None if self.latencia_pesada is None else self.latencia_pesada * 1000,
+                "profundidad_cola": self.profundidad_cola,
+                "escena_estatica": self.estatico,
+                "detecciones": self.detecciones,
+                "detecciones_por_movimiento": self.detecciones_por_movimiento,
+                "clasificaciones": self.clasificaciones,
+                "descartes_pesados": self.descartes_pesados,
+            }
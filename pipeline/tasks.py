@@ -0,0 +1,85 @@
+import importlib
+
+import cv2
+
+from config import PRODUCTS_MODE
+from pipeline.metrics import registrar_error
+
+# Tareas de inferencia pesada agrupadas por familia de modelos. Cada tarea recibe
+# (frame, frame_captura, args) y retorna un resultado pequeño y serializable, de modo que
+# pueda ejecutarse en el mismo proceso (hilo) o en un proceso worker que lee los frames
+# desde memoria compartida. Los módulos de modelos se importan al cargar la familia,
+# así cada proceso solo carga los modelos que usa.
+
+# Familia -> módulo que carga sus modelos al importarse
+MODULOS = {
+    "rostros": "detectors.faces",
+    "emociones": "classification.emotion2",
+    "edades_generos": "classification.age_gender",
+    "productos": "segmentation.segmentation2",
+}
+
+def cargar(familia):
+    """Importa (y con ello carga una sola vez) los modelos de la familia indicada."""
+    return importlib.import_module(MODULOS[familia])
+
+def _recortes_rostro(frame_captura, regiones):
+    # Regiones ya calculadas (con margen y limitadas al frame) por detectors.faces_ops.region_rostro
+    return [frame_captura[y1:y2, x1:x2] for x1, y1, x2, y2 in regiones]
+
+def tarea_rostros(frame, frame_captura, args=None):
+    """Detecta todos los rostros de la captura original."""
+    return cargar("rostros").detectar_rostros(frame_captura)
+
+def tarea_emociones(frame, frame_captura, regiones):
+    """Emoción (etiqueta, confianza, probabilidades) de cada región de rostro, en un solo batch (el modelo espera RGB)."""
+    rostros = [cv2.cvtColor(rostro, cv2.COLOR_BGR2RGB) for rostro in _recortes_rostro(frame_captura, regiones)]
+    return cargar("emociones").reconocer_emociones(rostros, probabilidades=True)
+
+def tarea_edades_generos(frame, frame_captura, regiones):
+    """Edad y género de cada región de rostro, en un solo batch (la red espera BGR)."""
+    return cargar("edades_generos").clasificar_edades_generos(_recortes_rostro(frame_captura, regiones))
+
+def tarea_productos(frame, frame_captura, bboxes):
+    """
+    Productos de cada persona (bboxes enteras en el frame reducido), según PRODUCTS_MODE.
+    Las cajas de los productos se retornan en coordenadas del frame reducido.
+    """
+    modulo = cargar("productos")
+    if not bboxes:
+        return []
+    if PRODUCTS_MODE == "frame":
+        # Una pasada sobre la captura completa (más resolución que el frame reducido)
+        sx = frame_captura.shape[1] / frame.shape[1]
+        sy = frame_captura.shape[0] / frame.shape[0]
+        escala = (sx, sy, sx, sy)
+        bboxes_captura = [[v * e for v, e in zip(bbox, escala)] for bbox in bboxes]
+        productos_por_persona = modulo.segmentar_productos_frame(frame_captura, bboxes_captura)
+        for productos in productos_por_persona:
+            for producto in productos:
+                producto["box"] = [v / e for v, e in zip(producto["box"], escala)]
+        return productos_por_persona
+    rois = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in bboxes]
+    offsets = [(x1, y1) for x1, y1, _, _ in bboxes]
+    if PRODUCTS_MODE == "lote":
+        return modulo.segmentar_productos_lote(rois, offsets)
+    # "roi": una llamada por persona (comportamiento original)
+    productos = []
+    for roi, (x1, y1) in zip(rois, offsets):
+        try:
+            productos_roi = modulo.segmentar_productos(roi)
+        except Exception as e:
+            registrar_error("productos", "Error en segmentación de productos (heavy):", e)
+            productos_roi = []
+        for producto in productos_roi:
+            producto["box"] = [producto["box"][0] + x1, producto["box"][1] + y1,
+                               producto["box"][2] + x1, producto["box"][3] + y1]
+        productos.append(productos_roi)
+    return productos
+
+TAREAS = {
+    "rostros": tarea_rostros,
+    "emociones": tarea_emociones,
+    "edades_generos": tarea_edades_generos,
+    "productos": tarea_productos,
+}
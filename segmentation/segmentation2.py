@@ -1,10 +1,36 @@
+import numpy as np
 from ultralytics import YOLO
 
-# Carga el modelo exportado (asegúrate de que la ruta sea correcta)
-detector = YOLO("segmentation/best.pt")
-# Las etiquetas serán las definidas durante el entrenamiento (por ejemplo, ['bottle','handbag','cell_phone','cup','laptop'])
+from config import PRODUCTS_MODEL_PATH
+from pipeline.metrics import cronometrar
+from pipeline.runtime import configurar_torch
+
+# Hilos de torch de la etapa de productos (antes de crear el modelo)
+configurar_torch("productos")
+
+# Carga el modelo exportado (asegúrate de que la ruta sea correcta); también acepta el .onnx exportado
+detector = YOLO(PRODUCTS_MODEL_PATH, task="detect")
+# Las etiquetas serán las definidas durante el entrenamiento (dataset/data.yaml: ['Blind_box', 'Lemon_sapporo', 'Shoes'])
 CLASS_NAMES = detector.names
+# Fracción mínima del área de un producto que debe caer dentro de la persona para asignárselo
+MIN_CONTENCION = 0.5
+
+def _productos(resultado, conf, offset=(0.0, 0.0)):
+    """Convierte un resultado de ultralytics en la lista de productos (cajas desplazadas por offset)."""
+    boxes = resultado.boxes
+    productos = []
+    for box, cls, score in zip(boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy(), boxes.conf.cpu().numpy()):
+        if float(score) < conf:
+            continue
+        x1, y1, x2, y2 = box.tolist()
+        productos.append({
+            "label": CLASS_NAMES[int(cls)],
+            "confidence": float(score),
+            "box": [x1 + offset[0], y1 + offset[1], x2 + offset[0], y2 + offset[1]],
+        })
+    return productos
 
+@cronometrar("productos")
 def segmentar_productos(frame, conf=0.7):
     """
     Ejecuta el modelo entrenado (YOLOv8) sobre la imagen frame y retorna una lista 
@@ -12,19 +38,76 @@ def segmentar_productos(frame, conf=0.7):
     
     Parámetros:
       - frame: imagen (numpy array) que corresponde a la ROI (zona de interés).
-      - conf: umbral de confianza (por defecto 0.5).
+      - conf: umbral de confianza (por defecto 0.7).
     
     Retorna:
-      - productos: lista de diccionarios, cada uno con la etiqueta y la confianza.
+      - productos: lista de diccionarios con la etiqueta, la confianza y la caja [x1, y1, x2, y2] en la ROI.
     """
     # Ejecuta el detector sobre la imagen
-    resultados = detector(frame, verbose=False)[0]
-    productos = [
-        {
-            "label": CLASS_NAMES[int(cls)]
-            # "confidence": float(score)
-        }
-        for cls, score in zip(resultados.boxes.cls, resultados.boxes.conf)
-        if float(score) >= conf
-    ]
-    return productos
\ No newline at end of file
+    resultados = detector(frame, conf=conf, verbose=False)[0]
+    return _productos(resultados, conf)
+
+@cronometrar("productos_lote")
+def segmentar_productos_lote(rois, offsets=None, conf=0.7):
+    """
+    Ejecuta el detector sobre todas las ROIs en una sola llamada batch.
+    
+    Parámetros:
+      - rois: lista de imágenes (una por persona).
+      - offsets: lista de (x, y) de la esquina de cada ROI, para devolver las cajas en coordenadas del frame.
+      - conf: umbral de confianza.
+    
+    Retorna:
+      - productos_por_roi: lista (mismo orden que rois) de listas de productos.
+    """
+    if not rois:
+        return []
+    offsets = offsets or [(0.0, 0.0)] * len(rois)
+    resultados = detector(list(rois), conf=conf, verbose=False)
+    return [_productos(resultado, conf, offset) for resultado, offset in zip(resultados, offsets)]
+
+def asignar_productos(productos, bboxes, min_contencion=MIN_CONTENCION):
+    """
+    Asigna cada producto a la persona que contiene la mayor fracción de su área.
+    
+    Parámetros:
+      - productos: lista de productos con "box" (mismas coordenadas que bboxes).
+      - bboxes: lista de bounding boxes [x1, y1, x2, y2] de las personas.
+      - min_contencion: fracción mínima del área del producto dentro de la persona.
+    
+    Retorna:
+      - productos_por_persona: lista (mismo orden que bboxes) de listas de productos.
+    """
+    productos_por_persona = [[] for _ in bboxes]
+    if not productos or not bboxes:
+        return productos_por_persona
+    personas = np.asarray(bboxes, dtype=np.float32)[None, :, :]           # (1, P, 4)
+    cajas = np.asarray([p["box"] for p in productos], dtype=np.float32)[:, None, :]  # (N, 1, 4)
+    ancho = np.clip(np.minimum(cajas[..., 2], personas[..., 2]) - np.maximum(cajas[..., 0], personas[..., 0]), 0, None)
+    alto = np.clip(np.minimum(cajas[..., 3], personas[..., 3]) - np.maximum(cajas[..., 1], personas[..., 1]), 0, None)
+    area = np.clip((cajas[..., 2] - cajas[..., 0]) * (cajas[..., 3] - cajas[..., 1]), 1e-9, None)
+    contencion = ancho * alto / area                                       # (N, P)
+    mejor = contencion.argmax(axis=1)
+    for producto, j, c in zip(productos, mejor, contencion[np.arange(len(productos)), mejor]):
+        if c >= min_contencion:
+            productos_por_persona[int(j)].append(producto)
+    return productos_por_persona
+
+@cronometrar("productos_frame")
+def segmentar_productos_frame(frame, bboxes, conf=0.7):
+    """
+    Una sola pasada del detector sobre el frame completo; los productos se asignan a las personas
+    por contención dentro de su bounding box.
+    
+    Parámetros:
+      - frame: imagen completa.
+      - bboxes: lista de bounding boxes [x1, y1, x2, y2] de las personas en coordenadas de frame.
+      - conf: umbral de confianza.
+    
+    Retorna:
+      - productos_por_persona: lista (mismo orden que bboxes) de listas de productos.
+    """
+    if not bboxes:
+        return []
+    resultados = detector(frame, conf=conf, verbose=False)[0]
+    return asignar_productos(_productos(resultados, conf), bboxes)
@@ -0,0 +1,71 @@
+from tracking.attributes import TrackAttributeStore, mediana_ponderada
+
+def _store(**kwargs):
+    opciones = dict(ttl=30.0, max_size=100, alpha=0.5, emotion_interval=0.5, min_confidence=0.6,
+                    quality_gain=0.2, max_samples=10)
+    opciones.update(kwargs)
+    return TrackAttributeStore(**opciones)
+
+def test_mediana_ponderada():
+    assert mediana_ponderada([20, 30, 40], [1, 1, 1]) == 30
+    # El peso desplaza la mediana hacia la observación más confiable
+    assert mediana_ponderada([20, 30, 40], [1, 1, 5]) == 40
+    assert mediana_ponderada([25, 35], [0, 0]) == 35
+
+def test_edad_genero_agregados():
+    store = _store()
+    store.actualizar_edad_genero(1, {"edad": 30, "edad_confianza": 1.0, "genero": "Man",
+                                     "genero_confianza": 0.9}, calidad=1.0, ahora=100.0)
+    store.actualizar_edad_genero(1, {"edad": 50, "edad_confianza": 1.0, "genero": "Woman",
+                                     "genero_confianza": 0.6}, calidad=0.2, ahora=101.0)
+    atributos = store.obtener(1)
+    assert atributos["edad"] == 30
+    assert atributos["genero"] == "Man"
+    assert store.obtener(2) is None
+
+def test_reclasificacion_de_edad_genero():
+    store = _store()
+    assert store.necesita_edad_genero(1, calidad=0.5)
+    store.actualizar_edad_genero(1, {"edad": 30, "genero": "Man", "genero_confianza": 0.95}, calidad=0.5,
+                                 ahora=100.0)
+    # Confianza alta y rostro de calidad similar: no se reclasifica
+    assert not store.necesita_edad_genero(1, calidad=0.55)
+    # Rostro claramente mejor que el mejor visto: sí
+    assert store.necesita_edad_genero(1, calidad=0.7)
+
+def test_intervalo_de_emocion_con_tiempo_cero():
+    store = _store(emotion_interval=0.5)
+    store.actualizar_emocion(1, {"feliz": 0.8, "triste": 0.2}, calidad=1.0, ahora=0.0)
+    # ahora=0.0 es un tiempo válido (modo offline), no "sin tiempo"
+    assert not store.necesita_emocion(1, ahora=0.0)
+    assert not store.necesita_emocion(1, ahora=0.4)
+    assert store.necesita_emocion(1, ahora=0.5)
+
+def test_ema_de_emocion():
+    store = _store(alpha=0.5)
+    store.actualizar_emocion(1, {"feliz": 1.0, "triste": 0.0}, calidad=1.0, ahora=100.0)
+    store.actualizar_emocion(1, {"feliz": 0.0, "triste": 1.0}, calidad=0.5, ahora=101.0)
+    # Peso efectivo alpha * calidad = 0.25
+    atributos = store.obtener(1)
+    assert atributos["emocion"] == "feliz"
+    assert abs(atributos["emocion_confianza"] - 0.75) < 1e-9
+
+def test_podar_por_ids_vivos_y_ttl():
+    store = _store(ttl=10.0)
+    for track_id in (1, 2, 3):
+        store.actualizar_emocion(track_id, {"feliz": 1.0}, calidad=1.0, ahora=100.0)
+    store.tocar([2], ahora=108.0)
+    # 3 ya no existe en el tracker; 1 expiró por TTL; 2 se vio hace poco
+    eliminados = store.podar(ids_vivos={1, 2}, ahora=112.0)
+    assert sorted(eliminados) == [1, 3]
+    assert 2 in store and len(store) == 1
+
+def test_expulsion_lru():
+    store = _store(max_size=2)
+    store.actualizar_emocion(1, {"feliz": 1.0}, calidad=1.0, ahora=100.0)
+    store.actualizar_emocion(2, {"feliz": 1.0}, calidad=1.0, ahora=101.0)
+    store.tocar([1], ahora=102.0)
+    store.actualizar_emocion(3, {"feliz": 1.0}, calidad=1.0, ahora=103.0)
+    # 2 es el usado hace más tiempo
+    assert 1 in store and 3 in store and 2 not in store
+    assert store.expulsados == 1
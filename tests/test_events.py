@@ -0,0 +1,30 @@
+from pipeline.events import ATRIBUTOS, PRODUCTOS, TRACK_FIN, TRACK_NUEVO, DetectorCambios
+
+def _registro(track_id, edad=30, emocion="feliz", productos=()):
+    return {"id": track_id, "bbox": [0, 0, 10, 20], "edad": edad, "genero": "Man", "emocion": emocion,
+            "productos": [{"label": label} for label in productos]}
+
+def _tipos(eventos):
+    return [(e["id"], e["tipo"]) for e in eventos]
+
+def test_solo_se_emiten_cambios():
+    cambios = DetectorCambios(camara=1)
+    assert _tipos(cambios.eventos([_registro(1)])) == [(1, TRACK_NUEVO)]
+    # Sin cambios: ningún evento
+    assert cambios.eventos([_registro(1)]) == []
+    assert _tipos(cambios.eventos([_registro(1, emocion="triste")])) == [(1, ATRIBUTOS)]
+    assert _tipos(cambios.eventos([_registro(1, emocion="triste", productos=["Shoes"])])) == [(1, PRODUCTOS)]
+
+def test_productos_sin_importar_el_orden():
+    cambios = DetectorCambios()
+    cambios.eventos([_registro(1, productos=["Shoes", "Blind_box"])])
+    assert cambios.eventos([_registro(1, productos=["Blind_box", "Shoes"])]) == []
+
+def test_fin_de_track_solo_para_tracks_emitidos():
+    cambios = DetectorCambios(camara=2)
+    cambios.eventos([_registro(1)])
+    eventos = cambios.eventos([], eliminados=[1, 99])
+    assert _tipos(eventos) == [(1, TRACK_FIN)]
+    assert eventos[0]["camara"] == 2
+    # Un ID que vuelve a aparecer tras terminar es un track nuevo
+    assert _tipos(cambios.eventos([_registro(1)])) == [(1, TRACK_NUEVO)]
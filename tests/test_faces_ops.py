@@ -0,0 +1,19 @@
+from detectors.faces_ops import asignar_rostros, calidad_rostro, region_rostro
+
+def test_asignacion_por_centro_y_score():
+    personas = [[0, 0, 100, 200], [100, 0, 200, 200]]
+    rostros = [([20, 10, 60, 50], 0.7), ([30, 20, 70, 60], 0.9), ([300, 10, 340, 50], 0.99)]
+    asignados = asignar_rostros(personas, rostros)
+    # La primera persona recibe el rostro de mayor score; el que queda fuera de todas no se asigna
+    assert asignados[0] == rostros[1]
+    assert asignados[1] is None
+
+def test_calidad_penaliza_rostros_pequenos():
+    assert calidad_rostro(([0, 0, 64, 80], 0.9)) == 0.9
+    assert calidad_rostro(([0, 0, 32, 80], 0.9)) == 0.45
+
+def test_region_con_margen_y_limitada_al_frame():
+    forma = (100, 200, 3)
+    assert region_rostro(forma, [50, 20, 100, 70]) == (40, 10, 110, 80)
+    assert region_rostro(forma, [-10, -10, 30, 30]) == (0, 0, 38, 38)
+    assert region_rostro(forma, [250, 20, 300, 70]) is None
@@ -0,0 +1,72 @@
+import numpy as np
+
+from tracking.iou_tracker import IouTracker, asociar, iou_matriz
+
+def _deteccion(x1, y1, x2, y2, conf=0.9):
+    return ([float(x1), float(y1), float(x2), float(y2)], conf, 0)
+
+def test_iou_matriz():
+    a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float64)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [100, 100, 110, 110]], dtype=np.float64)
+    iou = iou_matriz(a, b)
+    assert iou.shape == (2, 3)
+    assert np.isclose(iou[0, 0], 1.0)
+    assert np.isclose(iou[0, 1], 50 / 150)
+    assert iou[0, 2] == 0 and iou[1].max() == 0
+    assert iou_matriz(a, np.empty((0, 4))).shape == (2, 0)
+
+def test_asociar_greedy_por_iou_descendente():
+    iou = np.array([[0.9, 0.8],
+                    [0.85, 0.1]])
+    pares, tracks_libres, detecciones_libres = asociar(iou, umbral=0.3)
+    # (0, 0) se toma primero; el track 1 ya no puede usar la detección 0 y la 1 queda bajo el umbral
+    assert pares == [(0, 0)]
+    assert tracks_libres == [1]
+    assert detecciones_libres == [1]
+
+def test_confirmacion_tras_min_hits():
+    tracker = IouTracker(min_hits=3)
+    salidas = [tracker.actualizar([_deteccion(10 + t, 10, 60 + t, 110)], ahora=t / 30) for t in range(3)]
+    assert salidas[0] == [] and salidas[1] == []
+    assert len(salidas[2]) == 1
+
+def test_ids_estables_al_cruzarse():
+    """Dos personas que se cruzan en direcciones opuestas conservan su ID."""
+    tracker = IouTracker(min_hits=2)
+    ids = {"a": set(), "b": set()}
+    for t in range(31):
+        caja_a = (10 * t, 100, 10 * t + 50, 200)
+        caja_b = (300 - 10 * t, 130, 350 - 10 * t, 230)
+        personas = tracker.actualizar([_deteccion(*caja_a), _deteccion(*caja_b)], ahora=t / 30)
+        cajas = np.array([p['bbox'] for p in personas]).reshape(-1, 4)
+        referencia = np.array([caja_a, caja_b], dtype=np.float64)
+        for (g, p) in asociar(iou_matriz(referencia, cajas), 0.5)[0]:
+            ids["ab"[g]].add(personas[p]['id'])
+    assert len(ids["a"]) == 1 and len(ids["b"]) == 1
+    assert ids["a"] != ids["b"]
+
+def test_deteccion_de_baja_confianza_mantiene_el_track():
+    tracker = IouTracker(min_hits=1, conf_alta=0.5, conf_baja=0.1)
+    track_id = tracker.actualizar([_deteccion(0, 0, 50, 100)], ahora=0.0)[0]['id']
+    # Segunda ronda (ByteTrack): una detección dudosa actualiza el track existente...
+    personas = tracker.actualizar([_deteccion(2, 0, 52, 100, conf=0.2)], ahora=0.1)
+    assert [p['id'] for p in personas] == [track_id]
+    # ...pero nunca crea tracks nuevos
+    tracker.actualizar([_deteccion(300, 0, 350, 100, conf=0.2)], ahora=0.2)
+    assert tracker.ids_vivos() == {track_id}
+
+def test_poda_por_tiempo():
+    tracker = IouTracker(min_hits=1, max_perdido=2.0)
+    track_id = tracker.actualizar([_deteccion(0, 0, 50, 100)], ahora=0.0)[0]['id']
+    # Sin detecciones: el track confirmado sobrevive mientras no pasen max_perdido segundos
+    tracker.actualizar([], ahora=1.9)
+    assert track_id in tracker.ids_vivos()
+    tracker.actualizar([], ahora=2.1)
+    assert track_id not in tracker.ids_vivos()
+
+def test_tentativo_se_descarta_al_fallar():
+    tracker = IouTracker(min_hits=3)
+    tracker.actualizar([_deteccion(0, 0, 50, 100)], ahora=0.0)
+    assert len(tracker.ids_vivos()) == 1
+    tracker.actualizar([], ahora=0.1)
+    assert tracker.ids_vivos() == frozenset()
@@ -0,0 +1,14 @@
+import os
+
+from pipeline.offline import rutas_salida
+
+def test_rutas_distintas_para_videos_con_el_mismo_nombre(tmp_path):
+    a = rutas_salida(os.path.join("camA", "clip.mp4"), str(tmp_path))
+    b = rutas_salida(os.path.join("camB", "clip.mp4"), str(tmp_path))
+    assert a[0] != b[0] and a[1] != b[1]
+    assert os.path.basename(a[0]).startswith("clip-") and a[0].endswith(".ndjson")
+    assert a[1].endswith(".checkpoint.json")
+
+def test_rutas_estables_para_el_mismo_video(tmp_path):
+    # La misma ruta (relativa o absoluta) reanuda desde el mismo checkpoint
+    assert rutas_salida("clip.mp4", str(tmp_path)) == rutas_salida(os.path.abspath("clip.mp4"), str(tmp_path))
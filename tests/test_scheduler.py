@@ -0,0 +1,45 @@
+import numpy as np
+
+from pipeline.scheduler import AdaptiveScheduler
+
+def _frame(valor):
+    return np.full((180, 240, 3), valor, dtype=np.uint8)
+
+def test_intervalo_fijo_cuenta_frames_transcurridos():
+    scheduler = AdaptiveScheduler(detection_interval=5, classification_interval=10, adaptativo=False)
+    # IDs del anillo con saltos (frames descartados): 4, 9 y 14 nunca son múltiplos de 5
+    ids = [1, 2, 4, 9, 11, 14, 19]
+    detectados = [frame_id for frame_id in ids if scheduler.debe_detectar(frame_id, None)]
+    assert detectados == [9, 14, 19]
+
+def test_intervalo_por_presupuesto():
+    scheduler = AdaptiveScheduler(detection_interval=1, classification_interval=10, target_fps=30,
+                                  detection_budget=0.5)
+    scheduler.registrar_deteccion(0.1)
+    # 0.1 s por detección con 0.5/30 s de presupuesto por frame: una detección cada 6 frames
+    assert scheduler.detection_interval == 6
+
+def test_movimiento_continuo_respeta_el_presupuesto():
+    scheduler = AdaptiveScheduler(detection_interval=6, classification_interval=10, motion_threshold=12,
+                                  static_threshold=2)
+    detectados = []
+    for frame_id in range(1, 31):
+        # Escena que cambia mucho en cada frame
+        if scheduler.debe_detectar(frame_id, _frame(0 if frame_id % 2 else 200)):
+            detectados.append(frame_id)
+    separaciones = np.diff(detectados)
+    # El movimiento adelanta la detección, pero a lo sumo a la mitad del intervalo (3 frames)
+    assert separaciones.min() >= 3
+    assert scheduler.detecciones_por_movimiento > 0
+
+def test_escena_estatica_duplica_el_intervalo():
+    scheduler = AdaptiveScheduler(detection_interval=4, classification_interval=10, motion_threshold=12,
+                                  static_threshold=2)
+    detectados = [frame_id for frame_id in range(1, 30) if scheduler.debe_detectar(frame_id, _frame(100))]
+    assert np.diff(detectados).tolist() == [8] * (len(detectados) - 1)
+
+def test_descartes_espacian_la_clasificacion():
+    scheduler = AdaptiveScheduler(detection_interval=1, classification_interval=4)
+    scheduler.registrar_envio(descartado=True)
+    assert scheduler.classification_interval == 6
+    assert scheduler.descartes_pesados == 1
@@ -0,0 +1,73 @@
+import numpy as np
+
+from detectors.yolo_ops import geometria_letterbox, nms, postprocess, reproyectar_cajas, xywh_a_xyxy
+
+def _iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    return inter / ((a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter)
+
+def _nms_fuerza_bruta(boxes, scores, class_ids, umbral):
+    """Referencia: NMS por clase con doble bucle."""
+    keep = []
+    for i in sorted(range(len(boxes)), key=lambda i: -scores[i]):
+        if all(class_ids[i] != class_ids[j] or _iou(boxes[i], boxes[j]) <= umbral for j in keep):
+            keep.append(i)
+    return keep
+
+def test_nms_igual_a_fuerza_bruta():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        n = int(rng.integers(1, 60))
+        xy = rng.uniform(0, 200, size=(n, 2))
+        wh = rng.uniform(10, 80, size=(n, 2))
+        boxes = np.hstack([xy, xy + wh]).astype(np.float32)
+        scores = rng.permutation(n).astype(np.float32) / n
+        class_ids = rng.integers(0, 3, size=n)
+        esperado = _nms_fuerza_bruta(boxes.tolist(), scores.tolist(), class_ids.tolist(), 0.45)
+        assert nms(boxes, scores, class_ids, 0.45).tolist() == esperado
+
+def test_nms_vacio():
+    assert nms(np.empty((0, 4)), np.empty(0), np.empty(0)).size == 0
+
+def test_xywh_a_xyxy():
+    assert xywh_a_xyxy(np.array([[50.0, 40.0, 20.0, 10.0]])).tolist() == [[40.0, 35.0, 60.0, 45.0]]
+
+def test_geometria_letterbox_conserva_el_aspecto():
+    # 240x180 (4:3) en 320x256: escala 4/3, 320x240 centrado con 8 px arriba y abajo
+    escala, ancho, alto, dx, dy = geometria_letterbox(240, 180, 320, 256)
+    assert np.isclose(escala, 4 / 3)
+    assert (ancho, alto, dx, dy) == (320, 240, 0, 8)
+    # Frame vertical: el relleno queda a los lados
+    escala, ancho, alto, dx, dy = geometria_letterbox(180, 240, 320, 256)
+    assert (alto, dy) == (256, 0) and dx == (320 - ancho) // 2 > 0
+
+def test_letterbox_ida_y_vuelta():
+    for frame_size, entrada in (((240, 180), (320, 256)), ((640, 480), (320, 256)), ((180, 320), (416, 320))):
+        escala, _, _, dx, dy = geometria_letterbox(*frame_size, *entrada)
+        cajas = np.array([[10, 20, 100, 150], [0, 0, frame_size[0], frame_size[1]]], dtype=np.float32)
+        # Coordenadas en la entrada del modelo, como las predeciría el detector
+        en_modelo = cajas * escala + np.array([dx, dy, dx, dy], dtype=np.float32)
+        np.testing.assert_allclose(reproyectar_cajas(en_modelo, (escala, dx, dy), frame_size), cajas, atol=1e-3)
+
+def test_reproyeccion_recorta_al_frame():
+    cajas = np.array([[-20, -20, 400, 300]], dtype=np.float32)
+    assert reproyectar_cajas(cajas, (1.0, 0, 0), (240, 180)).tolist() == [[0, 0, 240, 180]]
+
+def test_postprocess_yolov8_filtra_y_reproyecta():
+    # Salida YOLOv8 [1, 84, N]: dos personas casi iguales (el NMS deja una), un perro, un candidato débil
+    # y el resto de los N candidatos sin score
+    salida = np.zeros((1, 84, 100), dtype=np.float32)
+    salida[0, :4, :4] = np.array([[100, 100, 40, 40], [102, 100, 40, 40], [40, 40, 40, 40], [200, 50, 80, 80]]).T
+    salida[0, 4 + 0, [0, 1]] = [0.9, 0.8]
+    salida[0, 4 + 16, 2] = 0.95
+    salida[0, 4 + 0, 3] = 0.2
+    transformacion = (2.0, 0, 10)
+    detecciones = postprocess([salida], transformacion=transformacion, frame_size=(160, 120))
+    assert len(detecciones) == 1
+    caja, confianza, clase = detecciones[0]
+    assert clase == 0 and np.isclose(confianza, 0.9)
+    np.testing.assert_allclose(caja, [40, 35, 60, 55])
+    # Con classes=None también se conserva el perro
+    assert sorted(c for _, _, c in postprocess([salida], classes=None)) == [0, 16]
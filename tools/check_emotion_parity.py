@@ -0,0 +1,97 @@
+"""
+Verificación de paridad y comparación de latencia/memoria entre los backends del modelo de emociones.
+
+Cada variante se ejecuta en un subproceso limpio (así el RSS y el tiempo de carga incluyen
+la importación de TensorFlow u onnxruntime) sobre samples/*.jpg usando el mismo camino que
+producción (classification.emotion2.reconocer_emociones). Después se compara cada variante
+ONNX contra Keras: coincidencia de etiqueta y diferencia máxima de confianza.
+
+Uso (desde la raíz del repositorio, tras ejecutar tools/export_emotion_onnx.py):
+    python -m tools.check_emotion_parity
+    python -m tools.check_emotion_parity --onnx keras_model_emotion.onnx keras_model_emotion.int8.onnx
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+def ejecutar_variante(muestras, repeticiones):
+    """Corre dentro del subproceso: carga el backend configurado por entorno y mide."""
+    import cv2
+
+    inicio = time.perf_counter()
+    from classification.emotion2 import reconocer_emociones
+    carga_s = time.perf_counter() - inicio
+
+    rois = [cv2.cvtColor(cv2.imread(ruta), cv2.COLOR_BGR2RGB) for ruta in muestras]
+    predicciones = reconocer_emociones(rois)  # también sirve de calentamiento
+    latencias = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        reconocer_emociones(rois[:1])
+        latencias.append((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        reconocer_emociones(rois)
+    batch_ms = (time.perf_counter() - t0) * 1000 / repeticiones
+    latencias.sort()
+    return {
+        "predicciones": predicciones,
+        "carga_s": carga_s,
+        "latencia_1_ms": latencias[len(latencias) // 2],
+        "latencia_batch_ms": batch_ms,
+        # ru_maxrss está en KiB en Linux
+        "rss_pico_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def lanzar(backend, ruta_onnx, args):
+    """Ejecuta una variante en un subproceso y retorna su resultado JSON."""
+    env = dict(os.environ, IALEPH_EMOTION_BACKEND=backend)
+    if ruta_onnx:
+        env["IALEPH_EMOTION_ONNX"] = ruta_onnx
+    cmd = [sys.executable, "-m", "tools.check_emotion_parity", "--hijo",
+           "--muestras", args.muestras, "--repeticiones", str(args.repeticiones)]
+    salida = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paridad y rendimiento de los backends de emociones.")
+    parser.add_argument("--onnx", nargs="+",
+                        default=["keras_model_emotion.onnx", "keras_model_emotion.fp16.onnx",
+                                 "keras_model_emotion.int8.onnx"])
+    parser.add_argument("--muestras", default="samples/*.jpg")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--tolerancia", type=float, default=0.05,
+                        help="Diferencia máxima de confianza aceptada frente a Keras")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    muestras = sorted(glob.glob(args.muestras))
+    if args.hijo:
+        print(json.dumps(ejecutar_variante(muestras, args.repeticiones)))
+        sys.exit(0)
+    if not muestras:
+        sys.exit(f"No se encontraron imágenes en {args.muestras}")
+
+    referencia = lanzar("keras", None, args)
+    variantes = {"keras": referencia}
+    for ruta in args.onnx:
+        if not os.path.exists(ruta):
+            print(f"Se omite {ruta}: no existe (ejecuta tools/export_emotion_onnx.py)")
+            continue
+        variantes[ruta] = lanzar("onnx", ruta, args)
+
+    hay_fallos = False
+    print(f"{'variante':34} {'carga s':>8} {'1 ROI ms':>9} {'batch ms':>9} {'RSS MB':>8} {'etiquetas':>10} {'max Δconf':>10}")
+    for nombre, r in variantes.items():
+        coincidencias = sum(p[0] == q[0] for p, q in zip(r["predicciones"], referencia["predicciones"]))
+        delta = max(abs(p[1] - q[1]) for p, q in zip(r["predicciones"], referencia["predicciones"]))
+        if coincidencias < len(muestras) or delta > args.tolerancia:
+            hay_fallos = True
+        print(f"{nombre:34} {r['carga_s']:8.2f} {r['latencia_1_ms']:9.2f} {r['latencia_batch_ms']:9.2f} "
+              f"{r['rss_pico_mb']:8.0f} {coincidencias:>4}/{len(muestras):<5} {delta:10.4f}")
+    sys.exit(1 if hay_fallos else 0)
@@ -0,0 +1,39 @@
+"""
+Exporta las redes de edad y género de DeepFace a ONNX para el backend
+AGE_GENDER_BACKEND="onnx" de classification/age_gender.py.
+
+Requiere deepface, tensorflow y tf2onnx (solo en la máquina que hace la conversión).
+
+Uso (desde la raíz del repositorio):
+    python -m tools.export_age_gender_onnx
+"""
+import argparse
+
+# Tamaño de entrada de las redes (igual que classification/age_gender.py, que no se importa para no cargarlas)
+INPUT_SIZE = 224
+
+def exportar(nombre, ruta_onnx, opset=13):
+    """Convierte la red de DeepFace indicada ("Age" o "Gender") a ONNX con batch dinámico."""
+    import tensorflow as tf
+    import tf2onnx
+    from deepface.modules import modeling
+
+    try:
+        cliente = modeling.build_model(task="facial_attribute", model_name=nombre)
+    except TypeError:
+        cliente = modeling.build_model(nombre)
+    model = getattr(cliente, "model", cliente)
+    spec = [tf.TensorSpec((None, INPUT_SIZE, INPUT_SIZE, 3), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=ruta_onnx)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta las redes de edad/género de DeepFace a ONNX.")
+    parser.add_argument("--edad", default="age_model.onnx")
+    parser.add_argument("--genero", default="gender_model.onnx")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+
+    exportar("Age", args.edad, args.opset)
+    print("Edad:", args.edad)
+    exportar("Gender", args.genero, args.opset)
+    print("Género:", args.genero)
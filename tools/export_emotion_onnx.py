@@ -0,0 +1,76 @@
+"""
+Conversión única del modelo Keras de emociones a ONNX, con variantes cuantizadas.
+
+Genera, junto al archivo de salida:
+  - <salida>.onnx       (float32)
+  - <salida>.fp16.onnx  (pesos float16, entrada/salida en float32)
+  - <salida>.int8.onnx  (cuantización dinámica de pesos a int8)
+
+Requiere tensorflow, tf2onnx, onnx, onnxruntime y onnxconverter-common (solo en la máquina
+que hace la conversión; en producción basta onnxruntime).
+
+Uso (desde la raíz del repositorio):
+    python -m tools.export_emotion_onnx
+    python -m tools.export_emotion_onnx --modelo converted_keras_emotion2.zip --salida emotion2.onnx
+"""
+import argparse
+import os
+import tempfile
+import zipfile
+
+# Tamaño de entrada del modelo (igual que classification/emotion2.py, que no se importa para no cargar el modelo)
+INPUT_SIZE = 224
+
+def extraer_h5(ruta_modelo, directorio):
+    """
+    Retorna la ruta al .h5; si se recibe el .zip exportado por Teachable Machine,
+    extrae keras_model.h5 en el directorio indicado.
+    """
+    if not ruta_modelo.endswith(".zip"):
+        return ruta_modelo
+    with zipfile.ZipFile(ruta_modelo) as zf:
+        nombre = next(n for n in zf.namelist() if n.endswith(".h5"))
+        return zf.extract(nombre, directorio)
+
+def exportar_onnx(ruta_h5, ruta_onnx, opset=13):
+    """Convierte el .h5 a ONNX float32 con eje de batch dinámico."""
+    import tensorflow as tf
+    import tf2onnx
+    from classification.keras_compat import cargar_modelo_keras
+
+    model = cargar_modelo_keras(ruta_h5)
+    spec = [tf.TensorSpec((None, INPUT_SIZE, INPUT_SIZE, 3), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=ruta_onnx)
+
+def exportar_fp16(ruta_onnx, ruta_fp16):
+    """Convierte los pesos a float16 manteniendo la entrada/salida en float32."""
+    import onnx
+    from onnxconverter_common import float16
+
+    modelo = onnx.load(ruta_onnx)
+    modelo_fp16 = float16.convert_float_to_float16(modelo, keep_io_types=True)
+    onnx.save(modelo_fp16, ruta_fp16)
+
+def exportar_int8(ruta_onnx, ruta_int8):
+    """Cuantización dinámica de pesos a int8 (no requiere datos de calibración)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(ruta_onnx, ruta_int8, weight_type=QuantType.QInt8)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta el modelo de emociones a ONNX (fp32/fp16/int8).")
+    parser.add_argument("--modelo", default="keras_model_emotion.h5",
+                        help="Archivo .h5 o .zip de Teachable Machine")
+    parser.add_argument("--salida", default="keras_model_emotion.onnx", help="Ruta del ONNX float32")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+
+    base, _ = os.path.splitext(args.salida)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_h5 = extraer_h5(args.modelo, tmp)
+        exportar_onnx(ruta_h5, args.salida, args.opset)
+    print("ONNX float32:", args.salida)
+    exportar_fp16(args.salida, base + ".fp16.onnx")
+    print("ONNX float16:", base + ".fp16.onnx")
+    exportar_int8(args.salida, base + ".int8.onnx")
+    print("ONNX int8:", base + ".int8.onnx")
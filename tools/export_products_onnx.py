@@ -0,0 +1,23 @@
+"""
+Exporta el detector de productos (segmentation/best.pt) a ONNX con eje de batch dinámico,
+para ejecutarlo con onnxruntime a través de ultralytics (IALEPH_PRODUCTS_MODEL=segmentation/best.onnx).
+
+Uso (desde la raíz del repositorio):
+    python -m tools.export_products_onnx
+    python -m tools.export_products_onnx --imgsz 480 --half
+"""
+import argparse
+
+from ultralytics import YOLO
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta segmentation/best.pt a ONNX.")
+    parser.add_argument("--modelo", default="segmentation/best.pt")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--half", action="store_true", help="Pesos float16 (requiere GPU al exportar)")
+    args = parser.parse_args()
+
+    ruta = YOLO(args.modelo).export(format="onnx", dynamic=True, simplify=True,
+                                    imgsz=args.imgsz, opset=args.opset, half=args.half)
+    print("ONNX:", ruta)
@@ -0,0 +1,31 @@
+"""
+Exporta el detector de personas (yolov8n.pt) a yolov8n.onnx con ejes de batch y tamaño dinámicos,
+para detectors/yolo.py (detectar_personas_lote, usado por el modo offline).
+Con tamaño dinámico, detectors/yolo.py elige la entrada con IALEPH_DETECTOR_INPUT; --imgsz solo fija
+el tamaño de referencia del export (por defecto, el de la configuración).
+
+Uso (desde la raíz del repositorio):
+    python -m tools.export_yolo_onnx
+"""
+import argparse
+import os
+import shutil
+
+from ultralytics import YOLO
+
+from config import DETECTOR_INPUT_SIZE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta yolov8n.pt a ONNX con batch y tamaño dinámicos.")
+    parser.add_argument("--modelo", default="yolov8n.pt")
+    parser.add_argument("--salida", default="yolov8n.onnx")
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--imgsz", default="x".join(map(str, DETECTOR_INPUT_SIZE)), help="ANCHOxALTO")
+    args = parser.parse_args()
+
+    ancho, alto = (int(v) for v in args.imgsz.lower().split("x"))
+    ruta = YOLO(args.modelo).export(format="onnx", dynamic=True, simplify=True,
+                                    imgsz=(alto, ancho), opset=args.opset)
+    if os.path.abspath(ruta) != os.path.abspath(args.salida):
+        shutil.move(ruta, args.salida)
+    print("ONNX:", args.salida)
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from config import (TRACK_TTL, TRACK_CACHE_MAX, EMOTION_EMA_ALPHA, EMOTION_MIN_INTERVAL,
+                    AGE_GENDER_MIN_CONFIDENCE, FACE_QUALITY_GAIN, AGE_GENDER_MAX_SAMPLES)
+
+def mediana_ponderada(valores, pesos):
+    """Mediana ponderada: el menor valor cuyo peso acumulado alcanza la mitad del peso total."""
+    pares = sorted(zip(valores, pesos))
+    total = sum(peso for _, peso in pares)
+    if total <= 0:
+        return pares[len(pares) // 2][0]
+    acumulado = 0.0
+    for valor, peso in pares:
+        acumulado += peso
+        if acumulado >= total / 2:
+            return valor
+    return pares[-1][0]
+
+class TrackAttributeStore:
+    """
+    Caché de atributos por ID de track, segura entre hilos (el hilo pesado escribe, el de dibujo lee).
+
+    - Agregación temporal ponderada por confianza: media móvil exponencial de las probabilidades de
+      emoción, mediana ponderada de la edad y media ponderada de P(hombre) para el género.
+    - Política de reclasificación: edad/género solo se vuelven a calcular si la confianza agregada es baja
+      o si llega un rostro de mejor calidad; la emoción, como mucho cada EMOTION_MIN_INTERVAL segundos.
+    - Expulsión: se eliminan los tracks que el tracker ya borró, los que llevan más de TRACK_TTL segundos
+      sin verse y, si se supera TRACK_CACHE_MAX, los usados hace más tiempo (LRU).
+    """
+
+    def __init__(self, ttl=TRACK_TTL, max_size=TRACK_CACHE_MAX, alpha=EMOTION_EMA_ALPHA,
+                 emotion_interval=EMOTION_MIN_INTERVAL, min_confidence=AGE_GENDER_MIN_CONFIDENCE,
+                 quality_gain=FACE_QUALITY_GAIN, max_samples=AGE_GENDER_MAX_SAMPLES):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.alpha = alpha
+        self.emotion_interval = emotion_interval
+        self.min_confidence = min_confidence
+        self.quality_gain = quality_gain
+        self.max_samples = max_samples
+        self._lock = threading.RLock()
+        # ID -> estado; el orden refleja el último acceso (el primero es el menos reciente)
+        self._tracks = OrderedDict()
+        # Contadores de la política de reclasificación (aciertos = clasificaciones evitadas)
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsados = 0
+
+    def _entrada(self, track_id, ahora):
+        entrada = self._tracks.get(track_id)
+        if entrada is None:
+            entrada = {
+                'visto': ahora,
+                'edades': deque(maxlen=self.max_samples),        # (edad, peso)
+                'p_hombre': deque(maxlen=self.max_samples),      # (P(hombre), peso)
+                'mejor_calidad': 0.0,
+                'emocion': None,                                 # {etiqueta: probabilidad} (EMA)
+                'emocion_t': 0.0,
+            }
+            self._tracks[track_id] = entrada
+        entrada['visto'] = ahora
+        self._tracks.move_to_end(track_id)
+        return entrada
+
+    def tocar(self, track_ids, ahora=None):
+        """Marca los tracks como vistos (alarga su TTL) sin modificar sus atributos."""
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            for track_id in track_ids:
+                if track_id in self._tracks:
+                    self._entrada(track_id, ahora)
+
+    def _confianza_edad_genero(self, entrada):
+        if not entrada['p_hombre']:
+            return 0.0
+        p = sum(v * w for v, w in entrada['p_hombre']) / max(sum(w for _, w in entrada['p_hombre']), 1e-9)
+        return max(p, 1 - p)
+
+    def necesita_edad_genero(self, track_id, calidad):
+        """True si conviene (re)clasificar edad/género con un rostro de la calidad indicada."""
+        with self._lock:
+            entrada = self._tracks.get(track_id)
+            necesita = (entrada is None or not entrada['edades']
+                        or self._confianza_edad_genero(entrada) < self.min_confidence
+                        or calidad > entrada['mejor_calidad'] * (1 + self.quality_gain))
+            if necesita:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+            return necesita
+
+    def necesita_emocion(self, track_id, ahora=None):
+        """True si la última emoción del track tiene más de emotion_interval segundos."""
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            entrada = self._tracks.get(track_id)
+            necesita = entrada is None or entrada['emocion'] is None or \
+                ahora - entrada['emocion_t'] >= self.emotion_interval
+            if necesita:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+            return necesita
+
+    def actualizar_edad_genero(self, track_id, resultado, calidad, ahora=None):
+        """
+        Agrega una observación de edad/género.
+
+        Parámetros:
+          - resultado: Diccionario de clasificar_edades_generos (edad, edad_confianza, genero, genero_confianza).
+          - calidad: Calidad del rostro usado (0 a 1); pondera la observación.
+        """
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            entrada = self._entrada(track_id, ahora)
+            entrada['mejor_calidad'] = max(entrada['mejor_calidad'], calidad)
+            if isinstance(resultado.get('edad'), (int, float)):
+                entrada['edades'].append((resultado['edad'], calidad * resultado.get('edad_confianza', 1.0)))
+            if resultado.get('genero') in ("Man", "Woman"):
+                conf = resultado.get('genero_confianza', 1.0)
+                p_hombre = conf if resultado['genero'] == "Man" else 1 - conf
+                entrada['p_hombre'].append((p_hombre, calidad))
+            self._expulsar_lru()
+
+    def actualizar_emocion(self, track_id, probabilidades, calidad, ahora=None):
+        """Actualiza la media móvil exponencial de las probabilidades de emoción, ponderada por la calidad."""
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            entrada = self._entrada(track_id, ahora)
+            previa = entrada['emocion']
+            if previa is None:
+                entrada['emocion'] = dict(probabilidades)
+            else:
+                a = self.alpha * calidad
+                entrada['emocion'] = {etiqueta: (1 - a) * previa.get(etiqueta, 0.0) + a * p
+                                      for etiqueta, p in probabilidades.items()}
+            entrada['emocion_t'] = ahora
+            self._expulsar_lru()
+
+    def obtener(self, track_id):
+        """
+        Retorna los atributos agregados del track o None si no hay ninguno:
+        {'edad', 'genero', 'emocion', 'edad_confianza', 'genero_confianza', 'emocion_confianza'}.
+        """
+        with self._lock:
+            entrada = self._tracks.get(track_id)
+            if entrada is None:
+                return None
+            atributos = {'edad': "Desconocido", 'genero': "Desconocido", 'emocion': "Sin detección",
+                         'edad_confianza': 0.0, 'genero_confianza': 0.0, 'emocion_confianza': 0.0}
+            if entrada['edades']:
+                edades, pesos = zip(*entrada['edades'])
+                atributos['edad'] = int(round(mediana_ponderada(edades, pesos)))
+                atributos['edad_confianza'] = min(1.0, sum(pesos) / len(pesos))
+            if entrada['p_hombre']:
+                p = sum(v * w for v, w in entrada['p_hombre']) / max(sum(w for _, w in entrada['p_hombre']), 1e-9)
+                atributos['genero'] = "Man" if p >= 0.5 else "Woman"
+                atributos['genero_confianza'] = max(p, 1 - p)
+            if entrada['emocion']:
+                etiqueta, p = max(entrada['emocion'].items(), key=lambda item: item[1])
+                atributos['emocion'] = etiqueta
+                atributos['emocion_confianza'] = p
+            return atributos
+
+    def podar(self, ids_vivos=None, ahora=None):
+        """
+        Elimina los tracks borrados por el tracker (los que no están en ids_vivos) y los expirados por TTL.
+
+        Retorna:
+          - eliminados: Lista de IDs eliminados.
+        """
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            eliminados = [track_id for track_id, entrada in self._tracks.items()
+                          if (ids_vivos is not None and track_id not in ids_vivos)
+                          or ahora - entrada['visto'] > self.ttl]
+            for track_id in eliminados:
+                del self._tracks[track_id]
+            self.expulsados += len(eliminados)
+            return eliminados
+
+    def _expulsar_lru(self):
+        while len(self._tracks) > self.max_size:
+            self._tracks.popitem(last=False)
+            self.expulsados += 1
+
+    def __contains__(self, track_id):
+        with self._lock:
+            return track_id in self._tracks
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tracks)
@@ -0,0 +1,178 @@
+"""
+Tracker liviano por IoU + filtro de Kalman, solo con NumPy (estilo SORT/ByteTrack, sin embedder de apariencia).
+
+- Cada track tiene un filtro de Kalman de velocidad constante sobre (cx, cy, aspecto, alto), como ByteTrack.
+- Asociación en dos rondas (ByteTrack): primero las detecciones de confianza alta contra todos los tracks;
+  luego las de confianza baja contra los tracks que quedaron sin asignar (recupera personas ocluidas
+  sin crear tracks nuevos con detecciones dudosas). La asignación es greedy por IoU descendente.
+- Un track se confirma tras min_hits actualizaciones seguidas y se elimina cuando lleva más de
+  max_perdido segundos sin detección (poda por tiempo, no por número de actualizaciones).
+"""
+import itertools
+import time
+
+import numpy as np
+
+def iou_matriz(a, b):
+    """IoU entre todas las cajas de a (Nx4) y b (Mx4), en formato [x1, y1, x2, y2]. Retorna NxM."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+def asociar(iou, umbral):
+    """
+    Asignación greedy: toma los pares (track, detección) de mayor IoU primero.
+
+    Retorna:
+      - pares: lista de (índice de track, índice de detección).
+      - tracks_libres, detecciones_libres: índices sin asignar.
+    """
+    n_tracks, n_detecciones = iou.shape
+    pares = []
+    usados_t, usados_d = set(), set()
+    if iou.size:
+        for indice in np.argsort(-iou, axis=None):
+            t, d = divmod(int(indice), n_detecciones)
+            if iou[t, d] < umbral:
+                break
+            if t in usados_t or d in usados_d:
+                continue
+            pares.append((t, d))
+            usados_t.add(t)
+            usados_d.add(d)
+    return (pares, [t for t in range(n_tracks) if t not in usados_t],
+            [d for d in range(n_detecciones) if d not in usados_d])
+
+def _xyxy_a_xyah(caja):
+    w, h = caja[2] - caja[0], caja[3] - caja[1]
+    return np.array([caja[0] + w / 2, caja[1] + h / 2, w / max(h, 1e-6), h], dtype=np.float64)
+
+class KalmanXYAH:
+    """Filtro de Kalman de velocidad constante sobre (cx, cy, a, h) y sus velocidades (igual que ByteTrack)."""
+
+    PESO_POSICION = 1.0 / 20
+    PESO_VELOCIDAD = 1.0 / 160
+
+    def __init__(self):
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+
+    def iniciar(self, medida):
+        media = np.r_[medida, np.zeros(4)]
+        h = medida[3]
+        std = [2 * self.PESO_POSICION * h, 2 * self.PESO_POSICION * h, 1e-2, 2 * self.PESO_POSICION * h,
+               10 * self.PESO_VELOCIDAD * h, 10 * self.PESO_VELOCIDAD * h, 1e-5, 10 * self.PESO_VELOCIDAD * h]
+        return media, np.diag(np.square(std))
+
+    def predecir(self, media, cov):
+        h = media[3]
+        std = [self.PESO_POSICION * h, self.PESO_POSICION * h, 1e-2, self.PESO_POSICION * h,
+               self.PESO_VELOCIDAD * h, self.PESO_VELOCIDAD * h, 1e-5, self.PESO_VELOCIDAD * h]
+        return self.F @ media, self.F @ cov @ self.F.T + np.diag(np.square(std))
+
+    def corregir(self, media, cov, medida):
+        h = media[3]
+        R = np.diag(np.square([self.PESO_POSICION * h, self.PESO_POSICION * h, 1e-1, self.PESO_POSICION * h]))
+        S = self.H @ cov @ self.H.T + R
+        K = np.linalg.solve(S, (cov @ self.H.T).T).T
+        media = media + K @ (medida - self.H @ media)
+        cov = cov - K @ S @ K.T
+        return media, cov
+
+class _Track:
+    __slots__ = ("track_id", "media", "cov", "hits", "confirmado", "visto", "actualizado")
+
+    def __init__(self, track_id, media, cov, ahora):
+        self.track_id = track_id
+        self.media = media
+        self.cov = cov
+        self.hits = 1
+        self.confirmado = False
+        self.visto = ahora
+        self.actualizado = True
+
+    def caja(self):
+        cx, cy, a, h = self.media[:4]
+        w = a * h
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+class IouTracker:
+    """
+    Tracker SORT/ByteTrack por IoU. Misma interfaz que DeepSortTracker (tracking/tracker.py):
+    actualizar(detecciones, frame, ahora) -> personas, ids_vivos().
+    """
+
+    def __init__(self, umbral_iou=0.3, umbral_iou_bajo=0.5, conf_alta=0.5, conf_baja=0.1, min_hits=3,
+                 max_perdido=2.0):
+        self.umbral_iou = umbral_iou
+        self.umbral_iou_bajo = umbral_iou_bajo
+        self.conf_alta = conf_alta
+        self.conf_baja = conf_baja
+        self.min_hits = min_hits
+        self.max_perdido = max_perdido
+        self.kalman = KalmanXYAH()
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def actualizar(self, detecciones, frame=None, ahora=None):
+        """
+        Parámetros:
+          - detecciones: Lista de ([x1, y1, x2, y2], confidence, class_id).
+          - frame: No se usa (sin embedder); se acepta por compatibilidad.
+          - ahora: Tiempo en segundos (por defecto time.monotonic()); el modo offline pasa el tiempo del video.
+
+        Retorna:
+          - personas: Tracks confirmados actualizados en esta llamada, como {'id', 'bbox'}.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        cajas = np.array([d[0] for d in detecciones], dtype=np.float64).reshape(-1, 4)
+        confs = np.array([d[1] for d in detecciones], dtype=np.float64)
+
+        for track in self.tracks:
+            track.media, track.cov = self.kalman.predecir(track.media, track.cov)
+            track.actualizado = False
+        cajas_tracks = np.array([track.caja() for track in self.tracks]).reshape(-1, 4)
+
+        # Primera ronda: detecciones de confianza alta contra todos los tracks
+        altas = np.flatnonzero(confs >= self.conf_alta)
+        pares, tracks_libres, altas_libres = asociar(iou_matriz(cajas_tracks, cajas[altas]), self.umbral_iou)
+        asignaciones = [(t, altas[d]) for t, d in pares]
+        # Segunda ronda: detecciones de confianza baja contra los tracks que quedaron libres
+        bajas = np.flatnonzero((confs >= self.conf_baja) & (confs < self.conf_alta))
+        pares, _, _ = asociar(iou_matriz(cajas_tracks[tracks_libres], cajas[bajas]), self.umbral_iou_bajo)
+        asignaciones += [(tracks_libres[t], bajas[d]) for t, d in pares]
+
+        for t, d in asignaciones:
+            track = self.tracks[t]
+            track.media, track.cov = self.kalman.corregir(track.media, track.cov, _xyxy_a_xyah(cajas[d]))
+            track.hits += 1
+            track.visto = ahora
+            track.actualizado = True
+            if track.hits >= self.min_hits:
+                track.confirmado = True
+
+        # Tracks nuevos solo a partir de detecciones de confianza alta sin asignar
+        for d in altas_libres:
+            media, cov = self.kalman.iniciar(_xyxy_a_xyah(cajas[altas[d]]))
+            track = _Track(next(self._ids), media, cov, ahora)
+            # Con min_hits <= 1 el track se confirma con su primera detección
+            track.confirmado = track.hits >= self.min_hits
+            self.tracks.append(track)
+
+        # Poda: tentativos que fallan una vez y perdidos por más de max_perdido segundos
+        self.tracks = [track for track in self.tracks
+                       if (track.actualizado or track.confirmado) and ahora - track.visto <= self.max_perdido]
+
+        return [{'id': track.track_id, 'bbox': track.caja().tolist()}
+                for track in self.tracks if track.confirmado and track.actualizado]
+
+    def ids_vivos(self):
+        return frozenset(track.track_id for track in self.tracks)
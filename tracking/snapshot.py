@@ -0,0 +1,38 @@
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# Estado publicado por la etapa de detección/tracking para un frame concreto.
+# Los consumidores (dibujo, inferencia pesada) leen siempre el frame junto con los tracks
+# calculados sobre él, y ninguno puede modificarlos.
+#   - frame_id: número de frame de la captura.
+#   - timestamp: time.time() de la publicación.
+#   - personas: tupla de mapeos de solo lectura {'id', 'bbox'} (bbox como tupla, en el frame reducido).
+#   - frame: frame reducido sobre el que se hizo la detección (solo lectura).
+#   - frame_captura: captura original (solo lectura).
+#   - ids_vivos: IDs que el tracker aún conserva (para eliminar los atributos de tracks borrados).
+TrackSnapshot = namedtuple("TrackSnapshot", ["frame_id", "timestamp", "personas", "frame", "frame_captura",
+                                             "ids_vivos"])
+
+def crear_snapshot(frame_id, frame, frame_captura, personas, ids_vivos=None):
+    """
+    Crea un snapshot inmutable a partir de la salida de actualizar_tracker.
+    
+    Parámetros:
+      - frame_id: Número de frame de la captura.
+      - frame: Frame reducido usado para detección/tracking.
+      - frame_captura: Captura original.
+      - personas: Lista de diccionarios {'id', 'bbox'}.
+      - ids_vivos: IDs de tracks que el tracker conserva (ver tracking.tracker.ids_activos); None si no se conocen.
+    
+    Retorna:
+      - snapshot: TrackSnapshot. Los frames se marcan como no escribibles (sin copiarlos).
+    """
+    frame.flags.writeable = False
+    frame_captura.flags.writeable = False
+    personas = tuple(
+        MappingProxyType({'id': persona['id'], 'bbox': tuple(float(v) for v in persona['bbox'])})
+        for persona in personas
+    )
+    return TrackSnapshot(frame_id, time.time(), personas, frame, frame_captura,
+                         None if ids_vivos is None else frozenset(ids_vivos))
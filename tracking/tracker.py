@@ -1,32 +1,173 @@
-from deep_sort_realtime.deepsort_tracker import DeepSort
+import threading
+import time
 
-# Inicializar el tracker Deep SORT con un parámetro 'max_age' para definir el tiempo de retención de tracks
-tracker = DeepSort(max_age=500)
+import numpy as np
 
-def actualizar_tracker(detecciones, frame):
+from config import (TRACKER_BACKEND, TRACK_MAX_LOST_SECONDS, DEEPSORT_EMBED_EVERY, TRACK_IOU_THRESHOLD,
+                    TRACK_MIN_HITS)
+from tracking.iou_tracker import IouTracker, iou_matriz
+
+# Límite de retención de tracks (en actualizaciones) de Deep SORT; la poda real es por tiempo (TRACK_MAX_LOST_SECONDS)
+MAX_AGE = 500
+# IoU mínimo para reutilizar el embedding de una detección de la actualización anterior
+IOU_REUTILIZAR_EMBEDDING = 0.7
+
+# Embedder de apariencia (MobileNetV2) compartido por todos los DeepSortTracker del proceso
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def embedder_compartido():
+    """Crea (una sola vez por proceso) y retorna el embedder de re-identificación de Deep SORT."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            from deep_sort_realtime.embedder.embedder_pytorch import MobileNetv2_Embedder
+            _embedder = MobileNetv2_Embedder(half=True, max_batch_size=16, bgr=True, gpu=False)
+        return _embedder
+
+def _recortes(frame, crudas):
+    """Recortes del frame para cada detección [left, top, width, height] (limitados al frame)."""
+    alto, ancho = frame.shape[:2]
+    recortes = []
+    for (left, top, w, h), _, _ in crudas:
+        x1, y1 = max(0, int(left)), max(0, int(top))
+        x2, y2 = min(ancho, int(left + w)), min(alto, int(top + h))
+        recortes.append(frame[y1:max(y2, y1 + 1), x1:max(x2, x1 + 1)])
+    return recortes
+
+class DeepSortTracker:
+    """
+    Deep SORT con embedder de apariencia, detrás de la misma interfaz que IouTracker:
+    actualizar(detecciones, frame, ahora) -> personas, ids_vivos().
+
+    - El embedder (CNN) corre completo solo cada embed_every actualizaciones; en las demás, cada detección
+      reutiliza el embedding de la detección anterior con la que más se solapa y solo se calculan los
+      de las detecciones nuevas.
+    - Los tracks sin detección por más de max_perdido segundos se eliminan (poda por tiempo).
+    """
+
+    def __init__(self, max_perdido=TRACK_MAX_LOST_SECONDS, embed_every=DEEPSORT_EMBED_EVERY, max_age=MAX_AGE,
+                 embedder=None):
+        # Importación diferida: el backend IoU no carga torch ni el embedder
+        from deep_sort_realtime.deepsort_tracker import DeepSort
+
+        # Sin embedder propio: los embeddings se calculan con el embedder compartido del proceso
+        self.ds = DeepSort(max_age=max_age, embedder=None)
+        self.embedder = embedder or embedder_compartido()
+        self.max_perdido = max_perdido
+        self.embed_every = max(1, embed_every)
+        self._actualizaciones = 0
+        self._cajas_previas = np.empty((0, 4))
+        self._embeds_previos = []
+        self._vistos = {}
+
+    def _embeber(self, frame, crudas):
+        return list(self.embedder.predict(_recortes(frame, crudas)))
+
+    def _embeddings(self, cajas, crudas, frame):
+        completo = (self._actualizaciones - 1) % self.embed_every == 0
+        if completo or not len(self._cajas_previas):
+            return self._embeber(frame, crudas)
+        embeds = [None] * len(crudas)
+        iou = iou_matriz(cajas, self._cajas_previas)
+        faltantes = []
+        for i in range(len(crudas)):
+            j = int(iou[i].argmax())
+            if iou[i, j] >= IOU_REUTILIZAR_EMBEDDING:
+                embeds[i] = self._embeds_previos[j]
+            else:
+                faltantes.append(i)
+        if faltantes:
+            for i, embed in zip(faltantes, self._embeber(frame, [crudas[i] for i in faltantes])):
+                embeds[i] = embed
+        return embeds
+
+    def actualizar(self, detecciones, frame, ahora=None):
+        ahora = time.monotonic() if ahora is None else ahora
+        self._actualizaciones += 1
+        # Deep SORT espera cajas [left, top, width, height]; el detector entrega [x1, y1, x2, y2]
+        crudas = [([x1, y1, x2 - x1, y2 - y1], conf, cls) for (x1, y1, x2, y2), conf, cls in detecciones]
+        cajas = np.array([d[0] for d in detecciones], dtype=np.float64).reshape(-1, 4)
+        embeds = self._embeddings(cajas, crudas, frame) if crudas else []
+        self._cajas_previas, self._embeds_previos = cajas, embeds
+
+        tracks = self.ds.update_tracks(crudas, embeds=embeds)
+        for track in tracks:
+            if track.time_since_update == 0:
+                self._vistos[track.track_id] = ahora
+        # Poda por tiempo: se eliminan del tracker los tracks perdidos hace más de max_perdido segundos
+        vivos = [track for track in self.ds.tracker.tracks
+                 if ahora - self._vistos.setdefault(track.track_id, ahora) <= self.max_perdido]
+        self.ds.tracker.tracks = vivos
+        ids = {track.track_id for track in vivos}
+        self._vistos = {track_id: t for track_id, t in self._vistos.items() if track_id in ids}
+
+        personas = []
+        for track in vivos:
+            # Solo procesar tracks confirmados (evitar tracks inestables)
+            if not track.is_confirmed():
+                continue
+            personas.append({'id': track.track_id, 'bbox': track.to_ltrb()})
+        return personas
+
+    def ids_vivos(self):
+        return frozenset(track.track_id for track in self.ds.tracker.tracks if not track.is_deleted())
+
+def crear_tracker(backend=TRACKER_BACKEND):
+    """
+    Crea un tracker independiente (uno por cámara en modo multicámara).
+
+    Parámetros:
+      - backend: "deepsort" (apariencia + movimiento) o "iou" (IoU + Kalman, solo NumPy, sin embedder).
+    """
+    if backend == "deepsort":
+        return DeepSortTracker()
+    if backend == "iou":
+        return IouTracker(umbral_iou=TRACK_IOU_THRESHOLD, min_hits=TRACK_MIN_HITS, max_perdido=TRACK_MAX_LOST_SECONDS)
+    raise ValueError(f"Backend de tracking desconocido: {backend!r} (usa 'deepsort' o 'iou')")
+
+def precargar():
+    """Carga en segundo plano lo costoso del backend (el embedder compartido de Deep SORT); lo llama el registro."""
+    if TRACKER_BACKEND == "deepsort":
+        embedder_compartido()
+
+# Tracker por defecto (modo de una sola cámara): se crea en el primer uso, así importar el módulo
+# (multicámara, offline) no crea un tracker que no se usa
+_tracker = None
+# Serializa todas las actualizaciones: los trackers no son seguros entre hilos
+_update_lock = threading.Lock()
+
+def _por_defecto(tracker):
+    global _tracker
+    if tracker is not None:
+        return tracker
+    if _tracker is None:
+        _tracker = crear_tracker()
+    return _tracker
+
+def actualizar_tracker(detecciones, frame, tracker=None, ahora=None):
     """
     Actualiza el tracker con las detecciones del frame actual.
-    
+
     Parámetros:
-      - detecciones: Lista de bounding boxes [x1, y1, x2, y2] provenientes de YOLOv8.
-      - frame: Frame actual del video, usado para calcular las características.
-    
+      - detecciones: Lista de ( [x1, y1, x2, y2], confidence, class_id ) del detector.
+      - frame: Frame actual del video, usado para calcular las características (solo Deep SORT).
+      - tracker: Tracker a actualizar (por defecto, el tracker del módulo, creado en el primer uso).
+      - ahora: Tiempo en segundos para la poda por tiempo (por defecto, el reloj; offline, el tiempo del video).
+
     Retorna:
       - personas: Lista de diccionarios con cada persona trackeada, que incluye un ID único y su bounding box.
     """
-    # Actualiza el tracker con las detecciones y el frame actual
-    tracks = tracker.update_tracks(detecciones, frame=frame)
-    
-    personas = []
-    for track in tracks:
-        # Solo procesar tracks confirmados (evitar tracks inestables)
-        if not track.is_confirmed():
-            continue
-        track_id = track.track_id              # Obtener el ID asignado al track
-        bbox = track.to_ltrb()                 # Obtener el bounding box en formato [left, top, right, bottom]
-        personas.append({'id': track_id, 'bbox': bbox})
-    
-    return personas
+    with _update_lock:
+        return _por_defecto(tracker).actualizar(detecciones, frame, ahora)
+
+def ids_activos(tracker=None):
+    """
+    Retorna los IDs de todos los tracks que el tracker aún conserva (confirmados o no, incluidos
+    los que están ocultos temporalmente). Un ID que deja de aparecer aquí fue eliminado por el tracker.
+    """
+    with _update_lock:
+        return _por_defecto(tracker).ids_vivos()
 
 # Bloque de prueba (se ejecuta solo si se corre este archivo directamente)
 if __name__ == "__main__":